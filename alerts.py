@@ -0,0 +1,186 @@
+import json
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from change_feed import fingerprint_table, touched_farmers
+from conflicts import VISIT_DATE_COLUMNS
+from data_store import DATA_DIR, farm_attributes
+from timeline_index import GAP_DAYS, EventIndex
+from visit_calendar import parse_dates
+
+ALERT_THRESHOLDS = {
+    'min_farmers_per_fe': 5,
+    'max_days_between_visits': GAP_DAYS,
+    'min_period_coverage': 0.8
+}
+ALERT_COLUMNS = ['Rule', 'Cluster name', 'FE_Name', 'Farmer ID', 'Dataset', 'Visit Period', 'Value', 'Threshold', 'New']
+DIGEST_PATH = DATA_DIR / "alerts_digest.txt"
+_CLOSED_PERIODS_EXCLUDE = {'Unknown', 'Outside Range'}
+
+
+class AlertEngine:
+    """Coverage aggregates kept up to date from the farmers changed since the last refresh, with rules evaluated over them"""
+
+    def __init__(self, classify_period, digest_path=DIGEST_PATH):
+        self.classify_period = classify_period
+        self.digest_path = digest_path
+        # The dashboard is relaunched after every data refresh, so the previous version's alerts are kept on disk
+        self.baseline_path = digest_path.with_suffix('.json')
+        self._lock = threading.Lock()
+        self.baseline_alerts = None
+        self.current_alerts = set()
+        self._reset()
+
+    def _reset(self):
+        self.version = None
+        self.fingerprints = {}
+        self.farms = farm_attributes(pd.DataFrame())
+        self.events = EventIndex.build({})
+        self.visited = pd.DataFrame(columns=['Dataset', 'Visit Period', 'Farmer ID'])
+
+    def _touched_rows(self, key, df):
+        """Farmers with a new, changed or removed row since the last refresh, and their current rows"""
+        table = fingerprint_table(df, key)
+        touched = touched_farmers(self.fingerprints.get(key, table.iloc[:0]), table)
+        self.fingerprints[key] = table
+        return touched, df[table['Farmer ID'].isin(touched).to_numpy()] if len(df) else df
+
+    def refresh(self, version, data):
+        """Recompute the aggregates of only the farmers the change feed reports as touched since the last refresh"""
+        with self._lock:
+            if version == self.version:
+                return
+            touched, changed = {}, {}
+            for key in ['farminfo', *VISIT_DATE_COLUMNS]:
+                touched[key], changed[key] = self._touched_rows(key, data.get(key, pd.DataFrame()))
+            print(f"Debug: Alert engine refresh recomputing {sum(len(ids) for ids in touched.values())} farmer/dataset pairs from {sum(len(rows) for rows in changed.values())} rows")
+
+            self.farms = pd.concat([self.farms.drop(index=touched['farminfo'], errors='ignore'), farm_attributes(changed['farminfo'])]).sort_index()
+            self.events = self.events.replace_farmers(touched, changed)
+            stale = np.zeros(len(self.visited), dtype=bool)
+            for key in VISIT_DATE_COLUMNS:
+                stale |= ((self.visited['Dataset'] == key) & self.visited['Farmer ID'].isin(touched[key])).to_numpy()
+            visited = [self.visited[~stale]]
+            for key, date_col in VISIT_DATE_COLUMNS.items():
+                rows = changed[key]
+                if rows.empty or date_col not in rows.columns or 'Farmer ID' not in rows.columns:
+                    continue
+                # Classify each distinct visit day once
+                days = pd.Series(parse_dates(rows[date_col]), index=rows.index).dt.strftime('%Y-%m-%d')
+                periods = days.map({day: self.classify_period(day) for day in days.dropna().unique()})
+                visited.append(pd.DataFrame({
+                    'Dataset': key,
+                    'Visit Period': periods,
+                    'Farmer ID': pd.to_numeric(rows['Farmer ID'], errors='coerce')
+                }).dropna())
+            self.visited = pd.concat(visited, ignore_index=True).drop_duplicates(ignore_index=True)
+            self.visited['Farmer ID'] = self.visited['Farmer ID'].astype('int64')
+            self.version = version
+
+            # The baseline and digest follow the default thresholds only, so no session's settings move them
+            alerts, keys, as_of = self._alerts(ALERT_THRESHOLDS)
+            self.baseline_alerts = self._update_baseline(version, keys)
+            self.current_alerts = keys
+            baseline = self.current_alerts if self.baseline_alerts is None else self.baseline_alerts
+            alerts['New'] = [key not in baseline for key in self._keys(alerts)]
+            self._write_digest(alerts, ALERT_THRESHOLDS, as_of, len(baseline - keys))
+
+    def _fe_alerts(self, thresholds):
+        counts = self.farms.groupby(['Cluster name', 'FE_Name']).size().rename('Value').reset_index()
+        low = counts[counts['Value'] < thresholds['min_farmers_per_fe']]
+        return low.assign(Rule='Too few farmers per FE', Threshold=thresholds['min_farmers_per_fe'])
+
+    def _gap_alerts(self, thresholds, as_of):
+        last = self.events.last_visits(as_of).set_index('Farmer ID')['Days Since Visit']
+        gaps = self.farms[['Cluster name', 'FE_Name']].join(last.rename('Value'), how='left')
+        stale = gaps[gaps['Value'].isna() | (gaps['Value'] > thresholds['max_days_between_visits'])]
+        return stale.rename_axis('Farmer ID').reset_index().assign(Rule='No recent visit', Threshold=thresholds['max_days_between_visits'])
+
+    def _coverage_alerts(self, thresholds, as_of):
+        # Only periods that have ended: the period containing as_of is still being visited
+        current = self.classify_period(str(as_of.date())) if as_of is not None else None
+        visited = self.visited[~self.visited['Visit Period'].isin(_CLOSED_PERIODS_EXCLUDE | {current})]
+        visited = visited.join(self.farms[['Cluster name', 'FE_Name']], on='Farmer ID', how='inner')
+        covered = visited.groupby(['Dataset', 'Visit Period', 'Cluster name', 'FE_Name']).size().rename('Visited')
+        registered = self.farms.groupby(['Cluster name', 'FE_Name']).size().rename('Registered')
+        periods = visited[['Dataset', 'Visit Period']].drop_duplicates()
+        expected = periods.merge(registered.reset_index(), how='cross')
+        coverage = expected.join(covered, on=['Dataset', 'Visit Period', 'Cluster name', 'FE_Name'])
+        coverage['Value'] = (coverage['Visited'].fillna(0) / coverage['Registered']).round(2)
+        low = coverage[coverage['Value'] < thresholds['min_period_coverage']]
+        return low.assign(Rule='Low period coverage', Threshold=thresholds['min_period_coverage'])
+
+    @staticmethod
+    def _keys(alerts):
+        """Identity of each alert as a plain tuple, with missing parts as None so it survives a JSON round trip"""
+        columns = [alerts[col].astype(object).where(alerts[col].notna(), None) for col in ['Rule', 'FE_Name', 'Farmer ID', 'Dataset', 'Visit Period']]
+        return [(rule, fe, None if farmer is None else int(farmer), dataset, period) for rule, fe, farmer, dataset, period in zip(*columns)]
+
+    def _update_baseline(self, version, keys):
+        """Alerts open at the previous data version, read from and rolled forward in the baseline file; None before any earlier version"""
+        try:
+            with open(self.baseline_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = None
+        if state is None:
+            baseline = None
+        elif state['version'] == version:
+            # A relaunch on the same data keeps the comparison it made before
+            baseline = None if state['baseline'] is None else {tuple(key) for key in state['baseline']}
+        else:
+            baseline = {tuple(key) for key in state['current']}
+        try:
+            tmp_path = self.baseline_path.with_suffix('.json.tmp')
+            tmp_path.write_text(json.dumps({
+                'version': version,
+                'baseline': None if baseline is None else list(baseline),
+                'current': list(keys)
+            }, ensure_ascii=False), encoding='utf-8')
+            tmp_path.replace(self.baseline_path)
+        except OSError as e:
+            print(f"Debug: Could not write alert baseline: {e}")
+        return baseline
+
+    def _alerts(self, thresholds):
+        """Alerts over the current aggregates for the given thresholds, their keys and the as-of date"""
+        as_of = self.events.last_visits()['Last Visit'].max() if len(self.events) else None
+        as_of = None if pd.isna(as_of) else as_of
+        found = [frame for frame in (self._fe_alerts(thresholds), self._gap_alerts(thresholds, as_of), self._coverage_alerts(thresholds, as_of)) if not frame.empty]
+        alerts = pd.concat(found, ignore_index=True).reindex(columns=ALERT_COLUMNS) if found else pd.DataFrame(columns=ALERT_COLUMNS)
+        alerts['Farmer ID'] = alerts['Farmer ID'].astype('Int64')
+        alerts = alerts.sort_values(['Rule', 'Cluster name', 'FE_Name', 'Value'], na_position='first').reset_index(drop=True)
+        return alerts, set(self._keys(alerts)), as_of
+
+    def evaluate(self, thresholds=None):
+        """Current alerts for the given thresholds, flagging those that were not open at the previous data refresh; the engine is left unchanged"""
+        thresholds = {**ALERT_THRESHOLDS, **(thresholds or {})}
+        with self._lock:
+            alerts, keys, _ = self._alerts(thresholds)
+            # Before a second refresh there is nothing to compare against, so nothing is new
+            baseline = keys if self.baseline_alerts is None else self.baseline_alerts
+            alerts['New'] = [key not in baseline for key in self._keys(alerts)]
+            return alerts
+
+    def _write_digest(self, alerts, thresholds, as_of, resolved):
+        """Plain-text summary of the current alerts for supervisors, replaced atomically"""
+        lines = [
+            f"Field data alerts - generated {datetime.now():%Y-%m-%d %H:%M}, data as of {as_of.date() if as_of is not None else 'n/a'}",
+            "Thresholds: " + ", ".join(f"{name}={value}" for name, value in thresholds.items()),
+            f"{len(alerts)} open alerts, {int(alerts['New'].sum())} new, {resolved} resolved since the last refresh",
+            ""
+        ]
+        for rule, rule_alerts in alerts.groupby('Rule', sort=False):
+            lines.append(f"{rule}: {len(rule_alerts)}")
+            by_fe = rule_alerts.groupby(['Cluster name', 'FE_Name'], dropna=False).size().sort_values(ascending=False)
+            lines.extend(f"  {cluster} / {fe}: {count}" for (cluster, fe), count in by_fe.items())
+            lines.append("")
+        try:
+            tmp_path = self.digest_path.with_suffix('.tmp')
+            tmp_path.write_text("\n".join(lines), encoding='utf-8')
+            tmp_path.replace(self.digest_path)
+        except OSError as e:
+            print(f"Debug: Could not write alert digest: {e}")
@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import numpy as np
+import pandas as pd
+
+from dashboard import DEFAULT_CALENDAR, load_data, analyze_visit_data, create_fe_summary_table, get_missing_fes, clean_farmer_data, get_calendar_registry
+from data_store import data_version
+
+VISIT_DATASETS = ['fieldvisit', 'rainfall', 'observation']
+RESPONSE_CACHE_SIZE = 256
+
+_snapshot_lock = threading.Lock()
+_snapshot = {'version': None, 'data': None}
+
+_response_cache_lock = threading.Lock()
+_response_cache = OrderedDict()
+
+
+class BadRequest(Exception):
+    pass
+
+
+def get_snapshot(version):
+    """Return the loaded datasets for version, reloading the CSVs only when the data changed"""
+    with _snapshot_lock:
+        if _snapshot['version'] != version:
+            _snapshot['data'] = load_data(version)
+            _snapshot['version'] = version
+        return _snapshot['data']
+
+
+def _records(df):
+    """Convert a result table into JSON-ready records"""
+    if df is None or df.empty:
+        return []
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _cluster_param(params):
+    return params.get('cluster', ['All'])[0] or 'All'
+
+
+def visits_endpoint(data, params):
+    """analyze_visit_data for one dataset, calendar, cluster and set of visit periods"""
+    dataset = params.get('dataset', [''])[0]
+    if dataset not in VISIT_DATASETS:
+        raise BadRequest(f"dataset must be one of {', '.join(VISIT_DATASETS)}")
+    calendar = params.get('calendar', [DEFAULT_CALENDAR])[0]
+    if calendar not in get_calendar_registry().calendars:
+        raise BadRequest(f"calendar must be one of {', '.join(get_calendar_registry().names())}")
+    cluster = _cluster_param(params)
+    selected_visits = params.get('visit', ['All'])
+    visit_summary_df, comparison_df, detailed_df = analyze_visit_data(data[dataset], data['farminfo'], cluster, selected_visits, dataset_type=dataset, calendar=calendar)
+    return {
+        'dataset': dataset,
+        'calendar': calendar,
+        'cluster': cluster,
+        'visits': selected_visits,
+        'visit_summary': _records(visit_summary_df),
+        'comparison': _records(comparison_df),
+        'detailed': _records(detailed_df)
+    }
+
+
+def fe_summary_endpoint(data, params):
+    """create_fe_summary_table over farminfo for one cluster"""
+    cluster = _cluster_param(params)
+    original_df = data['farminfo']
+    _, valid_df = clean_farmer_data(original_df)
+    summary_df = create_fe_summary_table(original_df, valid_df, cluster)
+    return {'cluster': cluster, 'fe_summary': _records(summary_df)}
+
+
+def missing_fes_endpoint(data, params):
+    """get_missing_fes for one cluster"""
+    cluster = _cluster_param(params)
+    return {'cluster': cluster, 'missing_fes': _records(get_missing_fes(data, cluster))}
+
+
+ROUTES = {
+    '/visits': visits_endpoint,
+    '/fe-summary': fe_summary_endpoint,
+    '/missing-fes': missing_fes_endpoint
+}
+
+
+def _cache_lookup(key):
+    with _response_cache_lock:
+        if key in _response_cache:
+            _response_cache.move_to_end(key)
+            return _response_cache[key]
+    return None
+
+
+def _cache_store(key, value):
+    with _response_cache_lock:
+        _response_cache[key] = value
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+
+class QfieldAPIHandler(BaseHTTPRequestHandler):
+    server_version = "QfieldAPI/1.0"
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        version = data_version()
+
+        if parsed.path == '/version':
+            self._send_json(200, json.dumps({'data_version': version}).encode('utf-8'), etag=None)
+            return
+
+        endpoint = ROUTES.get(parsed.path)
+        if endpoint is None:
+            self._send_json(404, json.dumps({'error': f"Unknown endpoint {parsed.path}", 'endpoints': sorted(ROUTES)}).encode('utf-8'), etag=None)
+            return
+
+        params = parse_qs(parsed.query)
+        query_key = f"{parsed.path}?{urlencode(sorted(params.items()), doseq=True)}"
+        etag = f'"{version}-{hashlib.sha1(query_key.encode("utf-8")).hexdigest()[:12]}"'
+
+        # Pollers that already hold this version get a 304 before any work is done
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        body = _cache_lookup(etag)
+        if body is None:
+            try:
+                payload = endpoint(get_snapshot(version), params)
+            except BadRequest as e:
+                self._send_json(400, json.dumps({'error': str(e)}).encode('utf-8'), etag=None)
+                return
+            payload['data_version'] = version
+            body = json.dumps(payload, default=_json_default, ensure_ascii=False).encode('utf-8')
+            _cache_store(etag, body)
+        self._send_json(200, body, etag=etag)
+
+    def _send_json(self, status, body, etag):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a fixed pool of worker threads"""
+
+    def __init__(self, server_address, handler_class, max_workers=8):
+        super().__init__(server_address, handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="qfield-api")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local JSON API over the Q-field dashboard aggregates")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    server = ThreadPoolHTTPServer((args.host, args.port), QfieldAPIHandler, max_workers=args.workers)
+    print(f"✓ Q-field API listening on http://{args.host}:{args.port} ({args.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nAPI stopped by user")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
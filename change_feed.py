@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from conflicts import VISIT_DATE_COLUMNS
+from data_store import DATASETS
+
+# Columns identifying the same record, so a rewritten row counts as changed rather than as unrelated add and remove
+ROW_KEYS = {'farminfo': ['Farmer ID'], **{key: ['Farmer ID', date_col] for key, date_col in VISIT_DATE_COLUMNS.items()}}
+STATUSES = ['New', 'Changed', 'Removed']
+_OCCURRENCE_SALT = np.uint64(0x9E3779B97F4A7C15)
+
+
+def cell_text(column):
+    """Column values as the text they would have in the CSV, whatever dtype pandas inferred: blanks as '' and whole floats without '.0'"""
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        whole = np.isfinite(values) & (values == np.trunc(values)) & (np.abs(values) < 2 ** 63)
+        text = np.where(whole, np.where(whole, values, 0).astype(np.int64).astype(str), values.astype(str))
+        return pd.Series(np.where(np.isnan(values), '', text), index=column.index, dtype=object)
+    return column.astype(object).where(column.notna(), '').astype(str).astype(object)
+
+
+def row_fingerprints(df):
+    """64-bit hash of every row's CSV text, so a refresh that changes a column's inferred dtype leaves unchanged rows alike"""
+    if df.empty:
+        return np.array([], dtype=np.uint64)
+    # Columns by position, since merged headers can repeat
+    text = pd.DataFrame({i: cell_text(df.iloc[:, i]) for i in range(df.shape[1])}, index=df.index)
+    return pd.util.hash_pandas_object(text, index=False).to_numpy(dtype=np.uint64)
+
+
+def fingerprint_table(df, key):
+    """Row hash, record-key hash and numeric Farmer ID of every row; all a later diff needs to remember"""
+    if df.empty:
+        return pd.DataFrame({'Fingerprint': np.array([], dtype=np.uint64), 'Key': np.array([], dtype=np.uint64), 'Farmer ID': np.array([], dtype=np.float64)})
+    farmer_ids = pd.to_numeric(df['Farmer ID'], errors='coerce') if 'Farmer ID' in df.columns else pd.Series(np.nan, index=df.index)
+    # Keys use the same CSV text as the row hash, so a Farmer ID read as float in one file and int in the next still matches
+    keys = pd.DataFrame({col: cell_text(farmer_ids if col == 'Farmer ID' else df[col]) for col in ROW_KEYS[key] if col in df.columns or col == 'Farmer ID'})
+    fingerprints = row_fingerprints(df)
+    # Identical rows are numbered so a repeated submission is a new record rather than invisible to the diff
+    occurrence = pd.Series(fingerprints).groupby(fingerprints).cumcount().to_numpy(dtype=np.uint64)
+    return pd.DataFrame({
+        'Fingerprint': fingerprints + occurrence * _OCCURRENCE_SALT,
+        'Key': pd.util.hash_pandas_object(keys, index=False).to_numpy(dtype=np.uint64),
+        'Farmer ID': farmer_ids.to_numpy(dtype=np.float64)
+    })
+
+
+def diff_fingerprints(previous, current):
+    """Status of each current row ('New', 'Changed' or None) and a mask of removed previous rows, via hash semi-joins"""
+    added = ~np.isin(current['Fingerprint'].to_numpy(), previous['Fingerprint'].to_numpy())
+    gone = ~np.isin(previous['Fingerprint'].to_numpy(), current['Fingerprint'].to_numpy())
+    # A record whose key survives with different content is a change, not a removal plus an addition
+    changed = added & np.isin(current['Key'].to_numpy(), previous['Key'].to_numpy()[gone])
+    removed = gone & ~np.isin(previous['Key'].to_numpy(), current['Key'].to_numpy()[added])
+    status = np.where(changed, 'Changed', np.where(added, 'New', None))
+    return status, removed
+
+
+def touched_farmers(previous, current):
+    """Farmer IDs with any new, changed or removed row between two fingerprint tables"""
+    status, removed = diff_fingerprints(previous, current)
+    farmer_ids = np.concatenate([current['Farmer ID'].to_numpy()[pd.notna(status)], previous['Farmer ID'].to_numpy()[removed]])
+    return np.unique(farmer_ids[~np.isnan(farmer_ids)]).astype(np.int64)
+
+
+class ChangeFeed:
+    """New, changed and removed records per dataset between two data snapshots"""
+
+    def __init__(self, records, new_fes):
+        self.records = records
+        self.new_fes = new_fes
+
+    @classmethod
+    def build(cls, previous_data, current_data):
+        records = {}
+        for key in DATASETS:
+            previous_df, current_df = previous_data.get(key, pd.DataFrame()), current_data.get(key, pd.DataFrame())
+            status, removed = diff_fingerprints(fingerprint_table(previous_df, key), fingerprint_table(current_df, key))
+            records[key] = pd.concat([
+                current_df[pd.notna(status)].assign(Status=status[pd.notna(status)]),
+                previous_df[removed].assign(Status='Removed')
+            ], ignore_index=True) if len(current_df) or len(previous_df) else pd.DataFrame(columns=['Status'])
+        previous_fes = {fe for df in previous_data.values() if 'FE_Name' in df.columns for fe in df['FE_Name'].dropna().unique()}
+        current_fes = {fe for df in current_data.values() if 'FE_Name' in df.columns for fe in df['FE_Name'].dropna().unique()}
+        feed = cls(records, sorted(current_fes - previous_fes))
+        print(f"Debug: Change feed {feed.summary().to_dict('index')}")
+        return feed
+
+    def summary(self):
+        """Dataset x status record counts"""
+        counts = {key: records['Status'].value_counts().reindex(STATUSES, fill_value=0) for key, records in self.records.items()}
+        return pd.DataFrame(counts).T.rename_axis('Dataset')
+
+    def new_farmers(self):
+        farminfo = self.records.get('farminfo', pd.DataFrame(columns=['Status']))
+        return farminfo[farminfo['Status'] == 'New']
+
+    def by_fe(self):
+        """Records per FE, dataset and status, one row per FE"""
+        frames = [records[['FE_Name', 'Status']].assign(Dataset=key.capitalize())
+                  for key, records in self.records.items() if 'FE_Name' in records.columns and not records.empty]
+        if not frames:
+            return pd.DataFrame()
+        long = pd.concat(frames, ignore_index=True)
+        table = long.groupby(['FE_Name', 'Dataset', 'Status']).size().unstack(['Dataset', 'Status'], fill_value=0)
+        table.columns = [f"{dataset} {status}" for dataset, status in table.columns]
+        table.insert(0, 'New FE', table.index.isin(self.new_fes))
+        return table.sort_values(list(table.columns[1:]), ascending=False).rename_axis('FE Name').reset_index()
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+from conflicts import VISIT_DATE_COLUMNS
+from observation_metrics import observation_value_mask
+
+
+def _registration_rows(farminfo_df):
+    """Farminfo rows with their cluster, flagged when the farmer was registered by more than one FE"""
+    if farminfo_df.empty or 'Farmer ID' not in farminfo_df.columns or 'Cluster name' not in farminfo_df.columns:
+        return pd.DataFrame(columns=['Dataset', 'Cluster name', 'Farmer ID', 'Shared Farmer'])
+    rows = pd.DataFrame({
+        'Dataset': 'farminfo',
+        'Cluster name': farminfo_df['Cluster name'],
+        'Farmer ID': pd.to_numeric(farminfo_df['Farmer ID'], errors='coerce'),
+        'FE_Name': farminfo_df['FE_Name'] if 'FE_Name' in farminfo_df.columns else np.nan
+    }).dropna(subset=['Cluster name', 'Farmer ID'])
+    # Same rule as the "FEs with Same Farmer Data" check
+    rows['Shared Farmer'] = rows.groupby('Farmer ID')['FE_Name'].transform('nunique').to_numpy() > 1
+    return rows.drop(columns='FE_Name')
+
+
+def cluster_coded_rows(farminfo_df, visits, observation_df, registry, calendar_name):
+    """Registrations and visits stacked into one table with a cluster code and one indicator column per measure, plus the visit period names"""
+    visit_rows = visits.loc[visits['Cluster name'].notna(), ['Dataset', 'Row', 'Farmer ID', 'Cluster name', 'Visit Date']].copy()
+    visit_rows['Dataset'] = visit_rows['Dataset'].astype(object)
+    # Each cluster is classified by its override calendar when one is configured, as in the single-cluster views
+    calendar = registry.get(calendar_name)
+    overrides = {cluster: override for (name, cluster), override in registry.overrides.items() if name == calendar_name}
+    days = visit_rows['Visit Date'].dt.strftime('%Y-%m-%d')
+    clusters = visit_rows['Cluster name'].to_numpy(dtype=object)
+    periods = calendar.classify(days)
+    for cluster, override in overrides.items():
+        in_cluster = clusters == cluster
+        if in_cluster.any():
+            periods[in_cluster] = override.classify(days[in_cluster])
+    visit_rows['Visit Period'] = periods
+    period_names = list(pd.unique(np.array(calendar.period_names + [name for override in overrides.values() for name in override.period_names], dtype=object)))
+    is_observation = (visit_rows['Dataset'] == 'observation').to_numpy()
+    complete = np.full(len(visit_rows), np.nan)
+    if is_observation.any():
+        complete[is_observation] = observation_value_mask(observation_df).to_numpy()[visit_rows['Row'].to_numpy()[is_observation]]
+    visit_rows['Complete'] = complete
+    # A second submission for the same farmer, dataset and day
+    visit_rows['Duplicate Visit'] = visit_rows.duplicated(['Dataset', 'Farmer ID', 'Visit Date'])
+
+    rows = pd.concat([_registration_rows(farminfo_df), visit_rows.drop(columns=['Row', 'Visit Date'])], ignore_index=True)
+    rows['Cluster Code'], cluster_names = pd.factorize(rows['Cluster name'], sort=True)
+    farmer_ids = rows['Farmer ID'].to_numpy(dtype=np.float64)
+    datasets = rows['Dataset'].to_numpy(dtype=object)
+    indicators = {
+        'registered_id': np.where(datasets == 'farminfo', farmer_ids, np.nan),
+        'shared_id': np.where(rows['Shared Farmer'].fillna(False).to_numpy(dtype=bool), farmer_ids, np.nan),
+        'duplicate_visit': rows['Duplicate Visit'].fillna(False).to_numpy(dtype=bool),
+        'period': np.where(np.isin(rows['Visit Period'].to_numpy(dtype=object), period_names), rows['Visit Period'].to_numpy(dtype=object), None)
+    }
+    for key in VISIT_DATE_COLUMNS:
+        indicators[f"{key}_id"] = np.where(datasets == key, farmer_ids, np.nan)
+        indicators[f"{key}_visit"] = datasets == key
+    for code, period in enumerate(period_names):
+        indicators[f"period_{code}"] = rows['Visit Period'].to_numpy(dtype=object) == period
+    return pd.concat([rows[['Cluster Code', 'Complete']], pd.DataFrame(indicators, index=rows.index)], axis=1), list(cluster_names), period_names
+
+
+def compare_clusters(coded_rows, clusters, period_names):
+    """Per-cluster coverage, visits per period, observation completeness and duplicates from a single groupby"""
+    aggregations = {
+        'Registered Farmers': ('registered_id', 'nunique'),
+        'Farmers Registered by Several FEs': ('shared_id', 'nunique'),
+        'Duplicate Visits': ('duplicate_visit', 'sum'),
+        'Observation Completeness': ('Complete', 'mean'),
+        'Active Periods': ('period', 'nunique')
+    }
+    for key in VISIT_DATE_COLUMNS:
+        aggregations[f"{key.capitalize()} Farmers Visited"] = (f"{key}_id", 'nunique')
+        aggregations[f"{key.capitalize()} Visits"] = (f"{key}_visit", 'sum')
+    for code, period in enumerate(period_names):
+        aggregations[f"Visits {period}"] = (f"period_{code}", 'sum')
+
+    comparison = coded_rows[coded_rows['Cluster Code'] >= 0].groupby('Cluster Code').agg(**aggregations)
+    comparison.index = pd.Index(np.asarray(clusters, dtype=object)[comparison.index.to_numpy()], name='Cluster name')
+
+    registered = comparison['Registered Farmers'].where(comparison['Registered Farmers'] > 0)
+    for key in VISIT_DATE_COLUMNS:
+        comparison.insert(comparison.columns.get_loc(f"{key.capitalize()} Visits") + 1, f"{key.capitalize()} Coverage",
+                          (comparison[f"{key.capitalize()} Farmers Visited"] / registered).round(3))
+    # Visits outside every period are not spread over the active ones
+    period_cols = [f"Visits {period}" for period in period_names]
+    comparison.insert(comparison.columns.get_loc('Active Periods') + 1, 'Visits per Period',
+                      (comparison[period_cols].sum(axis=1) / comparison['Active Periods'].where(comparison['Active Periods'] > 0)).round(1))
+    comparison['Observation Completeness'] = comparison['Observation Completeness'].round(3)
+    empty_periods = [col for col in period_cols if not comparison[col].any()]
+    print(f"Debug: Compared {len(comparison)} clusters over {len(coded_rows)} cluster-coded rows")
+    return comparison.drop(columns=empty_periods)
+
+
+def period_visits_long(comparison):
+    """(cluster, visit period, visits) rows for the side-by-side chart"""
+    period_cols = [col for col in comparison.columns if col.startswith('Visits ') and col != 'Visits per Period']
+    long = comparison[period_cols].rename(columns=lambda col: col[len('Visits '):]).rename_axis(columns='Visit Period')
+    return long.stack().rename('Visits').reset_index()
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+from data_store import DATASETS, farm_attributes
+from visit_calendar import OUTSIDE_RANGE, UNKNOWN, parse_dates
+
+VISIT_DATE_COLUMNS = {
+    'fieldvisit': 'Visit date',
+    'rainfall': 'Visit date',
+    'observation': 'Visit Date'
+}
+# Conflict type and its weight when ranking; a farmer split across FEs outranks a repeated visit
+CONFLICT_WEIGHTS = {
+    'Multiple FEs': 3,
+    'Name mismatch': 2,
+    'Repeat visit in period': 1
+}
+CONFLICT_COLUMNS = ['Conflict', 'Farmer ID', 'Cluster name', 'Datasets', 'Records', 'Detail', 'Score']
+
+
+def _name_key(names):
+    """Integer key per farmer name, ignoring case and spacing, computed once per distinct name"""
+    cleaned = names.cat.categories.str.split().str.join(' ').str.casefold()
+    return pd.factorize(cleaned)[0][names.cat.codes.to_numpy()]
+
+
+def farmer_records(data):
+    """One typed frame over all datasets: dataset, farmer, FE, farmer name and visit date per record"""
+    frames = []
+    for key in DATASETS:
+        df = data.get(key, pd.DataFrame())
+        if df.empty or 'Farmer ID' not in df.columns:
+            continue
+        date_col = VISIT_DATE_COLUMNS.get(key)
+        frames.append(pd.DataFrame({
+            'Dataset': key,
+            'Farmer ID': pd.to_numeric(df['Farmer ID'], errors='coerce'),
+            'FE_Name': df['FE_Name'] if 'FE_Name' in df.columns else None,
+            'Farmer Name': df['Farmer Name'] if 'Farmer Name' in df.columns else None,
+            'Visit Date': parse_dates(df[date_col]).astype('datetime64[ns]') if date_col and date_col in df.columns else pd.NaT
+        }))
+    if not frames:
+        return pd.DataFrame(columns=['Dataset', 'Farmer ID', 'FE_Name', 'Farmer Name', 'Visit Date'])
+    records = pd.concat(frames, ignore_index=True).dropna(subset=['Farmer ID'])
+    return records.astype({
+        'Dataset': pd.CategoricalDtype(DATASETS),
+        'Farmer ID': 'int64',
+        'FE_Name': 'category',
+        'Farmer Name': 'category'
+    })
+
+
+def _pack(*columns):
+    """Pack small non-negative integer columns into one int64 key so grouping is a single sort"""
+    key = np.zeros(len(columns[0]), dtype=np.int64)
+    for column in columns:
+        column = np.asarray(column, dtype=np.int64)
+        key = key * (int(column.max()) + 1 if len(column) else 1) + column
+    return key
+
+
+def _multiple_fes(records):
+    """Farmer IDs recorded under more than one FE anywhere"""
+    fes = records[records['FE_Name'].cat.codes.to_numpy() >= 0]
+    farmer_codes, farmers = pd.factorize(fes['Farmer ID'])
+    farmer_fe = np.unique(_pack(farmer_codes, fes['FE_Name'].cat.codes))
+    fe_counts = np.bincount(farmer_fe // (int(fes['FE_Name'].cat.codes.max()) + 1), minlength=len(farmers)) if len(fes) else np.array([], dtype=np.int64)
+    split = fes[(fe_counts > 1)[farmer_codes]]
+    if split.empty:
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+    pairs = split.groupby(['Farmer ID', 'FE_Name'], observed=True).size().rename('Records').reset_index()
+    pairs['Detail'] = pairs['FE_Name'].astype(str) + ' (' + pairs['Records'].astype(str) + ')'
+    grouped = pairs.groupby('Farmer ID')
+    return pd.DataFrame({
+        'Conflict': 'Multiple FEs',
+        'Datasets': split[['Farmer ID', 'Dataset']].drop_duplicates().groupby('Farmer ID')['Dataset'].agg(lambda ds: ', '.join(ds.astype(str))),
+        'Records': grouped['Records'].sum(),
+        'Detail': grouped['Detail'].agg(', '.join)
+    }).reset_index()
+
+
+def _repeat_visits(records, classify_period):
+    """The same farmer visited more than once within one visit period of one dataset"""
+    visits = records.dropna(subset=['Visit Date'])
+    if visits.empty:
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+    # Classify each distinct day once, then group on hashed integer codes only
+    day_codes, days = pd.factorize(visits['Visit Date'].to_numpy(dtype='datetime64[D]'))
+    period_codes, period_names = pd.factorize(pd.Series([classify_period(str(day)) for day in days]))
+    row_periods = period_codes[day_codes]
+    farmer_codes, farmers = pd.factorize(visits['Farmer ID'])
+    # Days in no visit period are not a period of their own, so they cannot repeat within one
+    outside = np.flatnonzero(period_names.isin([UNKNOWN, OUTSIDE_RANGE]))
+    known = np.flatnonzero(~np.isin(row_periods, outside))
+    dataset_codes = visits['Dataset'].cat.codes.to_numpy()
+    group_index, _ = pd.factorize(_pack(dataset_codes[known], farmer_codes[known], row_periods[known]))
+    records_per_group = np.bincount(group_index)
+    repeated = records_per_group > 1
+    if not repeated.any():
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+    # Unpacked with the same modulus _pack used, which only spans the days left after dropping out-of-period ones
+    known_days = day_codes[known]
+    group_days = pd.unique(_pack(group_index, known_days))
+    days_per_group = np.bincount(group_days // (int(known_days.max()) + 1), minlength=len(records_per_group))
+
+    first_rows = np.full(len(records_per_group), len(known), dtype=np.int64)
+    np.minimum.at(first_rows, group_index, np.arange(len(known)))
+    first_rows = known[first_rows[repeated]]
+    repeats = pd.DataFrame({
+        'Conflict': 'Repeat visit in period',
+        'Farmer ID': farmers[farmer_codes[first_rows]],
+        'Datasets': visits['Dataset'].cat.categories[dataset_codes[first_rows]],
+        'Records': records_per_group[repeated],
+        'Detail': period_names[row_periods[first_rows]]
+    })
+    repeats['Detail'] = repeats['Detail'] + ': ' + repeats['Records'].astype(str) + ' records on ' + days_per_group[repeated].astype(str) + ' day(s)'
+    return repeats
+
+
+def _name_mismatches(records):
+    """Visit records whose farmer name differs from the name registered in farminfo"""
+    named = records.dropna(subset=['Farmer Name'])
+    if named.empty:
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+    named = named.assign(**{'Name Key': _name_key(named['Farmer Name'])})
+    registered = named.loc[named['Dataset'] == 'farminfo', ['Farmer ID', 'Farmer Name', 'Name Key']].drop_duplicates('Farmer ID')
+    visited = named.loc[named['Dataset'] != 'farminfo', ['Dataset', 'Farmer ID', 'Farmer Name', 'Name Key']]
+    joined = visited.merge(registered, on='Farmer ID', suffixes=('', ' Registered'))
+    mismatched = joined[joined['Name Key'] != joined['Name Key Registered']]
+    if mismatched.empty:
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+    grouped = mismatched.groupby('Farmer ID')
+    return pd.DataFrame({
+        'Conflict': 'Name mismatch',
+        'Datasets': grouped['Dataset'].agg(lambda ds: ', '.join(ds.astype(str).unique())),
+        'Records': grouped.size(),
+        'Detail': grouped['Farmer Name Registered'].first().astype(str) + ' vs ' + grouped['Farmer Name'].agg(lambda names: ', '.join(names.astype(str).unique()))
+    }).reset_index()
+
+
+def detect_conflicts(data, classify_period):
+    """Ranked table of farmer conflicts across farminfo, fieldvisit, rainfall and observation"""
+    records = farmer_records(data)
+    if records.empty:
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+    found = [frame for frame in (_multiple_fes(records), _name_mismatches(records), _repeat_visits(records, classify_period)) if not frame.empty]
+    if not found:
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+    conflicts = pd.concat(found, ignore_index=True)
+    conflicts['Farmer ID'] = conflicts['Farmer ID'].astype('int64')
+    conflicts = conflicts.join(farm_attributes(data.get('farminfo', pd.DataFrame()))[['Cluster name']], on='Farmer ID')
+    conflicts['Score'] = conflicts['Conflict'].map(CONFLICT_WEIGHTS) * np.log2(1 + conflicts['Records'].astype(np.float64))
+    conflicts['Score'] = conflicts['Score'].round(2)
+    return conflicts[CONFLICT_COLUMNS].sort_values(['Score', 'Farmer ID'], ascending=[False, True]).reset_index(drop=True)
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from data_store import english_names, farm_attributes, find_column
+from visit_calendar import parse_dates
+
+# Stages in agronomic order; a farmer's stage code is the position in this list
+CROP_STAGES = [
+    'Emergence',
+    'Seedling stage',
+    'Vegetative',
+    'Squaring',
+    'Flowering',
+    'Boll Development',
+    'Boll Maturity',
+    'Boll Opening',
+    'I Picking',
+    'I Picking to II Picking',
+    'II Picking to III Picking',
+    'III Picking to IV Picking',
+    'Defoliation'
+]
+STAGE_CODES = {stage: code for code, stage in enumerate(CROP_STAGES)}
+LAG_STAGES = 2
+
+
+def stage_observations(fieldvisit_df):
+    """(farmer, date, stage code) rows from fieldvisit, dated by the stage start date when given"""
+    columns = ['Farmer ID', 'Date', 'Stage']
+    stage_col = find_column(fieldvisit_df, 'Crop stage')
+    if fieldvisit_df.empty or stage_col is None or 'Farmer ID' not in fieldvisit_df.columns:
+        return pd.DataFrame({'Farmer ID': pd.Series(dtype='int64'), 'Date': pd.Series(dtype='datetime64[ns]'), 'Stage': pd.Series(dtype='int8')})
+
+    start_col = find_column(fieldvisit_df, 'Crop stage start date')
+    visit_dates = pd.Series(parse_dates(fieldvisit_df['Visit date']).astype('datetime64[ns]'), index=fieldvisit_df.index) if 'Visit date' in fieldvisit_df.columns else pd.Series(pd.NaT, index=fieldvisit_df.index)
+    dates = pd.Series(parse_dates(fieldvisit_df[start_col]).astype('datetime64[ns]'), index=fieldvisit_df.index).fillna(visit_dates) if start_col else visit_dates
+    observations = pd.DataFrame({
+        'Farmer ID': pd.to_numeric(fieldvisit_df['Farmer ID'], errors='coerce'),
+        'Date': dates,
+        'Stage': pd.Series(english_names(fieldvisit_df[stage_col]), index=fieldvisit_df.index).map(STAGE_CODES)
+    }).dropna()
+    return observations.astype({'Farmer ID': 'int64', 'Stage': 'int8'})[columns]
+
+
+def _transitions(observations):
+    """First date each farmer reached each new stage, via one sort and a shifted comparison"""
+    observations = observations.sort_values(['Farmer ID', 'Date', 'Stage'], kind='stable')
+    # A later visit reporting an earlier stage is noise; progression only moves forward
+    reached = observations.groupby('Farmer ID', sort=False)['Stage'].cummax().to_numpy()
+    farmer = observations['Farmer ID'].to_numpy()
+    new_farmer = np.r_[True, farmer[1:] != farmer[:-1]]
+    advanced = np.r_[True, reached[1:] > reached[:-1]]
+    keep = new_farmer | advanced
+    transitions = pd.DataFrame({
+        'Farmer ID': farmer[keep],
+        'Stage': reached[keep].astype(np.int8),
+        'Entered': observations['Date'].to_numpy()[keep]
+    })
+    same_farmer_next = np.r_[transitions['Farmer ID'].to_numpy()[1:] == transitions['Farmer ID'].to_numpy()[:-1], False]
+    transitions['Left'] = np.where(same_farmer_next, np.r_[transitions['Entered'].to_numpy()[1:], np.datetime64('NaT')], np.datetime64('NaT'))
+    transitions['Left'] = transitions['Left'].astype('datetime64[ns]')
+    return transitions
+
+
+class StageTimeline:
+    """Compact per-farmer stage transitions that can be extended with newly arrived visits"""
+
+    def __init__(self, transitions, last_seen, farms):
+        self.transitions = transitions
+        self.last_seen = last_seen
+        self.farms = farms
+
+    @staticmethod
+    def _farms(farminfo_df):
+        return farm_attributes(farminfo_df)[['Cluster name', 'Village', 'FE_Name']]
+
+    @classmethod
+    def build(cls, fieldvisit_df, farminfo_df):
+        observations = stage_observations(fieldvisit_df)
+        return cls(_transitions(observations), observations.groupby('Farmer ID')['Date'].max(), cls._farms(farminfo_df))
+
+    def update(self, new_fieldvisit_rows, farminfo_df=None):
+        """Fold newly appended visits in, recomputing only the farmers they touch; farminfo_df, when given, replaces the farm attributes"""
+        farms = self.farms if farminfo_df is None else self._farms(farminfo_df)
+        new_observations = stage_observations(new_fieldvisit_rows)
+        if new_observations.empty:
+            return StageTimeline(self.transitions, self.last_seen, farms)
+        touched = new_observations['Farmer ID'].unique()
+        touched_mask = self.transitions['Farmer ID'].isin(touched)
+        # Existing transitions carry everything later visits need: the first date of each reached stage
+        previous = self.transitions.loc[touched_mask, ['Farmer ID', 'Entered', 'Stage']].rename(columns={'Entered': 'Date'})
+        rebuilt = _transitions(pd.concat([previous, new_observations], ignore_index=True))
+        transitions = pd.concat([self.transitions[~touched_mask], rebuilt], ignore_index=True).sort_values(['Farmer ID', 'Entered'], kind='stable')
+        last_seen = pd.concat([self.last_seen, new_observations.groupby('Farmer ID')['Date'].max()]).groupby(level=0).max()
+        return StageTimeline(transitions.reset_index(drop=True), last_seen, farms)
+
+    def stage_durations(self, as_of=None):
+        """Transitions with days spent in each stage; the current stage runs to as_of (or last visit)"""
+        durations = self.transitions.join(self.farms, on='Farmer ID')
+        current_end = pd.Timestamp(as_of) if as_of is not None else durations['Farmer ID'].map(self.last_seen)
+        durations['Current'] = durations['Left'].isna()
+        durations['Days in Stage'] = (durations['Left'].fillna(current_end) - durations['Entered']).dt.days
+        durations['Stage Name'] = np.asarray(CROP_STAGES, dtype=object)[durations['Stage'].to_numpy()]
+        return durations
+
+    def current_stages(self, cluster=None):
+        """Each farmer's latest reached stage with the cluster median and how many stages behind it they are"""
+        current = self.stage_durations()
+        current = current[current['Current']]
+        if cluster and cluster != "All":
+            current = current[current['Cluster name'] == cluster]
+        current = current.copy()
+        current['Cluster Median Stage'] = current.groupby('Cluster name')['Stage'].transform('median')
+        current['Stages Behind'] = (current['Cluster Median Stage'] - current['Stage']).clip(lower=0)
+        return current
+
+    def lagging_farmers(self, cluster=None, min_stages=LAG_STAGES):
+        """Farmers at least min_stages behind their cluster's median current stage"""
+        current = self.current_stages(cluster)
+        lagging = current[current['Stages Behind'] >= min_stages].copy()
+        lagging['Cluster Median Stage'] = np.asarray(CROP_STAGES, dtype=object)[lagging['Cluster Median Stage'].round().astype(int).to_numpy()]
+        return lagging[['Cluster name', 'Village', 'FE_Name', 'Farmer ID', 'Stage Name', 'Entered', 'Cluster Median Stage', 'Stages Behind']] \
+            .sort_values('Stages Behind', ascending=False).reset_index(drop=True)
+
+    def median_days_per_stage(self, cluster=None):
+        """Median days farmers spent in each completed stage"""
+        durations = self.stage_durations()
+        completed = durations[~durations['Current']]
+        if cluster and cluster != "All":
+            completed = completed[completed['Cluster name'] == cluster]
+        summary = completed.groupby('Stage').agg(Farmers=('Farmer ID', 'nunique'), **{'Median Days': ('Days in Stage', 'median')})
+        summary.index = pd.Index(np.asarray(CROP_STAGES, dtype=object)[summary.index.to_numpy()], name='Stage')
+        return summary
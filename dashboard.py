@@ -1,20 +1,42 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from pathlib import Path
-from datetime import datetime
+import altair as alt
 import os
 
-# Set page configuration
-st.set_page_config(
-    page_title="Q-field ",
-    page_icon="🍃",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+from data_store import DATASETS, data_version, dataset_path
+from exports import export_file_stem, render_download_buttons
+from observation_metrics import observation_value_mask, build_observation_frame, rollup_observation_metrics, metric_table
+from picking_yield import YIELD_LEVELS, build_picking_yield, rollup_yield, cumulative_yield_by_date
+from rainfall_calendar import CUBE_LEVELS, explode_rainfall_events, build_rainfall_cube
+from pest_disease import INCIDENCE_LEVELS, build_incidence_table, build_incidence_cube, pest_disease_cooccurrence, cooccurrence_matrix
+from crop_stage import CROP_STAGES, StageTimeline
+from farm_geometry import AREA_TOLERANCE, parse_farm_geometry, area_check
+from farm_map import DETAIL_LEVELS, COVERAGE_COLORS, map_polygons, visit_coverage, farm_map_deck
+from spatial_index import FarmSpatialIndex, nearby_farms_table, flag_overlaps
+from conflicts import CONFLICT_WEIGHTS, VISIT_DATE_COLUMNS, detect_conflicts
+from name_matching import FarmerNameIndex, propose_id_recoveries, village_variants
+from farmer_search import FarmerSearchIndex
+from timeline_index import GAP_DAYS, EventIndex, visit_gaps
+from alerts import ALERT_THRESHOLDS, DIGEST_PATH, AlertEngine
+from visit_calendar import VISIT_PERIOD_NAMES, load_calendars
+from partition_store import partition_index, partitions_for_periods, rows_for_partitions
+from sowing_visits import TIMING_LEVELS, build_visit_table, das_slots, period_slots, build_timing_cube
+from hierarchy_rollup import HIERARCHY_LEVELS, LEVEL_LABELS, build_hierarchy_rollup
+from cluster_comparison import cluster_coded_rows, compare_clusters, period_visits_long
+from snapshot_store import read_manifest as read_snapshot_manifest, record_snapshot, replay_snapshot, snapshot_history
+from change_feed import ChangeFeed
+from segment_store import read_dataset
+from streaming_aggregates import ingest_aggregates
+
+# Tenant shown when the URL does not name one, and the calendar used by callers outside the app such as the JSON API
+DEFAULT_TENANT = 'fortnightly'
+DEFAULT_CALENDAR = 'fortnightly'
+# Small deployments set QFIELD_LOW_MEMORY=1 to serve the dashboard from streamed aggregates instead of the raw tables
+LOW_MEMORY = os.environ.get('QFIELD_LOW_MEMORY', '').strip().lower() in ('1', 'true', 'yes')
 
 # Custom CSS for better styling
-st.markdown("""
+PAGE_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -52,32 +74,35 @@ st.markdown("""
         font-weight: bold;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+def setup_page():
+    """Page configuration and custom CSS, applied at the start of every run"""
+    st.set_page_config(
+        page_title="Q-field ",
+        page_icon="🍃",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
-@st.cache_data
-def load_data():
-    """Load and cache the merged CSV files"""
+@st.cache_resource(max_entries=2)
+def load_data(version=None):
+    """Load the merged datasets once per data version into a snapshot shared by every session and tenant; callers must not modify it"""
     try:
-        base_path = Path(__file__).parent / "data"
-        files = {
-            'farminfo': base_path / "merged_farminfo.csv",
-            'fieldvisit': base_path / "merged_fieldvisit.csv",
-            'rainfall': base_path / "merged_rainfall.csv",
-            'observation': base_path / "merged_observation.csv"
-        }
-        
         data = {}
         load_messages = []
         successful_loads = 0
-        for key, file_path in files.items():
-            if file_path.exists():
-                df = pd.read_csv(file_path)
+        for key in DATASETS:
+            # Streamed from the compressed store when it is current, otherwise read from the merged CSV
+            df = read_dataset(key)
+            if df is not None:
                 df.columns = df.columns.str.strip()
                 data[key] = df
                 load_messages.append(f"{key}: {len(df)} records")
                 successful_loads += 1
             else:
-                st.warning(f"⚠️ File not found: {file_path}. Please ensure the file exists in the 'data' directory.")
+                st.warning(f"⚠️ File not found: {dataset_path(key)}. Please ensure the file exists in the 'data' directory.")
                 data[key] = pd.DataFrame()
         
         if successful_loads == 0:
@@ -108,53 +133,16 @@ def clean_farmer_data(df):
     print(f"Debug: Cleaned {df.shape} to {valid_data.shape} for valid Farmer IDs")
     return cleaned_df, valid_data
 
-def parse_visit_date(date_str):
-    """Parse visit date and handle different formats"""
-    if pd.isna(date_str) or str(date_str).strip() == '':
-        return None
-    try:
-        formats = ['%Y/%m/%d', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%m/%d/%Y']
-        for fmt in formats:
-            try:
-                return datetime.strptime(str(date_str).strip(), fmt)
-            except ValueError:
-                continue
-        return None
-    except:
-        return None
-
-def classify_visit_period(date_str):
-    """Classify visit into one of the sixteen visit periods"""
-    date_obj = parse_visit_date(date_str)
-    if date_obj is None:
-        return "Unknown"
-    
-    visit_periods = [
-        ("First Visit", datetime(2025, 6, 20), datetime(2025, 7, 14)),
-        ("Second Visit", datetime(2025, 7, 15), datetime(2025, 7, 31)),
-        ("Third Visit", datetime(2025, 8, 1), datetime(2025, 8, 14)),
-        ("Fourth Visit", datetime(2025, 8, 15), datetime(2025, 8, 31)),
-        ("Fifth Visit", datetime(2025, 9, 1), datetime(2025, 9, 14)),
-        ("Sixth Visit", datetime(2025, 9, 15), datetime(2025, 9, 30)),
-        ("Seventh Visit", datetime(2025, 10, 1), datetime(2025, 10, 14)),
-        ("Eighth Visit", datetime(2025, 10, 15), datetime(2025, 10, 31)),
-        ("Ninth Visit", datetime(2025, 11, 1), datetime(2025, 11, 14)),
-        ("Tenth Visit", datetime(2025, 11, 15), datetime(2025, 11, 30)),
-        ("Eleventh Visit", datetime(2025, 12, 1), datetime(2025, 12, 14)),
-        ("Twelfth Visit", datetime(2025, 12, 15), datetime(2025, 12, 31)),
-        ("Thirteenth Visit", datetime(2026, 1, 1), datetime(2026, 1, 14)),
-        ("Fourteenth Visit", datetime(2026, 1, 15), datetime(2026, 1, 31)),
-        ("Fifteenth Visit", datetime(2026, 2, 1), datetime(2026, 2, 14)),
-        ("Sixteenth Visit", datetime(2026, 2, 15), datetime(2026, 2, 28))
-    ]
+@st.cache_resource(show_spinner=False)
+def get_calendar_registry():
+    """Visit calendars compiled once per process from calendars.json"""
+    return load_calendars()
 
-   
-    
-    for visit_name, start_date, end_date in visit_periods:
-        if start_date <= date_obj <= end_date:
-            return visit_name
-    return "Outside Range"
+def get_calendar(calendar, cluster=None):
+    """The named visit calendar, using the cluster's override when one is configured"""
+    return get_calendar_registry().get(calendar, None if cluster == "All" else cluster)
 
+@st.cache_data(show_spinner=False)
 def create_fe_summary_table(original_df, valid_df, cluster=None):
     """Create FE summary table with farmer counts and IDs, filtered by cluster if provided"""
     if original_df.empty or 'FE_Name' not in original_df.columns:
@@ -200,18 +188,60 @@ def find_duplicate_farmers(df, cluster=None):
     if len(duplicate_farmers) == 0:
         return pd.DataFrame()
     
-    duplicate_data = []
-    for farmer_id in duplicate_farmers:
-        fes = df[df['Farmer ID'] == farmer_id]['FE_Name'].unique()
-        duplicate_data.append({'Farmer ID': farmer_id, 'FEs Collected': ', '.join(fes), 'Count': len(fes)})
-    
-    duplicate_df = pd.DataFrame(duplicate_data).sort_values('Count', ascending=False)
+    duplicate_fes = df[df['Farmer ID'].isin(duplicate_farmers)].groupby('Farmer ID', sort=False)['FE_Name'].unique()
+    duplicate_df = pd.DataFrame({
+        'Farmer ID': duplicate_fes.index,
+        'FEs Collected': duplicate_fes.map(', '.join).to_numpy(),
+        'Count': farmer_fe_counts.loc[duplicate_fes.index].to_numpy()
+    }).sort_values('Count', ascending=False)
     print(f"Debug: Duplicate Farmers shape: {duplicate_df.shape}")
     return duplicate_df
 
-def analyze_visit_data(original_df, farminfo_df=None, cluster=None, selected_visits=None, dataset_type='generic'):
+def prepare_visit_rows(original_df, farminfo_df, cluster, dataset_type, calendar):
+    """Valid visit rows classified into visit periods, plus the observation FEs with valid values"""
+    visit_date_col = 'Visit Date' if dataset_type == 'observation' else 'Visit date'
+    _, valid_df = clean_farmer_data(original_df)
+    
+    # For observation dataset, identify FEs with valid data
+    valid_fes = set()
+    if dataset_type == 'observation' and not valid_df.empty:
+        valid_df = valid_df[observation_value_mask(valid_df)]
+        valid_fes = set(valid_df['FE_Name'].dropna().unique())
+    
+    if cluster and cluster != "All" and farminfo_df is not None and not farminfo_df.empty and 'Cluster name' in farminfo_df.columns:
+        cluster_farmers = farminfo_df[farminfo_df['Cluster name'] == cluster]['Farmer ID'].dropna().unique()
+        valid_df = valid_df[valid_df['Farmer ID'].isin(cluster_farmers)] if not valid_df.empty else valid_df
+    
+    valid_df['Visit Period'] = get_calendar(calendar, cluster).classify(valid_df[visit_date_col]) if not valid_df.empty else pd.Series(dtype=str)
+    valid_visits = valid_df[
+        (valid_df['Visit Period'].isin(VISIT_PERIOD_NAMES)) & 
+        (valid_df['Farmer ID'].notna()) & 
+        (valid_df['FE_Name'].notna())
+    ].copy() if not valid_df.empty else pd.DataFrame()
+    
+    if not valid_visits.empty:
+        valid_visits['Farmer ID'] = valid_visits['Farmer ID'].astype(str)
+    return valid_fes, valid_visits
+
+def visit_fe_roster(original_df, farminfo_df, cluster, dataset_type, calendar):
+    """FEs analyze_visit_data lists for a dataset and cluster, whichever visit periods are selected"""
+    if original_df.empty or 'FE_Name' not in original_df.columns:
+        return []
+    all_fes = original_df['FE_Name'].dropna().unique()
+    if cluster and cluster != "All" and farminfo_df is not None and not farminfo_df.empty and 'Cluster name' in farminfo_df.columns:
+        cluster_farmers = farminfo_df[farminfo_df['Cluster name'] == cluster]['Farmer ID'].dropna().unique()
+        original_df = original_df[original_df['Farmer ID'].isin(cluster_farmers)]
+    if ('Visit Date' if dataset_type == 'observation' else 'Visit date') not in original_df.columns:
+        return list(all_fes)
+    if dataset_type == 'observation':
+        return list(original_df['FE_Name'].dropna().unique())
+    _, valid_visits = prepare_visit_rows(original_df, farminfo_df, cluster, dataset_type, calendar)
+    return list(valid_visits['FE_Name'].dropna().unique()) if not valid_visits.empty else []
+
+@st.cache_data(show_spinner=False)
+def analyze_visit_data(original_df, farminfo_df=None, cluster=None, selected_visits=None, dataset_type='generic', calendar=DEFAULT_CALENDAR, fe_roster=None):
     """Analyze visit data for fieldvisit, rainfall, or observation, filtered by cluster and visit periods if provided"""
-    if original_df.empty:
+    if original_df.empty and not fe_roster:
         print(f"Debug: Empty original_df in analyze_visit_data ({dataset_type})")
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
     
@@ -221,12 +251,7 @@ def analyze_visit_data(original_df, farminfo_df=None, cluster=None, selected_vis
         cluster_farmers = farminfo_df[farminfo_df['Cluster name'] == cluster]['Farmer ID'].dropna().unique()
         original_df = original_df[original_df['Farmer ID'].isin(cluster_farmers)]
     
-    visit_periods = [
-        'First Visit', 'Second Visit', 'Third Visit', 'Fourth Visit', 'Fifth Visit', 
-        'Sixth Visit', 'Seventh Visit', 'Eighth Visit', 'Ninth Visit', 'Tenth Visit',
-        'Eleventh Visit', 'Twelfth Visit', 'Thirteenth Visit', 'Fourteenth Visit',
-        'Fifteenth Visit', 'Sixteenth Visit'
-    ]
+    visit_periods = VISIT_PERIOD_NAMES
     
     visit_date_col = 'Visit Date' if dataset_type == 'observation' else 'Visit date'
     
@@ -255,30 +280,7 @@ def analyze_visit_data(original_df, farminfo_df=None, cluster=None, selected_vis
                              for fe_name in all_fes for vp in visit_periods]
         return pd.DataFrame(summary_data), pd.DataFrame(comparison_data), pd.DataFrame(detailed_data)
     
-    _, valid_df = clean_farmer_data(original_df)
-    
-    # For observation dataset, identify FEs with valid data
-    valid_fes = set()
-    if dataset_type == 'observation' and not valid_df.empty:
-        observation_value_cols = [col for col in valid_df.columns if ('avg' in col.lower() or 'plant height' in col.lower()) and col not in ['Farmer Name', 'FE_Name', 'Visit Date', 'Farmer ID', 'fid']]
-        if observation_value_cols:
-            valid_mask = valid_df[observation_value_cols].notna().any(axis=1)
-            valid_df = valid_df[valid_mask]
-            valid_fes = set(valid_df['FE_Name'].dropna().unique())
-    
-    if cluster and cluster != "All" and farminfo_df is not None and not farminfo_df.empty and 'Cluster name' in farminfo_df.columns:
-        cluster_farmers = farminfo_df[farminfo_df['Cluster name'] == cluster]['Farmer ID'].dropna().unique()
-        valid_df = valid_df[valid_df['Farmer ID'].isin(cluster_farmers)] if not valid_df.empty else valid_df
-    
-    valid_df['Visit Period'] = valid_df[visit_date_col].apply(classify_visit_period) if not valid_df.empty else pd.Series(dtype=str)
-    valid_visits = valid_df[
-        (valid_df['Visit Period'].isin(visit_periods)) & 
-        (valid_df['Farmer ID'].notna()) & 
-        (valid_df['FE_Name'].notna())
-    ].copy() if not valid_df.empty else pd.DataFrame()
-    
-    if not valid_visits.empty:
-        valid_visits['Farmer ID'] = valid_visits['Farmer ID'].astype(str)
+    valid_fes, valid_visits = prepare_visit_rows(original_df, farminfo_df, cluster, dataset_type, calendar)
     
     visit_summary = []
     comparison_data = []
@@ -286,6 +288,9 @@ def analyze_visit_data(original_df, farminfo_df=None, cluster=None, selected_vis
     
     # Use all FEs from original_df for observation dataset
     all_fes = original_df['FE_Name'].dropna().unique() if dataset_type == 'observation' and 'FE_Name' in original_df.columns else valid_visits['FE_Name'].dropna().unique() if not valid_visits.empty else []
+    if fe_roster is not None:
+        # original_df holds only the selected periods' months; report the FEs the full history would
+        all_fes = fe_roster
     
     active_visits = visit_periods if selected_visits is None or 'All' in selected_visits else selected_visits
     
@@ -368,7 +373,177 @@ def analyze_visit_data(original_df, farminfo_df=None, cluster=None, selected_vis
     print(f"Debug: Visit Summary shape: {visit_summary_df.shape}, Comparison shape: {comparison_df.shape}, Detailed shape: {detailed_df.shape} ({dataset_type})")
     return visit_summary_df, comparison_df, detailed_df
 
-def get_combined_fe_breakdown(fe_name, farminfo_df, fieldvisit_df, rainfall_df, observation_df, cluster=None, selected_visits=None):
+@st.cache_data(show_spinner=False)
+def get_observation_rollup(version, calendar, _observation_df, _farminfo_df):
+    """Observation metric rollups per cluster, FE and visit period, built once per data version"""
+    observation_frame = build_observation_frame(_observation_df, _farminfo_df, get_calendar(calendar).classify_one)
+    return rollup_observation_metrics(observation_frame)
+
+@st.cache_data(show_spinner=False)
+def get_picking_yield(version, _observation_df, _farminfo_df):
+    """Long picking table with cumulative yield per farmer, built once per data version"""
+    return build_picking_yield(_observation_df, _farminfo_df)
+
+@st.cache_data(show_spinner=False)
+def get_yield_rollup(version, cluster, level, _pickings):
+    """Yield rollup for one cluster and hierarchy level, cached per data version"""
+    if cluster and cluster != "All":
+        _pickings = _pickings[_pickings['Cluster name'] == cluster]
+    return rollup_yield(_pickings, level)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_rainfall_cubes(version, _rainfall_df, _farminfo_df):
+    """Daily rainfall cubes per village and per cluster, built once per data version"""
+    events = explode_rainfall_events(_rainfall_df, _farminfo_df)
+    return {level: build_rainfall_cube(events, level) for level in CUBE_LEVELS}
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_pest_disease_incidence(version, _fieldvisit_df, _farminfo_df):
+    """Weekly pest/disease cubes per cluster, village and FE plus the co-occurrence matrix, once per data version"""
+    incidence = build_incidence_table(_fieldvisit_df, _farminfo_df)
+    return {
+        'cubes': {level: build_incidence_cube(incidence, level) for level in INCIDENCE_LEVELS},
+        'cooccurrence': pest_disease_cooccurrence(incidence)
+    }
+
+@st.cache_resource(show_spinner=False)
+def get_stage_timelines():
+    """Crop-stage timelines of the latest data versions, shared so the next version can extend them"""
+    return {}
+
+def get_stage_timeline(version, previous_version, data):
+    """Per-farmer crop-stage transitions once per data version, folding in only the change feed's new visits when a refresh just appended some"""
+    timelines = get_stage_timelines()
+    timeline = timelines.get(version)
+    if timeline is not None:
+        return timeline
+    previous = timelines.get(previous_version) if previous_version is not None else None
+    new_visits = get_change_feed(version, previous_version, data).records['fieldvisit'] if previous is not None else None
+    # Changed or removed visits can move a stage back, which only a full rebuild gets right
+    if new_visits is not None and (new_visits['Status'] == 'New').all():
+        timeline = previous.update(new_visits.drop(columns='Status'), data['farminfo'])
+    else:
+        timeline = StageTimeline.build(data['fieldvisit'], data['farminfo'])
+    timelines[version] = timeline
+    for old in list(timelines)[:-2]:
+        timelines.pop(old, None)
+    return timeline
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_farm_geometry(version, _farminfo_df):
+    """Parsed farm polygons, their spatial index and the area/overlap check, built once per data version"""
+    geometry = parse_farm_geometry(_farminfo_df)
+    index = FarmSpatialIndex(geometry)
+    return {'geometry': geometry, 'index': index, 'area_check': flag_overlaps(area_check(geometry, _farminfo_df), index)}
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def get_nearby_farms(version, radius_m, _index, _farminfo_df):
+    """Farm pairs within radius_m of each other, cached per data version and radius"""
+    return nearby_farms_table(_index, _farminfo_df, radius_m)
+
+@st.cache_data(show_spinner=False, max_entries=24)
+def get_map_polygons(version, cluster, detail, _geometry, _farminfo_df):
+    """Simplified farm polygons for one cluster and detail level, cached per data version"""
+    return map_polygons(_geometry, _farminfo_df, cluster, detail)
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def get_conflicts(version, calendar, _data):
+    """Ranked cross-dataset farmer conflicts, computed once per data version"""
+    return detect_conflicts(_data, get_calendar(calendar).classify_one)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_name_index(version, _farminfo_df):
+    """Blocking index over registered farmer names, built once per data version"""
+    return FarmerNameIndex(_farminfo_df)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_search_index(version, _data):
+    """Farmer ID/name search index with per-farmer row offsets, built once per data version"""
+    return FarmerSearchIndex(_data)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_event_index(version, _data):
+    """Per-farmer visit event index across all visit datasets, built once per data version"""
+    return EventIndex.build(_data)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_snapshots(version, _data):
+    """Snapshot history, recording the live data version as a delta on first use"""
+    try:
+        return record_snapshot(version, _data)
+    except OSError as e:
+        print(f"Debug: Could not record data snapshot: {e}")
+        return read_snapshot_manifest()
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_snapshot_data(snapshot_version):
+    """Datasets as of an earlier refresh, replayed in memory from the base and deltas"""
+    return replay_snapshot(read_snapshot_manifest(), snapshot_version)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_change_feed(version, previous_version, _data):
+    """Records new, changed or removed since the previous recorded refresh, diffed once per pair of versions"""
+    return ChangeFeed.build(get_snapshot_data(previous_version), _data)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_visit_table(version, _data):
+    """Visit rows of every dataset pre-joined to farm sowing date, cluster, village, variety and area, once per data version"""
+    return build_visit_table(_data)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_hierarchy_rollup(version, _data):
+    """Cluster/Village/FE/Farmer rollup tree of farmer counts, visits and coverage, once per data version"""
+    return build_hierarchy_rollup(_data['farminfo'], get_visit_table(version, _data))
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def get_cluster_comparison(version, calendar, _data):
+    """Side-by-side per-cluster measures for every cluster at once, once per data version and calendar"""
+    coded_rows, clusters, period_names = cluster_coded_rows(_data['farminfo'], get_visit_table(version, _data), _data['observation'], get_calendar_registry(), calendar)
+    return compare_clusters(coded_rows, clusters, period_names)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_timing_cubes(version, calendar, _visits):
+    """Farmers visited per location by days-after-sowing bucket and by visit period, per level, once per data version"""
+    slots = {
+        'Days after sowing': das_slots(_visits['Days After Sowing']),
+        'Visit period': period_slots(_visits['Visit Date'], get_calendar(calendar))
+    }
+    return {(axis, level): build_timing_cube(_visits, level, codes, labels) for axis, (codes, labels) in slots.items() for level in TIMING_LEVELS}
+
+@st.cache_resource(show_spinner=False)
+def get_alert_engine(calendar):
+    """Process-wide alert engine per calendar; each refresh folds in only the rows changed since the previous one"""
+    return AlertEngine(get_calendar(calendar).classify_one, DIGEST_PATH.with_name(f"alerts_digest_{calendar}.txt"))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_running_aggregates(version, calendar):
+    """Per FE and visit period aggregates streamed chunk by chunk from the data files, never holding a raw table"""
+    return ingest_aggregates(get_calendar_registry(), calendar)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_partition_index(version, calendar, override_cluster, _data):
+    """Season/month row index of every visit dataset under one calendar (or a cluster's override of it), built once per data version"""
+    return partition_index(_data, get_calendar(calendar, override_cluster))
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_fe_roster(version, dataset, calendar, cluster, _data):
+    """FEs the full history lists for one dataset, calendar and cluster, computed only when that view is first shown"""
+    return visit_fe_roster(_data[dataset], _data['farminfo'], cluster, dataset, calendar)
+
+def analyze_selected_visits(version, data, dataset, cluster, selected_visits, calendar):
+    """analyze_visit_data over only the rows in the season/month partitions covering the selected visit periods, or every row for 'All'"""
+    rows = None
+    if selected_visits and 'All' not in selected_visits:
+        # Clusters without an override share the calendar's index
+        override_cluster = cluster if (calendar, cluster) in get_calendar_registry().overrides else None
+        partitions = partitions_for_periods(get_calendar(calendar, override_cluster), selected_visits)
+        rows = rows_for_partitions(get_partition_index(version, calendar, override_cluster, data), dataset, partitions)
+    if rows is None:
+        return analyze_visit_data(data[dataset], data['farminfo'], cluster, selected_visits, dataset_type=dataset, calendar=calendar)
+    roster = get_fe_roster(version, dataset, calendar, cluster or 'All', data)
+    return analyze_visit_data(data[dataset].iloc[rows], data['farminfo'], cluster, selected_visits, dataset_type=dataset, calendar=calendar, fe_roster=roster)
+
+def get_combined_fe_breakdown(fe_name, farminfo_df, fieldvisit_df, rainfall_df, observation_df, cluster=None, selected_visits=None, calendar=DEFAULT_CALENDAR):
     """Generate combined breakdown for a selected FE across all datasets"""
     breakdown_data = {'Dataset': [], 'Category': [], 'Count': [], 'Farmer IDs': []}
     
@@ -383,9 +558,7 @@ def get_combined_fe_breakdown(fe_name, farminfo_df, fieldvisit_df, rainfall_df,
     
     # Filter valid observation rows
     if not observation_valid.empty:
-        observation_value_cols = [col for col in observation_valid.columns if ('avg' in col.lower() or 'plant height' in col.lower()) and col not in ['Farmer Name', 'FE_Name', 'Visit Date', 'Farmer ID', 'fid']]
-        if observation_value_cols:
-            observation_valid = observation_valid[observation_valid[observation_value_cols].notna().any(axis=1)]
+        observation_valid = observation_valid[observation_value_mask(observation_valid)]
     
     if cluster and cluster != "All" and not farminfo_df.empty and 'Cluster name' in farminfo_df.columns:
         cluster_farmers = farminfo_df[farminfo_df['Cluster name'] == cluster]['Farmer ID'].dropna().unique()
@@ -398,12 +571,7 @@ def get_combined_fe_breakdown(fe_name, farminfo_df, fieldvisit_df, rainfall_df,
     rainfall_fe_exists = not rainfall_valid.empty and 'FE_Name' in rainfall_valid.columns and fe_name in rainfall_valid['FE_Name'].values
     observation_fe_exists = not observation_df.empty and 'FE_Name' in observation_df.columns and fe_name in observation_df['FE_Name'].values
     
-    visit_periods = [
-        'First Visit', 'Second Visit', 'Third Visit', 'Fourth Visit', 'Fifth Visit', 
-        'Sixth Visit', 'Seventh Visit', 'Eighth Visit', 'Ninth Visit', 'Tenth Visit',
-        'Eleventh Visit', 'Twelfth Visit', 'Thirteenth Visit', 'Fourteenth Visit',
-        'Fifteenth Visit', 'Sixteenth Visit'
-    ]
+    visit_periods = VISIT_PERIOD_NAMES
     active_visits = visit_periods if selected_visits is None or 'All' in selected_visits else selected_visits
     
     # Farminfo data
@@ -435,7 +603,7 @@ def get_combined_fe_breakdown(fe_name, farminfo_df, fieldvisit_df, rainfall_df,
             breakdown_data['Count'].append(0)
             breakdown_data['Farmer IDs'].append(f'FE {fe_name} not found in Fieldvisit dataset')
     else:
-        _, _, detailed_df = analyze_visit_data(fieldvisit_valid, farminfo_df, cluster, selected_visits, dataset_type='fieldvisit')
+        _, _, detailed_df = analyze_visit_data(fieldvisit_valid, farminfo_df, cluster, selected_visits, dataset_type='fieldvisit', calendar=calendar)
         fe_fieldvisit = detailed_df[detailed_df['FE Name'] == fe_name] if not detailed_df.empty else pd.DataFrame()
         for vp in active_visits:
             breakdown_data['Dataset'].append('Fieldvisit')
@@ -471,7 +639,7 @@ def get_combined_fe_breakdown(fe_name, farminfo_df, fieldvisit_df, rainfall_df,
             breakdown_data['Count'].append(0)
             breakdown_data['Farmer IDs'].append(f'FE {fe_name} not found in Rainfall dataset')
     else:
-        _, _, detailed_df = analyze_visit_data(rainfall_valid, farminfo_df, cluster, selected_visits, dataset_type='rainfall')
+        _, _, detailed_df = analyze_visit_data(rainfall_valid, farminfo_df, cluster, selected_visits, dataset_type='rainfall', calendar=calendar)
         fe_rainfall = detailed_df[detailed_df['FE Name'] == fe_name] if not detailed_df.empty else pd.DataFrame()
         for vp in active_visits:
             breakdown_data['Dataset'].append('Rainfall')
@@ -508,8 +676,7 @@ def get_combined_fe_breakdown(fe_name, farminfo_df, fieldvisit_df, rainfall_df,
             breakdown_data['Farmer IDs'].append(f'FE {fe_name} not found in Observation dataset')
     else:
         fe_observation_original = observation_df[observation_df['FE_Name'] == fe_name] if not observation_df.empty else pd.DataFrame()
-        observation_value_cols = [col for col in observation_df.columns if ('avg' in col.lower() or 'plant height' in col.lower()) and col not in ['Farmer Name', 'FE_Name', 'Visit Date', 'Farmer ID', 'fid']] if not observation_df.empty else []
-        has_valid_data = not fe_observation_original.empty and observation_value_cols and fe_observation_original[observation_value_cols].notna().any(axis=1).any()
+        has_valid_data = not fe_observation_original.empty and observation_value_mask(fe_observation_original).any()
         
         if not has_valid_data:
             for vp in active_visits:
@@ -522,7 +689,7 @@ def get_combined_fe_breakdown(fe_name, farminfo_df, fieldvisit_df, rainfall_df,
                 breakdown_data['Count'].append(len(farminfo_farmers))
                 breakdown_data['Farmer IDs'].append(', '.join(sorted(farminfo_farmers)) if farminfo_farmers else '0')
         else:
-            _, _, detailed_df = analyze_visit_data(observation_valid, farminfo_df, cluster, selected_visits, dataset_type='observation')
+            _, _, detailed_df = analyze_visit_data(observation_valid, farminfo_df, cluster, selected_visits, dataset_type='observation', calendar=calendar)
             fe_observation = detailed_df[detailed_df['FE Name'] == fe_name] if not detailed_df.empty else pd.DataFrame()
             for vp in active_visits:
                 breakdown_data['Dataset'].append('Observation')
@@ -550,6 +717,78 @@ def get_combined_fe_breakdown(fe_name, farminfo_df, fieldvisit_df, rainfall_df,
     print(f"Debug: Combined FE Breakdown shape: {combined_df.shape}")
     return combined_df
 
+def combine_summary_table(all_fes, farminfo_summary, visit_summaries, active_visits):
+    """FE x (dataset, visit period) farmer counts next to the registered farmer count"""
+    pivots = []
+    for key, summary_df in visit_summaries.items():
+        if not summary_df.empty:
+            pivot = summary_df.pivot(index='FE Name', columns='Visit Period', values='Farmer Count').fillna(0)
+            pivot.columns = pd.MultiIndex.from_product([[key.capitalize()], pivot.columns])
+        else:
+            pivot = pd.DataFrame(index=all_fes, columns=pd.MultiIndex.from_product([[key.capitalize()], active_visits])).fillna(0)
+        pivots.append(pivot)
+    return pd.concat([farminfo_summary] + pivots, axis=1).reindex(all_fes).fillna(0).astype(int)
+
+def render_low_memory_dashboard(tenant, calendar):
+    """Dashboard served only from streamed aggregates, for deployments without the memory to load the raw tables"""
+    version = data_version()
+    with st.spinner("Streaming data into aggregates..."):
+        aggregates = get_running_aggregates(version, calendar)
+    st.info("Low-memory mode: tables are computed from streamed per-FE aggregates; record-level views are not available.")
+    
+    cluster_options = ['All'] + aggregates.cluster_names()
+    if tenant['clusters']:
+        cluster_options = [cluster for cluster in cluster_options if cluster in tenant['clusters']]
+    selected_cluster = st.selectbox("Select Cluster:", options=cluster_options, key="global_cluster_selector")
+    visit_periods = ['All'] + VISIT_PERIOD_NAMES
+    selected_visits = st.multiselect("Select Visit Periods (select 'All' to include all visits):", 
+                                     options=visit_periods, 
+                                     default=[tenant['default_visit']],
+                                     key="global_visit_selector")
+    active_visits = visit_periods[1:] if 'All' in selected_visits else selected_visits
+    
+    metric_cols = st.columns(len(aggregates.rows) + 1)
+    for metric_col, (key, rows) in zip(metric_cols, aggregates.rows.items()):
+        with metric_col:
+            st.metric(f"{key.capitalize()} Records", rows)
+    with metric_cols[-1]:
+        st.metric("Aggregate Size (KB)", round(aggregates.memory_bytes() / 1024, 1))
+    
+    summary_tab, fieldvisit_tab, rainfall_tab, observation_tab = st.tabs(["📊 Summary Table", "🏃‍♂️ Fieldvisit Analysis", "🌧️ Rainfall Analysis", "🔭 Observation Analysis"])
+    
+    with summary_tab:
+        all_fes = aggregates.fe_names(selected_cluster)
+        if not all_fes:
+            st.error("No Field Executives found in any dataset")
+        else:
+            farminfo_summary = aggregates.registration_summary(selected_cluster)
+            farminfo_summary = farminfo_summary.set_index('FE Name')[['Farmer Count']].rename(columns={'Farmer Count': 'Farminfo'}) if not farminfo_summary.empty else pd.DataFrame(index=all_fes, columns=['Farminfo'])
+            visit_summaries = {key: aggregates.visit_analysis(key, selected_cluster, selected_visits)[0] for key in VISIT_DATE_COLUMNS}
+            summary_table = combine_summary_table(all_fes, farminfo_summary, visit_summaries, active_visits)
+            st.dataframe(summary_table, use_container_width=True)
+            render_download_buttons(summary_table.rename_axis('FE Name'), export_file_stem('summary_table', selected_cluster, selected_visits), key="summary_table_download", index=True)
+            record_counts_df = aggregates.record_counts(selected_cluster, selected_visits)
+            if not record_counts_df.empty:
+                st.write("**Visit records in the selected periods**")
+                st.dataframe(record_counts_df, use_container_width=True)
+    
+    for key, tab in [('fieldvisit', fieldvisit_tab), ('rainfall', rainfall_tab), ('observation', observation_tab)]:
+        with tab:
+            _, comparison_df, detailed_df = aggregates.visit_analysis(key, selected_cluster, selected_visits)
+            if comparison_df.empty:
+                st.error(f"No {key} data available")
+                continue
+            st.subheader("📊 Unique Farmers per Visit Period")
+            st.dataframe(comparison_df, use_container_width=True)
+            render_download_buttons(comparison_df, export_file_stem(f'{key}_comparison', selected_cluster, selected_visits), key=f"aggregate_{key}_download")
+            with st.expander("Detailed breakdown"):
+                st.dataframe(detailed_df, use_container_width=True)
+            if key == 'observation':
+                means_df = aggregates.metric_means(selected_cluster, active_visits)
+                if not means_df.empty:
+                    st.subheader("📏 Observation Metric Means")
+                    st.dataframe(means_df, use_container_width=True)
+
 def get_missing_fes(data, cluster=None):
     """Identify FEs present in one dataset but missing in others, with optional cluster filtering"""
     # Collect unique FEs from each dataset
@@ -584,7 +823,24 @@ def get_missing_fes(data, cluster=None):
     print(f"Debug: Missing FEs shape: {missing_df.shape}")
     return missing_df
 
-def main():
+def main(default_tenant=DEFAULT_TENANT):
+    setup_page()
+    registry = get_calendar_registry()
+    tenant_names = list(registry.tenants)
+    requested_tenant = st.query_params.get('tenant', default_tenant)
+    tenant_name = st.sidebar.selectbox("Dashboard:", options=tenant_names,
+                                       index=tenant_names.index(requested_tenant if requested_tenant in tenant_names else default_tenant),
+                                       format_func=lambda name: registry.tenant(name)['title'],
+                                       key="tenant_selector")
+    st.query_params['tenant'] = tenant_name
+    tenant = registry.tenant(tenant_name)
+    calendar = tenant['calendar']
+    # Filters start from the tenant's defaults whenever the tenant changes
+    if st.session_state.get('active_tenant') != tenant_name:
+        for key in ("global_cluster_selector", "global_visit_selector"):
+            st.session_state.pop(key, None)
+        st.session_state['active_tenant'] = tenant_name
+    
     st.markdown(
     """
     <h1 class="main-header">
@@ -596,27 +852,145 @@ def main():
     unsafe_allow_html=True
 )
     
+    if LOW_MEMORY:
+        render_low_memory_dashboard(tenant, calendar)
+        return
+    
+    version = data_version()
     with st.spinner("Loading data..."):
-        data = load_data()
+        data = load_data(version)
+    
+    snapshots = get_snapshots(version, data)
+    snapshot_entries = {entry['version']: entry for entry in (snapshots or {}).get('versions', [])}
+    as_of_options = [version] + [past for past in reversed(snapshot_entries) if past != version]
+    as_of_version = st.sidebar.selectbox("Data as of refresh:", options=as_of_options,
+                                         format_func=lambda v: "Latest" if v == version else f"{snapshot_entries[v]['recorded'].replace('T', ' ')} (#{snapshot_entries[v]['seq']})",
+                                         key="snapshot_as_of")
+    viewing_snapshot = as_of_version != version
+    if viewing_snapshot:
+        with st.spinner("Replaying snapshot..."):
+            data = get_snapshot_data(as_of_version)
+        version = as_of_version
+        st.info(f"Showing the data as of the refresh recorded {snapshot_entries[as_of_version]['recorded'].replace('T', ' ')}")
+    if len(snapshot_entries) > 1:
+        with st.sidebar.expander("Refresh history"):
+            st.dataframe(snapshot_history(snapshots).drop(columns='Version').set_index('Snapshot').iloc[::-1], use_container_width=True)
     
     cluster_options = ['All']
     if not data['farminfo'].empty and 'Cluster name' in data['farminfo'].columns:
         cluster_options.extend(sorted(data['farminfo']['Cluster name'].dropna().unique()))
+    if tenant['clusters']:
+        cluster_options = [cluster for cluster in cluster_options if cluster in tenant['clusters']]
     
     selected_cluster = st.selectbox("Select Cluster:", options=cluster_options, key="global_cluster_selector")
     
-    visit_periods = [
-        'All', 'First Visit', 'Second Visit', 'Third Visit', 'Fourth Visit', 'Fifth Visit', 
-        'Sixth Visit', 'Seventh Visit', 'Eighth Visit', 'Ninth Visit', 'Tenth Visit',
-        'Eleventh Visit', 'Twelfth Visit', 'Thirteenth Visit', 'Fourteenth Visit',
-        'Fifteenth Visit', 'Sixteenth Visit'
-    ]
+    visit_periods = ['All'] + VISIT_PERIOD_NAMES
     selected_visits = st.multiselect("Select Visit Periods (select 'All' to include all visits):", 
                                      options=visit_periods, 
-                                     default=['Eleventh Visit'],
+                                     default=[tenant['default_visit']],
                                      key="global_visit_selector")
     
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📋 Farminfo Analysis", "🏃‍♂️ Fieldvisit Analysis", "🌧️ Rainfall Analysis", "🔗 Combined FE Analysis", "🔭 Observation Analysis", "📊 Summary Table"])
+    with st.expander("🔎 Farmer Search"):
+        search_index = get_search_index(version, data)
+        search_query = st.text_input("Farmer ID prefix or part of the name:", key="farmer_search_query")
+        search_results = search_index.search(search_query)
+        if search_query and search_results.empty:
+            st.info(f"No farmer matches '{search_query}'")
+        elif not search_results.empty:
+            result_labels = [f"{row['Farmer ID']} - {row['Farmer Name']}" if pd.notna(row['Farmer Name']) else str(row['Farmer ID'])
+                             for _, row in search_results.iterrows()]
+            picked = st.selectbox("Matching farmers:", options=range(len(result_labels)), format_func=result_labels.__getitem__, key="farmer_search_pick")
+            picked_id = int(search_results.loc[picked, 'Farmer ID'])
+            st.write(f"**Timeline of Farmer {picked_id}**")
+            st.dataframe(search_index.timeline(picked_id), use_container_width=True)
+            for dataset_key, farmer_rows in search_index.records(picked_id).items():
+                if not farmer_rows.empty:
+                    st.write(f"**{dataset_key.capitalize()} ({len(farmer_rows)} records)**")
+                    st.dataframe(farmer_rows.dropna(axis=1, how='all'), use_container_width=True)
+    
+    # Alerts follow the live data only; replaying an old snapshot must not move the engine's baseline
+    if not viewing_snapshot:
+        alert_engine = get_alert_engine(calendar)
+        alert_engine.refresh(version, data)
+        with st.expander("🚨 Alerts"):
+            threshold_cols = st.columns(3)
+            with threshold_cols[0]:
+                min_farmers = st.number_input("Minimum farmers per FE:", min_value=1, max_value=100, value=ALERT_THRESHOLDS['min_farmers_per_fe'], key="alert_min_farmers")
+            with threshold_cols[1]:
+                max_gap = st.number_input("Maximum days without a visit:", min_value=1, max_value=365, value=ALERT_THRESHOLDS['max_days_between_visits'], key="alert_max_gap")
+            with threshold_cols[2]:
+                min_coverage = st.slider("Minimum period coverage:", min_value=0.0, max_value=1.0, value=ALERT_THRESHOLDS['min_period_coverage'], step=0.05, key="alert_min_coverage")
+            alerts_df = alert_engine.evaluate({
+                'min_farmers_per_fe': int(min_farmers),
+                'max_days_between_visits': int(max_gap),
+                'min_period_coverage': float(min_coverage)
+            })
+            if selected_cluster != "All":
+                alerts_df = alerts_df[alerts_df['Cluster name'] == selected_cluster]
+            if not alerts_df.empty:
+                alert_cols = st.columns(len(alerts_df['Rule'].unique()) + 1)
+                for alert_col, (rule, count) in zip(alert_cols, alerts_df['Rule'].value_counts().items()):
+                    with alert_col:
+                        st.metric(rule, int(count))
+                with alert_cols[-1]:
+                    st.metric("New since last refresh", int(alerts_df['New'].sum()))
+                st.dataframe(alerts_df, use_container_width=True)
+                render_download_buttons(alerts_df, export_file_stem('alerts', selected_cluster), key="alerts_download")
+            else:
+                st.success("No open alerts!")
+    
+    recorded_versions = list(snapshot_entries)
+    previous_version = recorded_versions[recorded_versions.index(version) - 1] if version in recorded_versions and recorded_versions.index(version) > 0 else None
+    if previous_version is not None:
+        with st.expander(f"🆕 What's New Since the Refresh of {snapshot_entries[previous_version]['recorded'].replace('T', ' ')}"):
+            change_feed = get_change_feed(version, previous_version, data)
+            feed_summary = change_feed.summary()
+            feed_cols = st.columns(4)
+            with feed_cols[0]:
+                st.metric("New Farmers", int(len(change_feed.new_farmers())))
+            with feed_cols[1]:
+                st.metric("New Visit Records", int(feed_summary.loc[list(VISIT_DATE_COLUMNS), 'New'].sum()))
+            with feed_cols[2]:
+                st.metric("Changed Records", int(feed_summary['Changed'].sum()))
+            with feed_cols[3]:
+                st.metric("Removed Records", int(feed_summary['Removed'].sum()))
+            if change_feed.new_fes:
+                st.write(f"**New FEs:** {', '.join(change_feed.new_fes)}")
+            fe_changes_df = change_feed.by_fe()
+            if selected_cluster != "All" and not fe_changes_df.empty:
+                cluster_fes = data['farminfo'].loc[data['farminfo']['Cluster name'] == selected_cluster, 'FE_Name'].dropna().unique()
+                fe_changes_df = fe_changes_df[fe_changes_df['FE Name'].isin(cluster_fes)]
+            if not fe_changes_df.empty:
+                st.write("**Changes per FE**")
+                st.dataframe(fe_changes_df, use_container_width=True)
+                feed_dataset = st.selectbox("Records from:", options=list(change_feed.records), format_func=str.capitalize, key="change_feed_dataset")
+                feed_records = change_feed.records[feed_dataset]
+                if selected_cluster != "All" and 'FE_Name' in feed_records.columns:
+                    feed_records = feed_records[feed_records['FE_Name'].isin(fe_changes_df['FE Name'])]
+                st.dataframe(feed_records.dropna(axis=1, how='all'), use_container_width=True)
+                render_download_buttons(feed_records, export_file_stem(f'{feed_dataset}_changes', selected_cluster), key="change_feed_download")
+            else:
+                st.success("No records changed since the previous refresh")
+    
+    if st.sidebar.checkbox("Compare all clusters", key="cluster_comparison_mode"):
+        st.subheader("⚖️ Cluster Comparison")
+        comparison_df = get_cluster_comparison(version, calendar, data)
+        comparison_df = comparison_df[comparison_df.index.isin(cluster_options)]
+        if not comparison_df.empty:
+            st.dataframe(comparison_df.T, use_container_width=True)
+            comparison_chart = alt.Chart(period_visits_long(comparison_df)).mark_bar().encode(
+                x=alt.X('Visit Period:N', sort=get_calendar(calendar).period_names, title='Visit Period'),
+                xOffset='Cluster name:N',
+                y=alt.Y('Visits:Q', title='Visits'),
+                color=alt.Color('Cluster name:N', title='Cluster'),
+                tooltip=['Cluster name', 'Visit Period', 'Visits']
+            )
+            st.altair_chart(comparison_chart, use_container_width=True)
+            render_download_buttons(comparison_df, export_file_stem('cluster_comparison'), key="cluster_comparison_download", index=True)
+        else:
+            st.info("No cluster data to compare")
+    
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["📋 Farminfo Analysis", "🏃‍♂️ Fieldvisit Analysis", "🌧️ Rainfall Analysis", "🔗 Combined FE Analysis", "🔭 Observation Analysis", "📊 Summary Table", "🗺️ Farm Map"])
     
     with tab1:
         st.markdown('<h2 class="tab-subheader">📋 Farminfo Data Analysis</h2>', unsafe_allow_html=True)
@@ -644,10 +1018,35 @@ def main():
             with col3:
                 st.metric("Unique Farmers", valid_df['Farmer ID'].nunique() if not valid_df.empty and 'Farmer ID' in valid_df.columns else 0)
             
+            st.subheader("🌳 Cluster → Village → FE → Farmer Drill-down")
+            hierarchy = get_hierarchy_rollup(version, data)
+            drill_path = () if selected_cluster == "All" else (selected_cluster,)
+            drill_levels = LEVEL_LABELS[len(drill_path) + 1:len(HIERARCHY_LEVELS)]
+            drill_cols = st.columns(len(drill_levels))
+            for drill_col, drill_level in zip(drill_cols, drill_levels):
+                with drill_col:
+                    drill_choice = st.selectbox(f"{drill_level}:", options=['All', *hierarchy.child_keys(drill_path)], key=f"drill_{drill_level.lower()}")
+                if drill_choice == 'All':
+                    break
+                drill_path += (drill_choice,)
+            drill_node = hierarchy.node(drill_path)
+            if drill_node is not None:
+                node_cols = st.columns(1 + len(VISIT_DATE_COLUMNS))
+                with node_cols[0]:
+                    st.metric("Registered Farmers", int(drill_node['Farmers']))
+                for node_col, dataset in zip(node_cols[1:], VISIT_DATE_COLUMNS):
+                    with node_col:
+                        st.metric(f"{dataset.capitalize()} Coverage", f"{drill_node[f'{dataset.capitalize()} Coverage']:.0%}")
+                children_df = hierarchy.children(drill_path)
+                st.write(f"**{LEVEL_LABELS[len(drill_path) + 1]} rollup for {' / '.join(str(key) for key in drill_path) or 'all clusters'}**")
+                st.dataframe(children_df, use_container_width=True)
+                render_download_buttons(children_df, export_file_stem('_'.join(['rollup', *(str(key) for key in drill_path)])), key="hierarchy_rollup_download")
+            
             st.subheader("📊 FE Performance Summary")
             summary_df = create_fe_summary_table(original_df, valid_df, selected_cluster)
             if not summary_df.empty:
                 st.dataframe(summary_df, use_container_width=True)
+                render_download_buttons(summary_df, export_file_stem('farminfo_fe_summary', selected_cluster), key="farminfo_summary_download")
                 if st.button("Show Chart for FE Performance Summary", key="farminfo_summary_chart"):
                     chart_data = summary_df.set_index('FE Name')['Farmer Count']
                     st.bar_chart(chart_data)
@@ -673,6 +1072,37 @@ def main():
                 else:
                     st.info("No valid farmer data to check for duplicates")
                 
+                st.subheader("📍 Nearby Farms")
+                nearby_radius = st.number_input("Distance between farm centres (m):", min_value=10, max_value=5000, value=50, step=10, key="nearby_farm_radius")
+                nearby_df = get_nearby_farms(version, float(nearby_radius), get_farm_geometry(version, data['farminfo'])['index'], data['farminfo'])
+                if selected_cluster != "All":
+                    nearby_df = nearby_df[nearby_df['Cluster name'] == selected_cluster]
+                if not nearby_df.empty:
+                    st.markdown(f'<div class="warning-text">{(~nearby_df["Same FE"]).sum()} of {len(nearby_df)} nearby pairs were mapped by different FEs — possible duplicate farms:</div>', unsafe_allow_html=True)
+                    st.dataframe(nearby_df, use_container_width=True)
+                    render_download_buttons(nearby_df, export_file_stem('nearby_farms', selected_cluster), key="nearby_farms_download")
+                else:
+                    st.success(f"No two mapped farms lie within {nearby_radius} m of each other!")
+                
+                st.subheader("📐 Farm Boundary Check")
+                boundary_df = get_farm_geometry(version, data['farminfo'])['area_check']
+                if selected_cluster != "All":
+                    boundary_df = boundary_df[boundary_df['Cluster name'] == selected_cluster]
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Mapped Farms", int(boundary_df['Mapped Area (acres)'].notna().sum()))
+                with col2:
+                    st.metric("Mapped Area (acres)", f"{boundary_df['Mapped Area (acres)'].sum():.1f}")
+                with col3:
+                    st.metric(f"Area Mismatch (>{AREA_TOLERANCE:.0%})", int((boundary_df['Status'] == 'Area mismatch').sum()))
+                flagged_df = boundary_df[boundary_df['Status'] != 'OK']
+                if not flagged_df.empty:
+                    st.markdown('<div class="warning-text">Farms whose mapped boundary disagrees with the declared sowing area:</div>', unsafe_allow_html=True)
+                    st.dataframe(flagged_df, use_container_width=True)
+                    render_download_buttons(flagged_df, export_file_stem('farm_boundary_check', selected_cluster), key="farm_boundary_download")
+                else:
+                    st.success("All mapped boundaries match the declared sowing area!")
+                
                 st.subheader("🔍 Individual FE Breakdown")
                 if 'FE_Name' in original_df.columns:
                     selected_fe = st.selectbox("Select FE for detailed analysis:", 
@@ -722,11 +1152,53 @@ def main():
                 else:
                     st.metric("Visit Records", 0)
             
-            visit_summary_df, comparison_df, detailed_df = analyze_visit_data(original_df, data['farminfo'], selected_cluster, selected_visits, dataset_type='fieldvisit')
+            st.subheader("🐛 Pest & Disease Incidence")
+            incidence = get_pest_disease_incidence(version, data['fieldvisit'], data['farminfo'])
+            incidence_level = st.radio("Level:", options=list(INCIDENCE_LEVELS), horizontal=True, key="incidence_level")
+            incidence_kind = st.radio("Type:", options=['Pest', 'Disease'], horizontal=True, key="incidence_kind")
+            incidence_cube = incidence['cubes'][incidence_level]
+            weekly_df = incidence_cube.weekly(selected_cluster, incidence_kind)
+            if not weekly_df.empty and weekly_df.to_numpy().any():
+                st.write(f"**Farmers reporting each {incidence_kind.lower()} per week**")
+                st.line_chart(weekly_df, use_container_width=True)
+                hotspots_df = incidence_cube.hotspots(cluster=selected_cluster, kind=incidence_kind)
+                if not hotspots_df.empty:
+                    st.write(f"**{incidence_level} hotspots in the latest week ({pd.Timestamp(incidence_cube.weeks[-1]).date()})**")
+                    st.dataframe(hotspots_df, use_container_width=True)
+                if st.button("Show Pest × Disease Co-occurrence", key="incidence_cooccurrence"):
+                    cooccurrence_df = cooccurrence_matrix(incidence['cooccurrence'], selected_cluster)
+                    if not cooccurrence_df.empty:
+                        st.dataframe(cooccurrence_df, use_container_width=True)
+                    else:
+                        st.info("No farmer reported a pest and a disease in the same week")
+            else:
+                st.info(f"No {incidence_kind.lower()} incidence reported for the selected cluster")
+            
+            st.subheader("🌱 Crop Stage Progression")
+            stage_timeline = get_stage_timeline(version, previous_version, data)
+            current_stages = stage_timeline.current_stages(selected_cluster)
+            if not current_stages.empty:
+                stage_counts = current_stages['Stage Name'].value_counts().reindex(CROP_STAGES, fill_value=0)
+                st.write("**Farmers by current crop stage**")
+                st.bar_chart(stage_counts[stage_counts > 0], use_container_width=True)
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.write("**Median days per stage**")
+                    st.dataframe(stage_timeline.median_days_per_stage(selected_cluster), use_container_width=True)
+                with col2:
+                    lagging_df = stage_timeline.lagging_farmers(selected_cluster)
+                    st.write(f"**Lagging farmers ({len(lagging_df)})**")
+                    st.dataframe(lagging_df, use_container_width=True)
+                    render_download_buttons(lagging_df, export_file_stem('lagging_farmers', selected_cluster, selected_visits), key="lagging_farmers_download")
+            else:
+                st.info("No crop stage reported for the selected cluster")
+            
+            visit_summary_df, comparison_df, detailed_df = analyze_selected_visits(version, data, 'fieldvisit', selected_cluster, selected_visits, calendar)
             
             if not comparison_df.empty:
                 st.subheader("📊 FE Visit Comparison Summary")
                 st.dataframe(comparison_df, use_container_width=True)
+                render_download_buttons(comparison_df, export_file_stem('fieldvisit_comparison_summary', selected_cluster, selected_visits), key="fieldvisit_comparison_download")
                 if st.button("Show Chart for FE Visit Comparison Summary", key="fieldvisit_comparison_chart"):
                     chart_data = comparison_df.set_index('FE Name')
                     if 'All' in selected_visits:
@@ -737,6 +1209,8 @@ def main():
                 
                 st.subheader("📅 Visit Period Analysis")
                 visit_list = visit_periods[1:] if 'All' in selected_visits else selected_visits
+                period_detail = detailed_df[detailed_df['Category'].isin([f'{vp} Farmers' for vp in visit_list])]
+                render_download_buttons(period_detail, export_file_stem('fieldvisit_period_detail', selected_cluster, selected_visits), key="fieldvisit_period_detail_download")
                 
                 for vp in visit_list:
                     st.write(f"**{vp} Analysis**")
@@ -807,11 +1281,33 @@ def main():
                 else:
                     st.metric("Visit Records", 0)
             
-            visit_summary_df, comparison_df, detailed_df = analyze_visit_data(original_df, data['farminfo'], selected_cluster, selected_visits, dataset_type='rainfall')
+            st.subheader("🌦️ Rainfall Calendar")
+            rainfall_cubes = get_rainfall_cubes(version, data['rainfall'], data['farminfo'])
+            cube_level = st.radio("Level:", options=list(CUBE_LEVELS), horizontal=True, key="rainfall_cube_level")
+            cube_value = st.radio("Show:", options=['Rain reports', 'Max intensity'], horizontal=True, key="rainfall_cube_value")
+            cube = rainfall_cubes[cube_level]
+            heatmap_df = cube.heatmap(selected_cluster, value='counts' if cube_value == 'Rain reports' else 'intensity')
+            if not heatmap_df.empty:
+                heatmap = alt.Chart(heatmap_df).mark_rect().encode(
+                    x=alt.X('yearmonthdate(Date):O', title='Date', axis=alt.Axis(labelAngle=-90)),
+                    y=alt.Y('Location:N', title=cube_level),
+                    color=alt.Color('Value:Q', title=cube_value),
+                    tooltip=['Location', 'Date', 'Value']
+                )
+                st.altair_chart(heatmap, use_container_width=True)
+                
+                st.write("**Days Since Last Heavy Rain**")
+                as_of = st.date_input("As of:", value=cube.dates[-1].date(), min_value=cube.dates[0].date(), key="rainfall_as_of")
+                st.dataframe(cube.days_since_heavy_rain(as_of, selected_cluster), use_container_width=True)
+            else:
+                st.info("No rainfall events reported for the selected cluster")
+            
+            visit_summary_df, comparison_df, detailed_df = analyze_selected_visits(version, data, 'rainfall', selected_cluster, selected_visits, calendar)
             
             if not comparison_df.empty:
                 st.subheader("📊 FE Visit Comparison Summary")
                 st.dataframe(comparison_df, use_container_width=True)
+                render_download_buttons(comparison_df, export_file_stem('rainfall_comparison_summary', selected_cluster, selected_visits), key="rainfall_comparison_download")
                 if st.button("Show Chart for FE Visit Comparison Summary", key="rainfall_comparison_chart"):
                     chart_data = comparison_df.set_index('FE Name')
                     if 'All' in selected_visits:
@@ -822,6 +1318,8 @@ def main():
                 
                 st.subheader("📅 Visit Period Analysis")
                 visit_list = visit_periods[1:] if 'All' in selected_visits else selected_visits
+                period_detail = detailed_df[detailed_df['Category'].isin([f'{vp} Farmers' for vp in visit_list])]
+                render_download_buttons(period_detail, export_file_stem('rainfall_period_detail', selected_cluster, selected_visits), key="rainfall_period_detail_download")
                 
                 for vp in visit_list:
                     st.write(f"**{vp} Analysis**")
@@ -868,6 +1366,78 @@ def main():
             st.markdown('<div class="warning-text">FEs not present in other datasets:</div>', unsafe_allow_html=True)
             st.dataframe(missing_fes_df, use_container_width=True)
         
+        st.subheader("⚔️ Cross-Dataset Conflicts")
+        conflicts_df = get_conflicts(version, calendar, data)
+        if selected_cluster != "All":
+            conflicts_df = conflicts_df[conflicts_df['Cluster name'] == selected_cluster]
+        conflict_types = st.multiselect("Conflict types:", options=list(CONFLICT_WEIGHTS), default=list(CONFLICT_WEIGHTS), key="conflict_types")
+        conflicts_df = conflicts_df[conflicts_df['Conflict'].isin(conflict_types)]
+        if not conflicts_df.empty:
+            conflict_cols = st.columns(len(CONFLICT_WEIGHTS))
+            for conflict_col, conflict_type in zip(conflict_cols, CONFLICT_WEIGHTS):
+                with conflict_col:
+                    st.metric(conflict_type, int((conflicts_df['Conflict'] == conflict_type).sum()))
+            st.dataframe(conflicts_df, use_container_width=True)
+            render_download_buttons(conflicts_df, export_file_stem('cross_dataset_conflicts', selected_cluster), key="conflicts_download")
+        else:
+            st.success("No conflicting farmer records found across datasets!")
+        
+        st.subheader("🧩 Farmer Name Matching")
+        recoveries_df = propose_id_recoveries(data, get_name_index(version, data['farminfo']))
+        if selected_cluster != "All":
+            cluster_fes = data['farminfo'].loc[data['farminfo']['Cluster name'] == selected_cluster, 'FE_Name'].dropna().unique()
+            recoveries_df = recoveries_df[recoveries_df['FE_Name'].isin(cluster_fes)]
+        if not recoveries_df.empty:
+            st.write(f"**Proposed Farmer IDs for {len(recoveries_df)} visit records with a farmer name but no Farmer ID**")
+            st.dataframe(recoveries_df, use_container_width=True)
+            render_download_buttons(recoveries_df, export_file_stem('farmer_id_recoveries', selected_cluster), key="id_recoveries_download")
+        else:
+            st.success("Every named visit record carries a Farmer ID!")
+        variants_df = village_variants(data['farminfo'])
+        if selected_cluster != "All":
+            variants_df = variants_df[variants_df['Cluster name'] == selected_cluster]
+        if not variants_df.empty:
+            st.write("**Village spelling variants**")
+            st.dataframe(variants_df, use_container_width=True)
+        
+        st.subheader("⏱️ Visit Gaps")
+        event_index = get_event_index(version, data)
+        last_event = event_index.events()['Date'].max() if len(event_index) else pd.Timestamp.today()
+        gap_cols = st.columns(2)
+        with gap_cols[0]:
+            gap_days = st.number_input("No visit for at least (days):", min_value=1, max_value=365, value=GAP_DAYS, key="visit_gap_days")
+        with gap_cols[1]:
+            gap_as_of = st.date_input("As of:", value=last_event, key="visit_gap_as_of")
+        gaps_df = visit_gaps(event_index, data['farminfo'], gap_days, gap_as_of)
+        if selected_cluster != "All":
+            gaps_df = gaps_df[gaps_df['Cluster name'] == selected_cluster]
+        if not gaps_df.empty:
+            st.write(f"**{len(gaps_df)} farmers with no visit in the last {gap_days} days** ({int(gaps_df['Last Visit'].isna().sum())} never visited)")
+            st.dataframe(gaps_df, use_container_width=True)
+            render_download_buttons(gaps_df, export_file_stem('visit_gaps', selected_cluster), key="visit_gaps_download")
+        else:
+            st.success(f"Every farmer was visited in the last {gap_days} days!")
+        
+        st.subheader("🌱 Visit Timing After Sowing")
+        visit_table = get_visit_table(version, data)
+        timing_cols = st.columns(3)
+        with timing_cols[0]:
+            timing_axis = st.radio("Group visits by:", options=['Days after sowing', 'Visit period'], horizontal=True, key="timing_axis")
+        with timing_cols[1]:
+            timing_level = st.radio("Level:", options=list(TIMING_LEVELS), horizontal=True, key="timing_level")
+        with timing_cols[2]:
+            timing_dataset = st.selectbox("Dataset:", options=['All', *VISIT_DATE_COLUMNS], key="timing_dataset")
+        timing_cube = get_timing_cubes(version, calendar, visit_table)[(timing_axis, timing_level)]
+        timing_df = timing_cube.table(selected_cluster, None if timing_dataset == 'All' else timing_dataset)
+        if not timing_df.empty:
+            st.write(f"**Farmers visited per {timing_axis.lower()} slot**")
+            st.dataframe(timing_df, use_container_width=True)
+            st.bar_chart(timing_df.sum(axis=0), use_container_width=True)
+            cluster_visits = visit_table if selected_cluster == "All" else visit_table[visit_table['Cluster name'] == selected_cluster]
+            render_download_buttons(cluster_visits, export_file_stem('visits_after_sowing', selected_cluster), key="visits_after_sowing_download")
+        else:
+            st.info("No visits found for the selected cluster")
+        
         all_fes = set()
         if not data['farminfo'].empty and 'Cluster name' in data['farminfo'].columns and selected_cluster != "All":
             cluster_farmers = data['farminfo'][data['farminfo']['Cluster name'] == selected_cluster]['Farmer ID'].dropna().unique()
@@ -898,7 +1468,8 @@ def main():
                                                      data['rainfall'],
                                                      data['observation'], 
                                                      selected_cluster, 
-                                                     selected_visits)
+                                                     selected_visits,
+                                                     calendar)
                 
                 st.markdown('<h4>📋 Farm Info</h4>', unsafe_allow_html=True)
                 farminfo_row = combined_df[combined_df['Dataset'] == 'Farminfo']
@@ -967,8 +1538,7 @@ def main():
             with col2:
                 st.metric("Total FEs", original_df['FE_Name'].nunique() if 'FE_Name' in original_df.columns else 0)
             with col3:
-                observation_value_cols = [col for col in original_df.columns if ('avg' in col.lower() or 'plant height' in col.lower()) and col not in ['Farmer Name', 'FE_Name', 'Visit Date', 'Farmer ID', 'fid']]
-                valid_records = original_df[observation_value_cols].notna().any(axis=1).sum() if observation_value_cols else 0
+                valid_records = int(observation_value_mask(original_df).sum())
                 st.metric("Valid Records", valid_records)
             with col4:
                 if 'Visit Date' in original_df.columns:
@@ -976,11 +1546,35 @@ def main():
                 else:
                     st.metric("Visit Records", 0)
             
-            visit_summary_df, comparison_df, detailed_df = analyze_visit_data(original_df, data['farminfo'], selected_cluster, selected_visits, dataset_type='observation')
+            st.subheader("📈 Observation Metrics")
+            metric_rollup = get_observation_rollup(version, calendar, data['observation'], data['farminfo'])
+            metric_stat = st.radio("Statistic:", options=['Mean', 'Median', 'Count'], horizontal=True, key="observation_metric_stat")
+            metric_visits = visit_periods[1:] if 'All' in selected_visits else selected_visits
+            metrics_df = metric_table(metric_rollup, selected_cluster, metric_visits, metric_stat)
+            if not metrics_df.empty:
+                st.dataframe(metrics_df, use_container_width=True)
+                render_download_buttons(metrics_df, export_file_stem(f'observation_metrics_{metric_stat}', selected_cluster, selected_visits), key="observation_metrics_download", index=True)
+            else:
+                st.info("No observation measurements recorded for the selected cluster and visit periods")
+            
+            st.subheader("🧺 Picking Yield")
+            pickings = get_picking_yield(version, data['observation'], data['farminfo'])
+            yield_level = st.radio("Level:", options=list(YIELD_LEVELS), horizontal=True, key="picking_yield_level")
+            yield_df = get_yield_rollup(version, selected_cluster, yield_level, pickings)
+            if not yield_df.empty:
+                st.dataframe(yield_df, use_container_width=True)
+                render_download_buttons(yield_df, export_file_stem(f'picking_yield_{yield_level}', selected_cluster), key="picking_yield_download")
+                if st.button("Show Chart for Cumulative Picking Yield", key="picking_yield_chart"):
+                    st.line_chart(cumulative_yield_by_date(pickings, selected_cluster), use_container_width=True)
+            else:
+                st.info("No picking yield recorded for the selected cluster")
+            
+            visit_summary_df, comparison_df, detailed_df = analyze_selected_visits(version, data, 'observation', selected_cluster, selected_visits, calendar)
             
             if not comparison_df.empty:
                 st.subheader("📊 FE Visit Comparison Summary")
                 st.dataframe(comparison_df, use_container_width=True)
+                render_download_buttons(comparison_df, export_file_stem('observation_comparison_summary', selected_cluster, selected_visits), key="observation_comparison_download")
                 if st.button("Show Chart for FE Visit Comparison Summary", key="observation_comparison_chart"):
                     chart_data = comparison_df.set_index('FE Name')
                     if 'All' in selected_visits:
@@ -991,6 +1585,8 @@ def main():
                 
                 st.subheader("📅 Visit Period Analysis")
                 visit_list = visit_periods[1:] if 'All' in selected_visits else selected_visits
+                period_detail = detailed_df[detailed_df['Category'].isin([f'{vp} Farmers' for vp in visit_list])]
+                render_download_buttons(period_detail, export_file_stem('observation_period_detail', selected_cluster, selected_visits), key="observation_period_detail_download")
                 
                 for vp in visit_list:
                     st.write(f"**{vp} Analysis**")
@@ -1060,39 +1656,48 @@ def main():
             farminfo_summary = create_fe_summary_table(farminfo_original, farminfo_valid, selected_cluster)
             farminfo_summary = farminfo_summary.set_index('FE Name')[['Farmer Count']].rename(columns={'Farmer Count': 'Farminfo'})
             
-            # Fieldvisit summary
-            fieldvisit_summary_df, _, _ = analyze_visit_data(data['fieldvisit'], data['farminfo'], selected_cluster, selected_visits, dataset_type='fieldvisit')
-            if not fieldvisit_summary_df.empty:
-                fieldvisit_pivot = fieldvisit_summary_df.pivot(index='FE Name', columns='Visit Period', values='Farmer Count').fillna(0)
-                fieldvisit_pivot.columns = pd.MultiIndex.from_product([['Fieldvisit'], fieldvisit_pivot.columns])
-            else:
-                fieldvisit_pivot = pd.DataFrame(index=all_fes, columns=pd.MultiIndex.from_product([['Fieldvisit'], active_visits])).fillna(0)
+            visit_summaries = {key: analyze_selected_visits(version, data, key, selected_cluster, selected_visits, calendar)[0] for key in VISIT_DATE_COLUMNS}
+            summary_table = combine_summary_table(all_fes, farminfo_summary, visit_summaries, active_visits)
             
-            # Rainfall summary
-            rainfall_summary_df, _, _ = analyze_visit_data(data['rainfall'], data['farminfo'], selected_cluster, selected_visits, dataset_type='rainfall')
-            if not rainfall_summary_df.empty:
-                rainfall_pivot = rainfall_summary_df.pivot(index='FE Name', columns='Visit Period', values='Farmer Count').fillna(0)
-                rainfall_pivot.columns = pd.MultiIndex.from_product([['Rainfall'], rainfall_pivot.columns])
-            else:
-                rainfall_pivot = pd.DataFrame(index=all_fes, columns=pd.MultiIndex.from_product([['Rainfall'], active_visits])).fillna(0)
+            st.dataframe(summary_table, use_container_width=True)
+            render_download_buttons(summary_table.rename_axis('FE Name'), export_file_stem('summary_table', selected_cluster, selected_visits), key="summary_table_download", index=True)
+    
+    with tab7:
+        st.markdown('<h2 class="tab-subheader">🗺️ Farm Boundary Map</h2>', unsafe_allow_html=True)
+        
+        farm_geometry = get_farm_geometry(version, data['farminfo'])['geometry']
+        if not len(farm_geometry):
+            st.error("No farm boundaries available in farminfo")
+        else:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                coverage_dataset = st.selectbox("Coverage from:", options=['fieldvisit', 'rainfall', 'observation'], key="map_coverage_dataset")
+            with col2:
+                detail_options = list(DETAIL_LEVELS)
+                map_detail = st.radio("Detail:", options=detail_options, index=detail_options.index('Coarse' if selected_cluster == "All" else 'Medium'),
+                                      horizontal=True, key="map_detail")
+            map_df = get_map_polygons(version, selected_cluster, map_detail, farm_geometry, data['farminfo'])
+            with col3:
+                map_fe = st.selectbox("FE:", options=['All'] + sorted(map_df['FE_Name'].dropna().unique()), key="map_fe")
+            if map_fe != 'All':
+                map_df = map_df[map_df['FE_Name'] == map_fe]
             
-            # Observation summary
-            observation_summary_df, _, _ = analyze_visit_data(data['observation'], data['farminfo'], selected_cluster, selected_visits, dataset_type='observation')
-            if not observation_summary_df.empty:
-                observation_pivot = observation_summary_df.pivot(index='FE Name', columns='Visit Period', values='Farmer Count').fillna(0)
-                observation_pivot.columns = pd.MultiIndex.from_product([['Observation'], observation_pivot.columns])
+            coverage_summary_df, _, _ = analyze_selected_visits(version, data, coverage_dataset, selected_cluster, selected_visits, calendar)
+            coverage = visit_coverage(coverage_summary_df)
+            if not map_df.empty:
+                map_status = map_df['Farmer ID'].map(coverage).fillna('Not visited')
+                status_cols = st.columns(len(COVERAGE_COLORS))
+                for status_col, status in zip(status_cols, COVERAGE_COLORS):
+                    with status_col:
+                        st.metric(status, int((map_status == status).sum()))
+                st.pydeck_chart(farm_map_deck(map_df, coverage), use_container_width=True)
+                not_visited_df = map_df.loc[map_status == 'Not visited', ['Cluster name', 'Village', 'FE_Name', 'Farmer ID', 'Mapped Area (acres)']]
+                if not not_visited_df.empty:
+                    st.write(f"**Mapped farms not visited in the selected periods ({len(not_visited_df)})**")
+                    st.dataframe(not_visited_df.reset_index(drop=True), use_container_width=True)
+                    render_download_buttons(not_visited_df, export_file_stem(f'{coverage_dataset}_not_visited_farms', selected_cluster, selected_visits), key="map_not_visited_download")
             else:
-                observation_pivot = pd.DataFrame(index=all_fes, columns=pd.MultiIndex.from_product([['Observation'], active_visits])).fillna(0)
-            
-            # Combine all
-            summary_table = pd.concat([
-                farminfo_summary,
-                fieldvisit_pivot,
-                rainfall_pivot,
-                observation_pivot
-            ], axis=1).reindex(all_fes).fillna(0).astype(int)
-            
-            st.dataframe(summary_table, use_container_width=True)
+                st.info("No mapped farms for the selected cluster and FE")
     
     st.markdown("---")
     st.markdown(
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = Path(__file__).parent / "data"
+DATASETS = ['farminfo', 'fieldvisit', 'rainfall', 'observation']
+STORE_DIR = DATA_DIR / "store"
+STORE_MANIFEST = "manifest.json"
+
+AREA_COLUMN_PREFIX = 'Cotton sowing area (acres)'
+FARM_ATTRIBUTES = ['Cluster name', 'Village', 'FE_Name', 'Area (acres)']
+
+_MARATHI_GLOSS = re.compile(r'\s*\([^)]*[\u0900-\u097F][^)]*\)')
+
+
+def dataset_path(key, data_dir=DATA_DIR):
+    """Path of the merged CSV for one dataset"""
+    return Path(data_dir) / f"merged_{key}.csv"
+
+
+def data_version(data_dir=DATA_DIR):
+    """Short fingerprint of the data files that changes whenever any of them is rewritten"""
+    digest = hashlib.sha1()
+    stored = None
+    for key in DATASETS:
+        file_path = dataset_path(key, data_dir)
+        if file_path.exists():
+            stat = file_path.stat()
+            digest.update(f"{key}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+            continue
+        # Deployments that only have the compressed store are versioned by its content hash
+        if stored is None:
+            try:
+                with open(Path(data_dir) / STORE_DIR.name / STORE_MANIFEST, encoding='utf-8') as f:
+                    stored = json.load(f).get('datasets', {})
+            except (OSError, ValueError):
+                stored = {}
+        entry = stored.get(key)
+        digest.update(f"{key}:{entry['sha1'] if entry else 'missing'};".encode())
+    return digest.hexdigest()[:16]
+
+
+def find_column(df, prefix):
+    """Column whose header is prefix followed only by its Marathi translation in brackets"""
+    for col in df.columns:
+        if str(col).split('(')[0].strip() == prefix:
+            return col
+    return None
+
+
+def english_names(series):
+    """Drop the Marathi gloss from bilingual answers, cleaning each distinct value once"""
+    uniques = series.dropna().unique()
+    cleaned = {value: ' '.join(_MARATHI_GLOSS.sub('', str(value)).split()) for value in uniques}
+    return series.map(cleaned).to_numpy(dtype=object)
+
+
+def farm_attributes(farminfo_df):
+    """Cluster, village, FE and sowing area per farmer, indexed by integer Farmer ID"""
+    if farminfo_df.empty or 'Farmer ID' not in farminfo_df.columns:
+        return pd.DataFrame(columns=FARM_ATTRIBUTES, index=pd.Index([], name='Farmer ID', dtype='int64'))
+    area_col = next((col for col in farminfo_df.columns if col.startswith(AREA_COLUMN_PREFIX)), None)
+    farms = pd.DataFrame({
+        'Farmer ID': pd.to_numeric(farminfo_df['Farmer ID'], errors='coerce'),
+        'Cluster name': farminfo_df['Cluster name'] if 'Cluster name' in farminfo_df.columns else np.nan,
+        'Village': farminfo_df['Village'].str.strip() if 'Village' in farminfo_df.columns else np.nan,
+        'FE_Name': farminfo_df['FE_Name'] if 'FE_Name' in farminfo_df.columns else np.nan,
+        'Area (acres)': pd.to_numeric(farminfo_df[area_col], errors='coerce') if area_col else np.nan
+    })
+    farms = farms.dropna(subset=['Farmer ID']).drop_duplicates('Farmer ID')
+    farms['Farmer ID'] = farms['Farmer ID'].astype('int64')
+    return farms.set_index('Farmer ID')
@@ -0,0 +1,158 @@
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+CHUNK_ROWS = 5000
+# Excel rejects sheet names over 31 characters or containing any of these
+SHEET_NAME_MAX = 31
+_SHEET_NAME_INVALID = re.compile(r'[\\/?*\[\]:]')
+
+CSV_MIME = "text/csv"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_XLSX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>"""
+
+_XLSX_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_XLSX_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_XLSX_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>"""
+
+_XLSX_SHEET_HEAD = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>"""
+
+_XLSX_SHEET_TAIL = "</sheetData></worksheet>"
+
+
+class _ChunkSink:
+    """Write-only file object that hands buffered bytes back to a generator"""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunk = b''.join(self._parts)
+        self._parts = []
+        return chunk
+
+
+def _flatten_for_export(df, index):
+    """Move the index into columns and join MultiIndex headers so every cell is a plain value"""
+    export_df = df.reset_index() if index else df
+    if isinstance(export_df.columns, pd.MultiIndex):
+        export_df = export_df.copy()
+        export_df.columns = [' - '.join(str(level) for level in col if str(level) != '') for col in export_df.columns]
+    return export_df
+
+
+def iter_csv_chunks(df, index=False, chunk_rows=CHUNK_ROWS):
+    """Yield df as UTF-8 CSV bytes, chunk_rows rows at a time"""
+    export_df = _flatten_for_export(df, index)
+    # BOM so Excel opens the Marathi column and village names correctly
+    yield '\ufeff'.encode('utf-8') + export_df.iloc[:0].to_csv(index=False).encode('utf-8')
+    for start in range(0, len(export_df), chunk_rows):
+        yield export_df.iloc[start:start + chunk_rows].to_csv(index=False, header=False).encode('utf-8')
+
+
+def _xlsx_cell(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA or value is pd.NaT:
+        return '<c/>'
+    if isinstance(value, (bool, np.bool_)):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (float, np.floating)) and np.isinf(value):
+        # SpreadsheetML has no infinity, so it is written as text
+        return f'<c t="inlineStr"><is><t>{"-" if value < 0 else ""}inf</t></is></c>'
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def xlsx_sheet_name(name):
+    """name with the characters Excel rejects in sheet names removed, cut to its length limit"""
+    return _SHEET_NAME_INVALID.sub('', str(name))[:SHEET_NAME_MAX] or "Sheet1"
+
+
+def iter_xlsx_chunks(df, index=False, sheet_name="Sheet1", chunk_rows=CHUNK_ROWS):
+    """Yield df as a single-sheet XLSX workbook, writing the sheet XML chunk_rows rows at a time"""
+    export_df = _flatten_for_export(df, index)
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        workbook.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        workbook.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(sheet_name=escape(xlsx_sheet_name(sheet_name))))
+        workbook.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        yield sink.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write((_XLSX_SHEET_HEAD + _xlsx_row(export_df.columns)).encode('utf-8'))
+            for start in range(0, len(export_df), chunk_rows):
+                chunk = export_df.iloc[start:start + chunk_rows]
+                sheet.write(''.join(_xlsx_row(row) for row in chunk.itertuples(index=False, name=None)).encode('utf-8'))
+                yield sink.drain()
+            sheet.write(_XLSX_SHEET_TAIL.encode('utf-8'))
+    yield sink.drain()
+
+
+def export_file_stem(name, cluster=None, selected_visits=None):
+    """Build a download file name that records the cluster and visit periods it was filtered on"""
+    parts = [name]
+    if cluster and cluster != "All":
+        parts.append(cluster)
+    if selected_visits and 'All' not in selected_visits:
+        parts.extend(selected_visits)
+    return '_'.join(part.strip().lower().replace(' ', '_') for part in parts)
+
+
+def render_download_buttons(df, file_stem, key, index=False):
+    """Show CSV and Excel download buttons that stream df only when clicked"""
+    if df is None or df.empty:
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "⬇️ Download CSV",
+            data=lambda: b''.join(iter_csv_chunks(df, index=index)),
+            file_name=f"{file_stem}.csv",
+            mime=CSV_MIME,
+            key=f"{key}_csv",
+            on_click="ignore"
+        )
+    with col2:
+        st.download_button(
+            "⬇️ Download Excel",
+            data=lambda: b''.join(iter_xlsx_chunks(df, index=index, sheet_name=file_stem)),
+            file_name=f"{file_stem}.xlsx",
+            mime=XLSX_MIME,
+            key=f"{key}_xlsx",
+            on_click="ignore"
+        )
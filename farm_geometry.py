@@ -0,0 +1,183 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from data_store import farm_attributes
+
+EARTH_RADIUS_M = 6371008.8
+METRES_PER_DEGREE = EARTH_RADIUS_M * np.pi / 180
+SQ_METRES_PER_ACRE = 4046.8564224
+# Mapped and declared areas further apart than this fraction of the declared area are flagged
+AREA_TOLERANCE = 0.25
+
+# Each parenthesised run of "lon lat, lon lat, ..." in a WKT polygon is one ring
+_COORD_RUN = re.compile(r'[-+\d.eE]+\s+[-+\d.eE]+(?:\s*,\s*[-+\d.eE]+\s+[-+\d.eE]+)*')
+_PART_SPLIT = re.compile(r'\)\s*\)\s*,\s*\(\s*\(')
+
+
+def _polygon_rings(wkt):
+    """Rings of one WKT POLYGON / MULTIPOLYGON as (coordinate text, is_hole) pairs"""
+    if not isinstance(wkt, str) or '(' not in wkt:
+        return []
+    rings = []
+    for part in _PART_SPLIT.split(wkt):
+        for n, run in enumerate(_COORD_RUN.findall(part)):
+            rings.append((run, n > 0))
+    return rings
+
+
+class FarmGeometry:
+    """Farm polygons as flat float64 (lon, lat) buffers with ring and polygon offsets"""
+
+    def __init__(self, farmer_ids, coords, ring_offsets, ring_is_hole, polygon_offsets):
+        self.farmer_ids = farmer_ids
+        self.coords = coords
+        self.ring_offsets = ring_offsets
+        self.ring_is_hole = ring_is_hole
+        self.polygon_offsets = polygon_offsets
+        self.area_acres, self.centroids = self._measure()
+
+    def __len__(self):
+        return len(self.farmer_ids)
+
+    def ring_polygon(self):
+        """Polygon index of every ring"""
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.polygon_offsets))
+
+    def _project(self):
+        """Vertices in metres around each polygon's mean vertex, plus that origin and x scale"""
+        n_polygons = len(self)
+        point_polygon = np.repeat(self.ring_polygon(), np.diff(self.ring_offsets))
+        lon, lat = self.coords[:, 0], self.coords[:, 1]
+        vertices = np.bincount(point_polygon, minlength=n_polygons)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            lon0 = np.bincount(point_polygon, weights=lon, minlength=n_polygons) / vertices
+            lat0 = np.bincount(point_polygon, weights=lat, minlength=n_polygons) / vertices
+        x_scale = METRES_PER_DEGREE * np.cos(np.radians(lat0))
+        x = (lon - lon0[point_polygon]) * x_scale[point_polygon]
+        y = (lat - lat0[point_polygon]) * METRES_PER_DEGREE
+        return x, y, lon0, lat0, x_scale
+
+    def ring_neighbours(self):
+        """Previous and next vertex index within each ring, wrapping around the ring ends"""
+        prev = np.arange(-1, len(self.coords) - 1)
+        prev[self.ring_offsets[:-1]] = self.ring_offsets[1:] - 1
+        nxt = np.arange(1, len(self.coords) + 1)
+        nxt[self.ring_offsets[1:] - 1] = self.ring_offsets[:-1]
+        return prev, nxt
+
+    def _measure(self):
+        """Shoelace area and centroid of every polygon on a local equirectangular projection"""
+        n_polygons = len(self)
+        area = np.full(n_polygons, np.nan)
+        centroids = np.full((n_polygons, 2), np.nan)
+        if not len(self.coords):
+            return area, centroids
+
+        ring_polygon = self.ring_polygon()
+        # Projecting around each polygon's own origin keeps the shoelace sums small and metric
+        x, y, lon0, lat0, x_scale = self._project()
+        _, nxt = self.ring_neighbours()
+        cross = x * y[nxt] - x[nxt] * y
+        starts = self.ring_offsets[:-1]
+        ring_area2 = np.add.reduceat(cross, starts)
+        ring_cx = np.add.reduceat((x + x[nxt]) * cross, starts)
+        ring_cy = np.add.reduceat((y + y[nxt]) * cross, starts)
+
+        # Exterior rings add and holes subtract, whatever winding order the FE's app recorded
+        factor = np.sign(ring_area2) * np.where(self.ring_is_hole, -1.0, 1.0)
+        area2 = np.bincount(ring_polygon, weights=factor * ring_area2, minlength=n_polygons)
+        cx = np.bincount(ring_polygon, weights=factor * ring_cx, minlength=n_polygons)
+        cy = np.bincount(ring_polygon, weights=factor * ring_cy, minlength=n_polygons)
+
+        has_shape = area2 > 0
+        area[has_shape] = area2[has_shape] / 2 / SQ_METRES_PER_ACRE
+        centroids[has_shape, 0] = lon0[has_shape] + cx[has_shape] / (3 * area2[has_shape]) / x_scale[has_shape]
+        centroids[has_shape, 1] = lat0[has_shape] + cy[has_shape] / (3 * area2[has_shape]) / METRES_PER_DEGREE
+        return area, centroids
+
+    def simplified(self, tolerance_m):
+        """Copy with vertices closer than tolerance_m to their neighbours' chord dropped, in one vectorised pass"""
+        if tolerance_m <= 0 or not len(self.coords):
+            return self
+        x, y, _, _, _ = self._project()
+        prev, nxt = self.ring_neighbours()
+        chord = np.hypot(x[nxt] - x[prev], y[nxt] - y[prev])
+        twice_area = np.abs((x[nxt] - x[prev]) * (y - y[prev]) - (x - x[prev]) * (y[nxt] - y[prev]))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            offset = np.where(chord > 0, twice_area / chord, np.hypot(x - x[prev], y - y[prev]))
+        drop = offset < tolerance_m
+        # Never drop two neighbours in the same pass, nor a ring's closing vertices
+        drop[1:] &= ~drop[:-1]
+        drop[self.ring_offsets[:-1]] = False
+        drop[self.ring_offsets[1:] - 1] = False
+
+        ring_of_point = np.repeat(np.arange(len(self.ring_offsets) - 1), np.diff(self.ring_offsets))
+        kept_lengths = np.bincount(ring_of_point, weights=~drop, minlength=len(self.ring_offsets) - 1).astype(np.int64)
+        # A ring left with fewer than four vertices (a closed triangle) keeps all of its vertices
+        drop &= ~(kept_lengths < 4)[ring_of_point]
+        kept_lengths = np.bincount(ring_of_point, weights=~drop, minlength=len(self.ring_offsets) - 1).astype(np.int64)
+        return FarmGeometry(self.farmer_ids, self.coords[~drop], np.concatenate([[0], np.cumsum(kept_lengths)]),
+                            self.ring_is_hole, self.polygon_offsets)
+
+    def polygon(self, i):
+        """List of (n, 2) coordinate arrays for the rings of polygon i, exterior first"""
+        first, last = self.polygon_offsets[i], self.polygon_offsets[i + 1]
+        return [self.coords[self.ring_offsets[r]:self.ring_offsets[r + 1]] for r in range(first, last)]
+
+    def summary(self):
+        """Per-farmer mapped area, centroid and vertex count"""
+        vertices = np.bincount(self.ring_polygon(), weights=np.diff(self.ring_offsets), minlength=len(self)).astype(np.int64)
+        return pd.DataFrame({
+            'Mapped Area (acres)': self.area_acres.round(2),
+            'Centroid Lon': self.centroids[:, 0],
+            'Centroid Lat': self.centroids[:, 1],
+            'Vertices': vertices
+        }, index=pd.Index(self.farmer_ids, name='Farmer ID'))
+
+
+def parse_farm_geometry(farminfo_df):
+    """Parse every farm's WKT boundary once into a FarmGeometry, one polygon per Farmer ID"""
+    empty = FarmGeometry(np.array([], dtype=np.int64), np.zeros((0, 2)), np.zeros(1, dtype=np.int64),
+                         np.array([], dtype=bool), np.zeros(1, dtype=np.int64))
+    if farminfo_df.empty or 'geometry' not in farminfo_df.columns or 'Farmer ID' not in farminfo_df.columns:
+        return empty
+
+    farms = pd.DataFrame({
+        'Farmer ID': pd.to_numeric(farminfo_df['Farmer ID'], errors='coerce'),
+        'geometry': farminfo_df['geometry']
+    }).dropna(subset=['Farmer ID']).drop_duplicates('Farmer ID')
+
+    runs, is_hole, rings_per_polygon = [], [], []
+    for wkt in farms['geometry'].to_numpy(dtype=object):
+        rings = _polygon_rings(wkt)
+        rings_per_polygon.append(len(rings))
+        for run, hole in rings:
+            runs.append(run)
+            is_hole.append(hole)
+    if not runs:
+        return empty
+
+    # One float parse over every ring at once; ring lengths come from the comma counts
+    ring_lengths = np.array([run.count(',') + 1 for run in runs], dtype=np.int64)
+    coords = np.array(' '.join(runs).replace(',', ' ').split(), dtype=np.float64).reshape(-1, 2)
+    ring_offsets = np.concatenate([[0], np.cumsum(ring_lengths)])
+    polygon_offsets = np.concatenate([[0], np.cumsum(rings_per_polygon)]).astype(np.int64)
+    return FarmGeometry(farms['Farmer ID'].to_numpy(dtype=np.int64), coords, ring_offsets,
+                        np.array(is_hole, dtype=bool), polygon_offsets)
+
+
+def area_check(geometry, farminfo_df, tolerance=AREA_TOLERANCE):
+    """Declared vs mapped sowing area per farmer, flagging differences beyond the tolerance"""
+    checked = farm_attributes(farminfo_df).rename(columns={'Area (acres)': 'Declared Area (acres)'})
+    checked = checked.join(geometry.summary(), how='left')
+    declared = checked['Declared Area (acres)'].where(checked['Declared Area (acres)'] > 0)
+    checked['Difference (%)'] = ((checked['Mapped Area (acres)'] - declared) / declared * 100).round(1)
+    checked['Status'] = np.select(
+        [checked['Mapped Area (acres)'].isna(), declared.isna(), checked['Difference (%)'].abs() > tolerance * 100],
+        ['No boundary', 'No declared area', 'Area mismatch'],
+        default='OK'
+    )
+    return checked.reset_index()[['Cluster name', 'Village', 'FE_Name', 'Farmer ID', 'Declared Area (acres)', 'Mapped Area (acres)',
+                                  'Difference (%)', 'Status', 'Centroid Lon', 'Centroid Lat', 'Vertices']]
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+from data_store import farm_attributes
+
+# Vertex tolerance in metres for each map detail level; coarser levels ship fewer vertices
+DETAIL_LEVELS = {
+    'Full': 0.0,
+    'Medium': 2.0,
+    'Coarse': 8.0
+}
+COORD_DECIMALS = {
+    'Full': 6,
+    'Medium': 6,
+    'Coarse': 5
+}
+
+COVERAGE_COLORS = {
+    'Visited every period': [44, 160, 44, 170],
+    'Partly visited': [255, 165, 0, 170],
+    'Not visited': [214, 39, 40, 170]
+}
+
+
+def map_polygons(geometry, farminfo_df, cluster=None, detail='Full'):
+    """One row per mapped farm with its simplified rings as nested [lon, lat] lists"""
+    farms = farm_attributes(farminfo_df)[['Cluster name', 'Village', 'FE_Name', 'Area (acres)']]
+    keep = np.ones(len(geometry), dtype=bool)
+    if cluster and cluster != "All":
+        keep = farms['Cluster name'].reindex(geometry.farmer_ids).eq(cluster).to_numpy()
+    simplified = geometry.simplified(DETAIL_LEVELS[detail])
+    decimals = COORD_DECIMALS[detail]
+
+    rows = []
+    for i in np.flatnonzero(keep & (np.diff(simplified.polygon_offsets) > 0)):
+        rows.append({
+            'Farmer ID': int(simplified.farmer_ids[i]),
+            'polygon': [ring.round(decimals).tolist() for ring in simplified.polygon(i)],
+            'Mapped Area (acres)': round(float(geometry.area_acres[i]), 2)
+        })
+    polygons = pd.DataFrame(rows, columns=['Farmer ID', 'polygon', 'Mapped Area (acres)'])
+    return polygons.join(farms, on='Farmer ID')
+
+
+def visit_coverage(visit_summary_df):
+    """Per-farmer coverage status from the per-FE visit summary of the selected periods"""
+    if visit_summary_df.empty:
+        return pd.Series(dtype=object, name='Coverage')
+    visits = visit_summary_df.loc[visit_summary_df['Farmer Count'] > 0, ['Visit Period', 'Farmer IDs']]
+    visited = visits.assign(**{'Farmer ID': visits['Farmer IDs'].str.split(', ')}).explode('Farmer ID')
+    visited['Farmer ID'] = pd.to_numeric(visited['Farmer ID'], errors='coerce')
+    visited = visited.dropna(subset=['Farmer ID']).astype({'Farmer ID': 'int64'})
+    periods_visited = visited.groupby('Farmer ID')['Visit Period'].nunique()
+    n_periods = visit_summary_df['Visit Period'].nunique()
+    return pd.Series(np.where(periods_visited >= n_periods, 'Visited every period', 'Partly visited'),
+                     index=periods_visited.index, name='Coverage')
+
+
+def farm_map_deck(polygons, coverage):
+    """Offline pydeck map of farm polygons coloured by coverage; no basemap tiles are requested"""
+    polygons = polygons.join(coverage, on='Farmer ID')
+    polygons['Coverage'] = polygons['Coverage'].fillna('Not visited')
+    polygons['color'] = polygons['Coverage'].map(COVERAGE_COLORS)
+    polygons = polygons.fillna({'Cluster name': '', 'Village': '', 'FE_Name': ''})
+
+    points = np.concatenate([np.asarray(poly[0]) for poly in polygons['polygon']]) if len(polygons) else np.array([[78.0, 20.0]])
+    (min_lon, min_lat), (max_lon, max_lat) = points.min(axis=0), points.max(axis=0)
+    span = max(max_lon - min_lon, max_lat - min_lat, 1e-3)
+    view = pdk.ViewState(longitude=(min_lon + max_lon) / 2, latitude=(min_lat + max_lat) / 2,
+                         zoom=float(np.clip(np.log2(360 / span) - 1, 3, 18)))
+    layer = pdk.Layer(
+        'PolygonLayer',
+        polygons[['Farmer ID', 'polygon', 'color', 'Coverage', 'Cluster name', 'Village', 'FE_Name', 'Mapped Area (acres)']],
+        get_polygon='polygon',
+        get_fill_color='color',
+        get_line_color=[60, 60, 60, 200],
+        line_width_min_pixels=1,
+        stroked=True,
+        filled=True,
+        pickable=True
+    )
+    return pdk.Deck(layers=[layer], initial_view_state=view, map_style=None,
+                    tooltip={'text': 'Farmer {Farmer ID}\n{Village}, {Cluster name}\nFE: {FE_Name}\n{Coverage}\n{Mapped Area (acres)} acres'})
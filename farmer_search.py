@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+from conflicts import VISIT_DATE_COLUMNS
+from data_store import DATASETS
+from visit_calendar import parse_dates
+
+MAX_RESULTS = 20
+_PREFIX_END = '\U0010ffff'
+
+
+def _prefix_range(sorted_keys, prefix):
+    """[start, end) of the keys in a sorted array that start with prefix"""
+    return np.searchsorted(sorted_keys, prefix, side='left'), np.searchsorted(sorted_keys, prefix + _PREFIX_END, side='left')
+
+
+def _suffix_array(names):
+    """(name index, offset) int32 pairs of every suffix not starting with a space, sorted by suffix text without building any suffix string"""
+    # Prefix doubling over the names' code points; each name ends in its own separator ranked below every character,
+    # so no comparison runs on into the next name and the loop ends after log2(longest name) rounds
+    if not len(names):
+        return np.array([], dtype=np.int32), np.array([], dtype=np.int32)
+    lengths = np.fromiter((len(name) for name in names), dtype=np.int64, count=len(names))
+    codes = np.frombuffer('\0'.join(names).encode('utf-32-le') + b'\0\0\0\0', dtype=np.uint32).astype(np.int64)
+    ends = np.cumsum(lengths + 1) - 1
+    codes[ends] = np.arange(len(names)) - len(names)
+    rank = np.unique(codes, return_inverse=True)[1].astype(np.int64) + 1
+    step = 1
+    while True:
+        # Each suffix's rank on its first 2 * step characters, as one sortable key per position
+        following = np.zeros(len(rank), dtype=np.int64)
+        following[:-step] = rank[step:]
+        keys = rank * (len(rank) + 2) + following
+        order = np.argsort(keys)
+        new_group = np.r_[True, keys[order][1:] != keys[order][:-1]]
+        rank = np.empty(len(rank), dtype=np.int64)
+        rank[order] = np.cumsum(new_group)
+        if new_group.all():
+            break
+        step *= 2
+    # Separators and spaces do not start a searchable suffix
+    order = order[(codes[order] >= 0) & (codes[order] != ord(' '))]
+    starts = ends - lengths
+    name_index = np.searchsorted(ends, order)
+    return name_index.astype(np.int32), (order - starts[name_index]).astype(np.int32)
+
+
+def _suffix_range(names, name_index, offsets, query):
+    """[start, end) of the sorted suffixes that start with query, comparing only len(query) characters of each"""
+    def prefix(i):
+        offset = offsets[i]
+        return names[name_index[i]][offset:offset + len(query)]
+
+    def bound(right):
+        low, high = 0, len(offsets)
+        while low < high:
+            mid = (low + high) // 2
+            text = prefix(mid)
+            if text < query or (right and text == query):
+                low = mid + 1
+            else:
+                high = mid
+        return low
+    return bound(False), bound(True)
+
+
+class FarmerSearchIndex:
+    """Sorted ID and name-suffix arrays for lookup, plus per-dataset row offsets for each farmer"""
+
+    def __init__(self, data):
+        self.data = data
+        ids, names = [], []
+        self.row_index = {}
+        for key in DATASETS:
+            df = data.get(key, pd.DataFrame())
+            if df.empty or 'Farmer ID' not in df.columns:
+                continue
+            farmer_ids = pd.to_numeric(df['Farmer ID'], errors='coerce').to_numpy(dtype=np.float64)
+            rows = np.flatnonzero(~np.isnan(farmer_ids))
+            order = rows[np.argsort(farmer_ids[rows], kind='stable')]
+            sorted_ids = farmer_ids[order].astype(np.int64)
+            # CSR layout: rows of farmer sorted_unique[i] are order[starts[i]:starts[i + 1]]
+            unique_ids, starts = np.unique(sorted_ids, return_index=True)
+            self.row_index[key] = (unique_ids, np.append(starts, len(order)), order)
+            ids.append(unique_ids)
+            if 'Farmer Name' in df.columns:
+                named = df['Farmer Name'].to_numpy(dtype=object)[rows]
+                names.append(pd.DataFrame({'Farmer ID': farmer_ids[rows].astype(np.int64), 'Farmer Name': named}).dropna())
+
+        self.farmer_ids = np.unique(np.concatenate(ids)) if ids else np.array([], dtype=np.int64)
+        self.id_keys = np.sort(self.farmer_ids.astype(str))
+        self.id_values = self.id_keys.astype(np.int64) if len(self.id_keys) else np.array([], dtype=np.int64)
+
+        farmer_names = pd.concat(names, ignore_index=True).drop_duplicates() if names else pd.DataFrame(columns=['Farmer ID', 'Farmer Name'])
+        self.names = farmer_names.groupby('Farmer ID')['Farmer Name'].first()
+        # Every suffix of every normalised name, sorted, so a substring query is a prefix range
+        self.name_keys = farmer_names['Farmer Name'].astype(str).str.casefold().str.split().str.join(' ').to_numpy(dtype=object)
+        self.name_owners = farmer_names['Farmer ID'].to_numpy(dtype=np.int64)
+        self.suffix_names, self.suffix_offsets = _suffix_array(self.name_keys)
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Farmer IDs whose ID starts with query or whose name contains it, ID matches first"""
+        query = ' '.join(str(query).casefold().split())
+        if not query:
+            return pd.DataFrame(columns=['Farmer ID', 'Farmer Name', 'Matched On'])
+        matches = []
+        if query.isdigit():
+            start, end = _prefix_range(self.id_keys, query)
+            matches.append(pd.DataFrame({'Farmer ID': self.id_values[start:min(end, start + limit)], 'Matched On': 'ID'}))
+        start, end = _suffix_range(self.name_keys, self.suffix_names, self.suffix_offsets, query)
+        if end > start:
+            owners = pd.unique(self.name_owners[self.suffix_names[start:end]])[:limit]
+            matches.append(pd.DataFrame({'Farmer ID': owners, 'Matched On': 'Name'}))
+        if not matches:
+            return pd.DataFrame(columns=['Farmer ID', 'Farmer Name', 'Matched On'])
+        found = pd.concat(matches, ignore_index=True).drop_duplicates('Farmer ID').head(limit)
+        found.insert(1, 'Farmer Name', found['Farmer ID'].map(self.names).to_numpy())
+        return found.reset_index(drop=True)
+
+    def rows(self, key, farmer_id):
+        """Positions of one farmer's rows in a dataset, read from the offset index"""
+        if key not in self.row_index:
+            return np.array([], dtype=np.int64)
+        unique_ids, offsets, order = self.row_index[key]
+        slot = np.searchsorted(unique_ids, farmer_id)
+        if slot == len(unique_ids) or unique_ids[slot] != farmer_id:
+            return np.array([], dtype=np.int64)
+        return order[offsets[slot]:offsets[slot + 1]]
+
+    def records(self, farmer_id):
+        """The farmer's full rows in each dataset"""
+        return {key: self.data[key].iloc[self.rows(key, farmer_id)] for key in self.row_index}
+
+    def timeline(self, farmer_id):
+        """One row per record of the farmer across all datasets, in date order"""
+        events = []
+        for key, rows in self.records(farmer_id).items():
+            if rows.empty:
+                continue
+            date_col = VISIT_DATE_COLUMNS.get(key)
+            events.append(pd.DataFrame({
+                'Date': parse_dates(rows[date_col]).astype('datetime64[ns]') if date_col in rows.columns else pd.NaT,
+                'Dataset': key,
+                'FE_Name': rows['FE_Name'].to_numpy() if 'FE_Name' in rows.columns else None,
+                'Row': rows.index.to_numpy()
+            }))
+        if not events:
+            return pd.DataFrame(columns=['Date', 'Dataset', 'FE_Name', 'Row'])
+        return pd.concat(events, ignore_index=True).sort_values('Date', na_position='first', kind='stable').reset_index(drop=True)
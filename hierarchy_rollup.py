@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from conflicts import VISIT_DATE_COLUMNS
+from data_store import farm_attributes
+
+HIERARCHY_LEVELS = ['Cluster name', 'Village', 'FE_Name', 'Farmer ID']
+LEVEL_LABELS = ['All', 'Cluster', 'Village', 'FE', 'Farmer']
+UNASSIGNED = 'Unassigned'
+
+
+def _measure(key, measure):
+    return f"{key.capitalize()} {measure}"
+
+
+def _measure_columns():
+    return ['Farmers'] + [_measure(key, measure) for key in VISIT_DATE_COLUMNS for measure in ('Farmers Visited', 'Visits')]
+
+
+def farmer_leaves(farminfo_df, visits):
+    """One row per registered farmer with its hierarchy path and per-dataset visit measures"""
+    farms = farm_attributes(farminfo_df)[HIERARCHY_LEVELS[:-1]]
+    farms = farms.astype(object).where(farms.notna(), UNASSIGNED)
+    visit_counts = visits.groupby(['Farmer ID', 'Dataset'], observed=False).size().unstack('Dataset') if not visits.empty else pd.DataFrame()
+    visit_counts = visit_counts.reindex(index=farms.index, columns=list(VISIT_DATE_COLUMNS)).fillna(0).astype(np.int64)
+    leaves = farms.copy()
+    leaves['Farmers'] = 1
+    for key in VISIT_DATE_COLUMNS:
+        leaves[_measure(key, 'Farmers Visited')] = (visit_counts[key] > 0).astype(np.int64)
+        leaves[_measure(key, 'Visits')] = visit_counts[key]
+    return leaves.reset_index()[HIERARCHY_LEVELS + _measure_columns()]
+
+
+def build_hierarchy_rollup(farminfo_df, visits):
+    """Grouping-sets rollup of farmer counts, visits and coverage for every Cluster/Village/FE/Farmer node"""
+    measures = _measure_columns()
+    leaves = farmer_leaves(farminfo_df, visits)
+    # Every measure is additive, so each level is aggregated from the (smaller) level below rather than from the leaves
+    levels = [leaves.assign(Level=len(HIERARCHY_LEVELS))]
+    for depth in range(len(HIERARCHY_LEVELS) - 1, 0, -1):
+        keys = HIERARCHY_LEVELS[:depth]
+        levels.append(levels[-1].groupby(keys, sort=False)[measures].sum().reset_index().assign(Level=depth))
+    levels.append(pd.DataFrame([levels[-1][measures].sum()], columns=measures).assign(Level=0))
+
+    rollup = pd.concat(levels[::-1], ignore_index=True).reindex(columns=['Level'] + HIERARCHY_LEVELS + measures)
+    rollup['Farmer ID'] = rollup['Farmer ID'].astype('Int64')
+    for key in VISIT_DATE_COLUMNS:
+        rollup[_measure(key, 'Coverage')] = (rollup[_measure(key, 'Farmers Visited')] / rollup['Farmers'].where(rollup['Farmers'] > 0)).round(3)
+    rollup = rollup.sort_values(['Level'] + HIERARCHY_LEVELS, na_position='first', kind='stable').reset_index(drop=True)
+    print(f"Debug: Hierarchy rollup with {len(rollup)} nodes over {len(leaves)} farmers")
+    return HierarchyRollup(rollup)
+
+
+class HierarchyRollup:
+    """Precomputed rollup tree; each node's children are located through a parent-path index built once"""
+
+    def __init__(self, rollup):
+        self.rollup = rollup
+        self._children = {}
+        for depth in range(1, len(HIERARCHY_LEVELS) + 1):
+            level_rows = rollup[rollup['Level'] == depth]
+            parent_keys = HIERARCHY_LEVELS[:depth - 1]
+            if not parent_keys:
+                self._children[()] = level_rows.index.to_numpy()
+                continue
+            for parent, positions in level_rows.groupby(parent_keys, sort=False).indices.items():
+                parent = parent if isinstance(parent, tuple) else (parent,)
+                self._children[parent] = level_rows.index.to_numpy()[positions]
+
+    def node(self, path=()):
+        """Measures of the node at path, a tuple of hierarchy values from the cluster down"""
+        if not path:
+            return self.rollup[self.rollup['Level'] == 0].iloc[0]
+        positions = self._children.get(tuple(path[:-1]), np.array([], dtype=np.int64))
+        matches = self.rollup.loc[positions]
+        matches = matches[matches[HIERARCHY_LEVELS[len(path) - 1]] == path[-1]]
+        return matches.iloc[0] if not matches.empty else None
+
+    def children(self, path=()):
+        """Child nodes one level below path, with their own key and measures only"""
+        if len(path) >= len(HIERARCHY_LEVELS):
+            return pd.DataFrame()
+        positions = self._children.get(tuple(path), np.array([], dtype=np.int64))
+        child_key = HIERARCHY_LEVELS[len(path)]
+        return self.rollup.loc[positions].drop(columns=['Level'] + [key for key in HIERARCHY_LEVELS if key != child_key]).reset_index(drop=True)
+
+    def child_keys(self, path=()):
+        if len(path) >= len(HIERARCHY_LEVELS):
+            return []
+        positions = self._children.get(tuple(path), np.array([], dtype=np.int64))
+        return list(self.rollup.loc[positions, HIERARCHY_LEVELS[len(path)]])
@@ -3,6 +3,10 @@ import sys
 import os
 from datetime import datetime
 
+from data_store import STORE_DIR, STORE_MANIFEST
+from segment_store import pack_data_dir
+from snapshot_store import record_data_dir
+
 def run_git_commands():
     """Run git add, commit, and push before Script A."""
     repo_dir = r"C:\Users\karan.daphade_materr\Desktop\streamlit-dashboard"
@@ -18,6 +22,13 @@ def run_git_commands():
     print("Running Git Commands...")
 
     try:
+        # The merged CSVs are rewritten on every refresh; only the append-only compressed store is pushed,
+        # so they stay tracked until a store exists to replace them
+        if (STORE_DIR / STORE_MANIFEST).exists():
+            subprocess.run(["git", "rm", "-r", "-q", "--cached", "--ignore-unmatch", "data/merged_*.csv"], cwd=repo_dir, check=True)
+        else:
+            print("✗ Data store not found, pushing the merged CSVs instead")
+
         # git add .
         subprocess.run(["git", "add", "."], cwd=repo_dir, check=True)
 
@@ -74,6 +85,31 @@ def run_script_a():
 
 
 
+def pack_data():
+    """Append the freshly merged CSVs to the compressed data store that is pushed to git"""
+    try:
+        manifest = pack_data_dir()
+        segments = sum(len(entry['segments']) for entry in manifest['datasets'].values())
+        print(f"✓ Data store updated ({segments} segments covering {sum(entry['bytes'] for entry in manifest['datasets'].values())} CSV bytes)")
+        return True
+    except Exception as e:
+        print(f"✗ Could not update data store: {e}")
+        return False
+
+
+
+def record_snapshot():
+    """Record the freshly merged CSVs as a delta on the snapshot history"""
+    try:
+        manifest = record_data_dir()
+        print(f"✓ Data snapshot recorded ({len(manifest['versions'])} refreshes in history)")
+        return True
+    except Exception as e:
+        print(f"✗ Could not record data snapshot: {e}")
+        return False
+
+
+
 def run_script_b():
     """Run script B to launch the Streamlit dashboard"""
     script_b_dir = r"C:\Users\karan.daphade_materr\Desktop\streamlit-dashboard"
@@ -105,6 +141,9 @@ def main():
     print("Starting: Git Push → CSV Merge → Dashboard")
     print("=" * 60)
 
+    # Store the last merged CSVs before pushing, so the first push after the switch already carries the store
+    pack_data()
+
     # ✅ FIRST RUN GIT COMMANDS
     if not run_git_commands():
         print("Stopping process due to Git failure.")
@@ -117,6 +156,11 @@ def main():
         print("Failed to run Script A. Exiting.")
         return
     
+    pack_data()
+    
+    # Keep the merged data's history even when the dashboard is not opened
+    record_snapshot()
+    
     # ✅ THEN RUN SCRIPT B
     print("\n" + "=" * 60)
     print("Launching Dashboard with Updated Data")
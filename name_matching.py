@@ -0,0 +1,235 @@
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from data_store import farm_attributes
+
+# Devanagari to Latin, close enough that a Marathi-typed name lands in the same phonetic block as its English spelling
+_DEVANAGARI_VOWELS = {
+    'अ': 'a', 'आ': 'a', 'इ': 'i', 'ई': 'i', 'उ': 'u', 'ऊ': 'u', 'ऋ': 'ru', 'ए': 'e', 'ऐ': 'ai', 'ओ': 'o', 'औ': 'au'
+}
+_DEVANAGARI_SIGNS = {
+    'ा': 'a', 'ि': 'i', 'ी': 'i', 'ु': 'u', 'ू': 'u', 'ृ': 'ru', 'े': 'e', 'ै': 'ai', 'ो': 'o', 'ौ': 'au', 'ं': 'n', 'ँ': 'n', 'ः': 'h'
+}
+_DEVANAGARI_CONSONANTS = {
+    'क': 'k', 'ख': 'kh', 'ग': 'g', 'घ': 'gh', 'ङ': 'n', 'च': 'ch', 'छ': 'chh', 'ज': 'j', 'झ': 'jh', 'ञ': 'n',
+    'ट': 't', 'ठ': 'th', 'ड': 'd', 'ढ': 'dh', 'ण': 'n', 'त': 't', 'थ': 'th', 'द': 'd', 'ध': 'dh', 'न': 'n',
+    'प': 'p', 'फ': 'ph', 'ब': 'b', 'भ': 'bh', 'म': 'm', 'य': 'y', 'र': 'r', 'ल': 'l', 'ळ': 'l', 'व': 'v',
+    'श': 'sh', 'ष': 'sh', 'स': 's', 'ह': 'h'
+}
+_VIRAMA = '्'
+
+# Spelling variants that sound alike in Marathi names, folded before vowels are dropped
+_PHONETIC_RULES = [
+    (re.compile(r'([bcdgjkpt])h'), r'\1'),
+    (re.compile(r'sh'), 's'),
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'w'), 'v'),
+    (re.compile(r'z'), 'j'),
+    (re.compile(r'q'), 'k'),
+    (re.compile(r'(?<=.)[aeiouyh]'), ''),
+    (re.compile(r'(.)\1+'), r'\1')
+]
+PHONETIC_KEY_LENGTH = 4
+VILLAGE_KEY_LENGTH = 8
+
+TRIGRAM_BUCKETS = 256
+SCORE_CHUNK_PAIRS = 65536
+MIN_MATCH_SCORE = 0.6
+
+
+def transliterate(text):
+    """Latin rendering of any Devanagari in text (dropping the word-final inherent vowel); other characters pass through"""
+    out = []
+    inherent = False
+    for char in text:
+        if char in _DEVANAGARI_CONSONANTS:
+            out.append(_DEVANAGARI_CONSONANTS[char] + 'a')
+            inherent = True
+            continue
+        if char in _DEVANAGARI_SIGNS or char == _VIRAMA:
+            if inherent and char not in 'ंँः':
+                out[-1] = out[-1][:-1]
+            out.append(_DEVANAGARI_SIGNS.get(char, ''))
+        else:
+            if inherent and not char.isalpha():
+                out[-1] = out[-1][:-1]
+            out.append(_DEVANAGARI_VOWELS.get(char, char))
+        inherent = False
+    if inherent:
+        out[-1] = out[-1][:-1]
+    return ''.join(out)
+
+
+def _normalize_one(value):
+    text = transliterate(unicodedata.normalize('NFKC', str(value))).casefold()
+    return ' '.join(re.sub(r'[^a-z ]+', ' ', text).split())
+
+
+def normalize_names(series):
+    """Transliterated, lower-cased, punctuation-free names, normalising each distinct value once"""
+    uniques = series.dropna().unique()
+    return series.map({value: _normalize_one(value) for value in uniques}).fillna('').to_numpy(dtype=object)
+
+
+def _phonetic_one(token, length=PHONETIC_KEY_LENGTH):
+    if not token:
+        return ''
+    for pattern, replacement in _PHONETIC_RULES:
+        token = pattern.sub(replacement, token)
+    return token[:length]
+
+
+def phonetic_keys(normalized):
+    """Phonetic key of each normalised string with its spaces removed (used for villages)"""
+    uniques = pd.unique(normalized)
+    keys = {value: _phonetic_one(value.replace(' ', ''), VILLAGE_KEY_LENGTH) for value in uniques}
+    return np.array([keys[value] for value in normalized], dtype=object)
+
+
+def _token_keys(normalized, position):
+    """Phonetic key of the first (0) or last (-1) word of each normalised name"""
+    uniques = pd.unique(normalized)
+    keys = {value: _phonetic_one(value.split()[position]) if value else '' for value in uniques}
+    return np.array([keys[value] for value in normalized], dtype=object)
+
+
+def _trigram_matrix(normalized):
+    """Hashed character-trigram counts, one uint8 row per name"""
+    uniques, inverse = np.unique(normalized, return_inverse=True)
+    matrix = np.zeros((len(uniques), TRIGRAM_BUCKETS), dtype=np.uint8)
+    for row, value in enumerate(uniques):
+        padded = f'  {value} '
+        for i in range(len(padded) - 2):
+            bucket = zlib.crc32(padded[i:i + 3].encode()) % TRIGRAM_BUCKETS
+            matrix[row, bucket] = min(matrix[row, bucket] + 1, 255)
+    return matrix[inverse]
+
+
+def dice_scores(left, right, left_rows, right_rows):
+    """Dice similarity of hashed trigram profiles for each (left row, right row) pair, in fixed-size chunks"""
+    scores = np.empty(len(left_rows), dtype=np.float32)
+    for start in range(0, len(left_rows), SCORE_CHUNK_PAIRS):
+        a = left[left_rows[start:start + SCORE_CHUNK_PAIRS]].astype(np.int16)
+        b = right[right_rows[start:start + SCORE_CHUNK_PAIRS]].astype(np.int16)
+        overlap = np.minimum(a, b).sum(axis=1)
+        total = a.sum(axis=1) + b.sum(axis=1)
+        scores[start:start + SCORE_CHUNK_PAIRS] = np.where(total > 0, 2 * overlap / np.maximum(total, 1), 0)
+    return scores
+
+
+def _block_keys(scope, first_keys, last_keys):
+    """Long (row, block key) table: each row sits in a first-name block and a surname block within its scope"""
+    rows = np.arange(len(scope))
+    blocks = pd.DataFrame({
+        'row': np.concatenate([rows, rows]),
+        'block': np.concatenate([
+            scope.astype(str) + '|f|' + first_keys.astype(str),
+            scope.astype(str) + '|l|' + last_keys.astype(str)
+        ])
+    })
+    return blocks[np.concatenate([first_keys, last_keys]) != '']
+
+
+class FarmerNameIndex:
+    """Registered farmers with normalised names, phonetic blocking keys and trigram profiles"""
+
+    def __init__(self, farminfo_df):
+        farms = farm_attributes(farminfo_df)
+        names = pd.Series(dtype=object)
+        if not farminfo_df.empty and 'Farmer Name' in farminfo_df.columns:
+            names = pd.DataFrame({
+                'Farmer ID': pd.to_numeric(farminfo_df['Farmer ID'], errors='coerce'),
+                'Farmer Name': farminfo_df['Farmer Name']
+            }).dropna().drop_duplicates('Farmer ID').astype({'Farmer ID': 'int64'}).set_index('Farmer ID')['Farmer Name']
+        self.farmers = farms.join(names.rename('Farmer Name'), how='inner').reset_index()
+        self.normalized = normalize_names(self.farmers['Farmer Name'])
+        self.village_keys = phonetic_keys(normalize_names(self.farmers['Village']))
+        first_keys, last_keys = _token_keys(self.normalized, 0), _token_keys(self.normalized, -1)
+        self.trigrams = _trigram_matrix(self.normalized)
+        # Queries carry either a village or only their FE, so farmers are blocked under both scopes
+        self.blocks = pd.concat([
+            _block_keys('v:' + self.village_keys.astype(str), first_keys, last_keys),
+            _block_keys('fe:' + self.farmers['FE_Name'].fillna('').to_numpy(dtype=str), first_keys, last_keys)
+        ], ignore_index=True)
+
+    def __len__(self):
+        return len(self.farmers)
+
+    def candidate_pairs(self, names, villages=None, fes=None):
+        """(query row, farmer row) pairs sharing a block: same village (or FE) and same first-name or surname key"""
+        normalized = normalize_names(pd.Series(names))
+        if villages is not None:
+            scope = 'v:' + phonetic_keys(normalize_names(pd.Series(villages))).astype(str)
+        else:
+            scope = 'fe:' + pd.Series(fes).fillna('').to_numpy(dtype=str)
+        query_blocks = _block_keys(scope, _token_keys(normalized, 0), _token_keys(normalized, -1))
+        pairs = query_blocks.merge(self.blocks, on='block', suffixes=('', '_farmer'))[['row', 'row_farmer']].drop_duplicates()
+        return normalized, pairs['row'].to_numpy(), pairs['row_farmer'].to_numpy()
+
+    def match(self, names, villages=None, fes=None, min_score=MIN_MATCH_SCORE):
+        """Best registered farmer for each query name, with its score and lead over the runner-up"""
+        names = pd.Series(names).reset_index(drop=True)
+        result = pd.DataFrame({'Query': names, 'Farmer ID': pd.array([pd.NA] * len(names), dtype='Int64'),
+                               'Registered Name': None, 'Score': np.nan, 'Margin': np.nan})
+        if not len(self) or names.empty:
+            return result
+        normalized, query_rows, farmer_rows = self.candidate_pairs(names, villages, fes)
+        if not len(query_rows):
+            return result
+        scores = dice_scores(_trigram_matrix(normalized), self.trigrams, query_rows, farmer_rows)
+        scored = pd.DataFrame({'row': query_rows, 'farmer': farmer_rows, 'score': scores}).sort_values(['row', 'score'], ascending=[True, False])
+        best = scored.drop_duplicates('row')
+        runner_up = scored[scored.duplicated('row')].drop_duplicates('row').set_index('row')['score']
+        best = best[best['score'] >= min_score]
+        rows = best['row'].to_numpy()
+        result.loc[rows, 'Farmer ID'] = self.farmers['Farmer ID'].to_numpy()[best['farmer'].to_numpy()]
+        result.loc[rows, 'Registered Name'] = self.farmers['Farmer Name'].to_numpy()[best['farmer'].to_numpy()]
+        result.loc[rows, 'Score'] = best['score'].round(3).to_numpy()
+        result.loc[rows, 'Margin'] = (best['score'] - best['row'].map(runner_up).fillna(0)).round(3).to_numpy()
+        return result
+
+
+def propose_id_recoveries(data, index, min_score=MIN_MATCH_SCORE):
+    """Suggested Farmer IDs for visit rows that have a farmer name but no usable Farmer ID"""
+    columns = ['Dataset', 'Row', 'FE_Name', 'Farmer Name', 'Proposed Farmer ID', 'Registered Name', 'Score', 'Margin']
+    proposals = []
+    for key in ['fieldvisit', 'rainfall', 'observation']:
+        df = data.get(key, pd.DataFrame())
+        if df.empty or 'Farmer Name' not in df.columns:
+            continue
+        missing = df[pd.to_numeric(df['Farmer ID'], errors='coerce').isna() & df['Farmer Name'].notna()] if 'Farmer ID' in df.columns else df[df['Farmer Name'].notna()]
+        if missing.empty:
+            continue
+        # Visit forms carry no village, so their rows are blocked within the FE's own farmers
+        villages = missing['Village'].to_numpy() if 'Village' in missing.columns else None
+        matched = index.match(missing['Farmer Name'].to_numpy(), villages=villages, fes=missing['FE_Name'].to_numpy(), min_score=min_score)
+        proposals.append(pd.DataFrame({
+            'Dataset': key,
+            'Row': missing.index.to_numpy(),
+            'FE_Name': missing['FE_Name'].to_numpy(),
+            'Farmer Name': missing['Farmer Name'].to_numpy(),
+            'Proposed Farmer ID': matched['Farmer ID'].to_numpy(),
+            'Registered Name': matched['Registered Name'].to_numpy(),
+            'Score': matched['Score'].to_numpy(),
+            'Margin': matched['Margin'].to_numpy()
+        }))
+    if not proposals:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(proposals, ignore_index=True)[columns].sort_values('Score', ascending=False, na_position='last').reset_index(drop=True)
+
+
+def village_variants(farminfo_df):
+    """Village spellings grouped by cluster and phonetic key, each mapped to its most common spelling"""
+    farms = farm_attributes(farminfo_df).dropna(subset=['Village'])
+    if farms.empty:
+        return pd.DataFrame(columns=['Cluster name', 'Village', 'Canonical Village', 'Farmers'])
+    farms = farms.assign(Key=phonetic_keys(normalize_names(farms['Village'])))
+    spellings = farms.groupby(['Cluster name', 'Key', 'Village']).size().rename('Farmers').reset_index()
+    spellings = spellings.sort_values(['Cluster name', 'Key', 'Farmers'], ascending=[True, True, False])
+    spellings['Canonical Village'] = spellings.groupby(['Cluster name', 'Key'])['Village'].transform('first')
+    variant_groups = spellings.groupby(['Cluster name', 'Key'])['Village'].transform('size') > 1
+    return spellings.loc[variant_groups, ['Cluster name', 'Village', 'Canonical Village', 'Farmers']].reset_index(drop=True)
@@ -0,0 +1,125 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Canonical metric key, English phrase found in the bilingual column header, display label
+OBSERVATION_METRICS = [
+    ('squares', 'avg. number of squares per plant', 'Squares / plant'),
+    ('bolls', 'avg. number of bolls per plant', 'Bolls / plant'),
+    ('opened_bolls', 'avg. number of opened bolls', 'Opened bolls / plant'),
+    ('plant_height', 'plant height at maturity', 'Plant height (cm)'),
+    ('boll_weight', 'average weight of one boll', 'Boll weight (g)'),
+    ('picking_1_yield', 'first picking yield', 'Picking 1 yield (kg)'),
+    ('picking_2_yield', 'second picking yield', 'Picking 2 yield (kg)'),
+    ('picking_3_yield', 'third picking yield', 'Picking 3 yield (kg)'),
+    ('picking_4_yield', 'fourth picking yield', 'Picking 4 yield (kg)'),
+    ('picking_5_yield', 'fifth picking yield', 'Picking 5 yield (kg)')
+]
+
+# Plant measurements that make an observation record count as collected
+PLANT_METRICS = ['squares', 'bolls', 'opened_bolls', 'plant_height', 'boll_weight']
+
+METRIC_LABELS = {key: label for key, _, label in OBSERVATION_METRICS}
+ROLLUP_KEYS = ['Cluster name', 'FE_Name', 'Visit Period']
+
+
+@lru_cache(maxsize=16)
+def _metric_positions(columns):
+    """Map each canonical metric to the positions of every column carrying it (duplicates included)"""
+    lowered = [' '.join(str(col).lower().split()) for col in columns]
+    positions = {}
+    for key, phrase, _ in OBSERVATION_METRICS:
+        matches = [i for i, col in enumerate(lowered) if phrase in col]
+        if matches:
+            positions[key] = tuple(matches)
+    return positions
+
+
+def metric_positions(df):
+    """Column positions for each canonical metric of an observation frame, computed once per header"""
+    return _metric_positions(tuple(df.columns))
+
+
+def extract_metrics(df):
+    """Coalesce the bilingual (and duplicate-named) metric columns into one float32 column per metric"""
+    positions = metric_positions(df)
+    metrics = {}
+    for key, _, _ in OBSERVATION_METRICS:
+        if key not in positions:
+            continue
+        block = df.iloc[:, list(positions[key])].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        # First non-null value wins, so the primary column takes precedence over later variants
+        first_valid = np.argmax(~np.isnan(block), axis=1)
+        metrics[key] = block[np.arange(len(block)), first_valid].astype(np.float32)
+    return pd.DataFrame(metrics, index=df.index)
+
+
+def observation_value_mask(df):
+    """Rows of an observation frame with at least one plant measurement recorded"""
+    if df.empty:
+        return pd.Series(False, index=df.index)
+    positions = metric_positions(df)
+    plant_positions = sorted({i for key in PLANT_METRICS for i in positions.get(key, ())})
+    if not plant_positions:
+        return pd.Series(False, index=df.index)
+    return pd.Series(df.iloc[:, plant_positions].notna().to_numpy().any(axis=1), index=df.index)
+
+
+def build_observation_frame(observation_df, farminfo_df, classify_period):
+    """Typed observation table: farmer, FE, cluster, visit period and one float32 column per metric"""
+    if observation_df.empty or 'Farmer ID' not in observation_df.columns or 'Visit Date' not in observation_df.columns:
+        return pd.DataFrame(columns=['Farmer ID'] + ROLLUP_KEYS)
+
+    frame = extract_metrics(observation_df)
+    frame.insert(0, 'Farmer ID', pd.to_numeric(observation_df['Farmer ID'], errors='coerce').astype('Int64'))
+    frame.insert(1, 'FE_Name', observation_df['FE_Name'])
+
+    if not farminfo_df.empty and 'Cluster name' in farminfo_df.columns:
+        farmer_clusters = farminfo_df.assign(**{'Farmer ID': pd.to_numeric(farminfo_df['Farmer ID'], errors='coerce').astype('Int64')})
+        farmer_clusters = farmer_clusters.dropna(subset=['Farmer ID']).drop_duplicates('Farmer ID').set_index('Farmer ID')['Cluster name']
+        frame.insert(2, 'Cluster name', frame['Farmer ID'].map(farmer_clusters))
+    else:
+        frame.insert(2, 'Cluster name', np.nan)
+
+    # Classify each distinct date once rather than every row
+    dates = observation_df['Visit Date']
+    unique_dates = pd.unique(dates.dropna())
+    period_lookup = pd.Series([classify_period(d) for d in unique_dates], index=unique_dates, dtype=object)
+    frame.insert(3, 'Visit Period', dates.map(period_lookup).fillna('Unknown'))
+
+    return frame[frame['Farmer ID'].notna() & frame['FE_Name'].notna()]
+
+
+def rollup_observation_metrics(frame):
+    """Mean/median/count of every metric per cluster, FE and visit period, plus an 'All' cluster rollup"""
+    metric_cols = [key for key, _, _ in OBSERVATION_METRICS if key in frame.columns]
+    if frame.empty or not metric_cols:
+        return pd.DataFrame(columns=ROLLUP_KEYS + ['Metric', 'Mean', 'Median', 'Count'])
+
+    per_cluster = frame.dropna(subset=['Cluster name']).groupby(ROLLUP_KEYS, observed=True)[metric_cols].agg(['mean', 'median', 'count'])
+    all_clusters = frame.groupby(ROLLUP_KEYS[1:], observed=True)[metric_cols].agg(['mean', 'median', 'count'])
+    all_clusters = pd.concat({'All': all_clusters}, names=['Cluster name'])
+
+    rollup = pd.concat([all_clusters, per_cluster])
+    rollup.columns.names = ['Metric', 'Statistic']
+    rollup = rollup.stack('Metric', future_stack=True).reset_index()
+    rollup.columns.name = None
+    rollup = rollup.rename(columns={'mean': 'Mean', 'median': 'Median', 'count': 'Count'})
+    rollup = rollup[rollup['Count'] > 0]
+    rollup['Count'] = rollup['Count'].astype(np.int32)
+    rollup[['Mean', 'Median']] = rollup[['Mean', 'Median']].astype(np.float32)
+    rollup['Metric'] = pd.Categorical(rollup['Metric'], categories=metric_cols)
+    return rollup.sort_values(ROLLUP_KEYS + ['Metric']).reset_index(drop=True)
+
+
+def metric_table(rollup, cluster, visit_periods, statistic='Mean'):
+    """FE x metric table for one cluster and set of visit periods, read straight from the rollup"""
+    cluster = cluster if cluster else 'All'
+    selected = rollup[(rollup['Cluster name'] == cluster) & (rollup['Visit Period'].isin(visit_periods))]
+    if selected.empty:
+        return pd.DataFrame()
+    table = selected.pivot_table(index=['FE_Name', 'Visit Period'], columns='Metric', values=statistic, observed=True, sort=False)
+    table = table.rename(columns=METRIC_LABELS).rename_axis(index=['FE Name', 'Visit Period'], columns=None)
+    period_order = {vp: i for i, vp in enumerate(visit_periods)}
+    return table.sort_index(level=[0, 1], key=lambda idx: idx.map(period_order) if idx.name == 'Visit Period' else idx)
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from conflicts import VISIT_DATE_COLUMNS
+from visit_calendar import parse_dates
+
+UNASSIGNED_SEASON = 'unassigned'
+UNKNOWN_MONTH = 'unknown'
+
+
+def _partition_keys(df, date_col, calendar):
+    """Season and YYYY-MM month of every row, parsed the same way visit periods are classified"""
+    days = parse_dates(df[date_col])
+    seasons = calendar.season(df[date_col])
+    months = np.where(np.isnat(days), UNKNOWN_MONTH, days.astype('datetime64[M]').astype(str))
+    return np.where(pd.isna(seasons), UNASSIGNED_SEASON, seasons).astype(object), months.astype(object)
+
+
+def partitions_for_periods(calendar, period_names):
+    """(season, month) keys overlapping any of the named visit periods"""
+    selected = np.isin(calendar.names, list(period_names))
+    partitions = set()
+    for season, start, end in zip(calendar.seasons[selected], calendar.starts[selected], calendar.ends[selected]):
+        partitions.update((season, month) for month in np.arange(start.astype('datetime64[M]'), end.astype('datetime64[M]') + 1).astype(str))
+    return partitions
+
+
+def partition_index(data, calendar):
+    """Row positions of each visit dataset per (season, month) of calendar, so period queries slice the loaded table instead of scanning it"""
+    index = {}
+    for key, date_col in VISIT_DATE_COLUMNS.items():
+        df = data.get(key, pd.DataFrame())
+        # Without dates no row can be placed, so such a dataset is left to the full-table path
+        if df.empty or date_col not in df.columns:
+            continue
+        seasons, months = _partition_keys(df, date_col, calendar)
+        index[key] = {(season, month): rows.to_numpy() for (season, month), rows in pd.Series(np.arange(len(df))).groupby([seasons, months])}
+    print(f"Debug: Indexed {sum(len(partitions) for partitions in index.values())} season/month partitions for calendar {calendar.name}")
+    return index
+
+
+def rows_for_partitions(index, key, partitions):
+    """Positions of one dataset's rows in the listed (season, month) partitions, in original row order; None when the dataset is not indexed"""
+    if key not in index:
+        return None
+    selected = [rows for partition, rows in index[key].items() if partition in partitions]
+    return np.sort(np.concatenate(selected)) if selected else np.array([], dtype=np.int64)
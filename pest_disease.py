@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+from data_store import english_names, farm_attributes, find_column
+from visit_calendar import parse_dates
+
+# (kind, name column, occurrence date column) for each report slot on the fieldvisit form
+INCIDENCE_SLOTS = [
+    ('Pest', 'Insect type', 'Insect occurance date'),
+    ('Pest', 'Insect type 1', 'Insect occurance date 1'),
+    ('Disease', 'Disease name', 'Date of disease occurence'),
+    ('Disease', 'Disease name 1', 'Date of disease occurence 1')
+]
+UNSPECIFIED = 'Unspecified'
+# Occurrence dates later than the visit or older than this are typos; the visit date is used instead
+MAX_OCCURRENCE_LAG_DAYS = 60
+
+INCIDENCE_LEVELS = {
+    'Cluster': 'Cluster name',
+    'Village': 'Village',
+    'FE': 'FE_Name'
+}
+
+def build_incidence_table(fieldvisit_df, farminfo_df):
+    """Long (farmer, kind, name, date) incidence table from the pest and disease column pairs"""
+    columns = ['Farmer ID', 'FE_Name', 'Cluster name', 'Village', 'Kind', 'Name', 'Date', 'Week']
+    if fieldvisit_df.empty or 'Farmer ID' not in fieldvisit_df.columns:
+        return pd.DataFrame(columns=columns)
+
+    visit_dates = pd.Series(parse_dates(fieldvisit_df['Visit date']).astype('datetime64[ns]'), index=fieldvisit_df.index) if 'Visit date' in fieldvisit_df.columns else pd.Series(pd.NaT, index=fieldvisit_df.index)
+    farmer_ids = pd.to_numeric(fieldvisit_df['Farmer ID'], errors='coerce').to_numpy(dtype=np.float64)
+    fe_names = fieldvisit_df['FE_Name'].to_numpy(dtype=object)
+
+    slots = []
+    for kind, name_prefix, date_prefix in INCIDENCE_SLOTS:
+        name_col, date_col = find_column(fieldvisit_df, name_prefix), find_column(fieldvisit_df, date_prefix)
+        if name_col is None and date_col is None:
+            continue
+        names = english_names(fieldvisit_df[name_col]) if name_col else np.full(len(fieldvisit_df), None, dtype=object)
+        dates = pd.Series(parse_dates(fieldvisit_df[date_col]).astype('datetime64[ns]'), index=fieldvisit_df.index) if date_col else pd.Series(pd.NaT, index=fieldvisit_df.index)
+        reported = pd.notna(names) | dates.notna().to_numpy()
+        lag_days = (visit_dates - dates).dt.days
+        dates = dates.where(lag_days.between(0, MAX_OCCURRENCE_LAG_DAYS) | visit_dates.isna())
+        slots.append(pd.DataFrame({
+            'Farmer ID': farmer_ids[reported],
+            'FE_Name': fe_names[reported],
+            'Kind': kind,
+            'Name': np.where(pd.notna(names[reported]), names[reported], UNSPECIFIED),
+            # An occurrence without its own date is dated by the visit that reported it
+            'Date': dates.fillna(visit_dates).to_numpy()[reported]
+        }))
+    if not slots:
+        return pd.DataFrame(columns=columns)
+
+    incidence = pd.concat(slots, ignore_index=True)
+    incidence = incidence[incidence['Farmer ID'].notna() & incidence['Date'].notna()]
+    incidence = incidence.drop_duplicates(['Farmer ID', 'Kind', 'Name', 'Date'])
+    incidence['Farmer ID'] = incidence['Farmer ID'].astype('int64')
+    incidence['Week'] = incidence['Date'].dt.to_period('W-SUN').dt.start_time
+
+    incidence = incidence.join(farm_attributes(farminfo_df)[['Cluster name', 'Village']], on='Farmer ID')
+
+    incidence['Kind'] = pd.Categorical(incidence['Kind'], categories=['Pest', 'Disease'])
+    return incidence[columns].sort_values(['Week', 'Kind', 'Name']).reset_index(drop=True)
+
+
+class IncidenceCube:
+    """Farmers affected per (location, pest/disease, week), stored as a dense uint16 array"""
+
+    def __init__(self, locations, names, weeks, counts):
+        self.locations = locations
+        self.names = names
+        self.weeks = weeks
+        self.counts = counts
+
+    def _location_rows(self, cluster=None):
+        if cluster and cluster != "All":
+            return np.flatnonzero((self.locations['Cluster name'] == cluster).to_numpy())
+        return np.arange(len(self.locations))
+
+    def weekly(self, cluster=None, kind=None):
+        """Week x pest/disease table of affected farmers, summed over the cluster's locations"""
+        rows = self._location_rows(cluster)
+        cols = np.flatnonzero((self.names['Kind'] == kind).to_numpy()) if kind else np.arange(len(self.names))
+        totals = self.counts[np.ix_(rows, cols)].sum(axis=0, dtype=np.int64).T
+        return pd.DataFrame(totals, index=pd.Index(self.weeks, name='Week'), columns=self.names['Name'].to_numpy()[cols])
+
+    def hotspots(self, week=None, cluster=None, kind=None):
+        """Locations ranked by farmers affected in one week (the latest one by default)"""
+        rows = self._location_rows(cluster)
+        if not len(self.weeks) or not len(rows):
+            return pd.DataFrame()
+        week_idx = len(self.weeks) - 1 if week is None else int(np.searchsorted(self.weeks, pd.Timestamp(week)))
+        week_idx = min(week_idx, len(self.weeks) - 1)
+        cols = np.flatnonzero((self.names['Kind'] == kind).to_numpy()) if kind else np.arange(len(self.names))
+        slab = self.counts[np.ix_(rows, cols, [week_idx])][:, :, 0]
+        table = pd.DataFrame(slab, columns=self.names['Name'].to_numpy()[cols])
+        table.insert(0, 'Affected', slab.sum(axis=1))
+        table = pd.concat([self.locations.iloc[rows].reset_index(drop=True), table], axis=1)
+        table = table[table['Affected'] > 0]
+        return table.loc[:, (table != 0).any(axis=0)].sort_values('Affected', ascending=False).reset_index(drop=True)
+
+
+def build_incidence_cube(incidence, level='Village'):
+    """Aggregate the incidence table into an IncidenceCube for one level of the hierarchy"""
+    key = INCIDENCE_LEVELS[level]
+    keys = ['Cluster name'] if key == 'Cluster name' else ['Cluster name', key]
+    incidence = incidence.dropna(subset=keys)
+    if incidence.empty:
+        return IncidenceCube(pd.DataFrame(columns=keys), pd.DataFrame(columns=['Kind', 'Name']),
+                             np.array([], dtype='datetime64[ns]'), np.zeros((0, 0, 0), dtype=np.uint16))
+
+    loc_grouped = incidence.groupby(keys, sort=True)
+    loc_codes = loc_grouped.ngroup().to_numpy()
+    name_grouped = incidence.groupby(['Kind', 'Name'], sort=True, observed=True)
+    name_codes = name_grouped.ngroup().to_numpy()
+    first_week = incidence['Week'].min()
+    week_codes = ((incidence['Week'] - first_week).dt.days // 7).to_numpy()
+    weeks = pd.date_range(first_week, periods=int(week_codes.max()) + 1, freq='7D')
+
+    # Count each farmer once per cell even if several occurrence dates fall in the same week
+    cells = pd.DataFrame({'loc': loc_codes, 'name': name_codes, 'week': week_codes, 'farmer': incidence['Farmer ID'].to_numpy()}).drop_duplicates()
+    counts = np.zeros((loc_grouped.ngroups, name_grouped.ngroups, len(weeks)), dtype=np.uint16)
+    np.add.at(counts, (cells['loc'].to_numpy(), cells['name'].to_numpy(), cells['week'].to_numpy()), 1)
+    return IncidenceCube(loc_grouped.size().index.to_frame(index=False), name_grouped.size().index.to_frame(index=False),
+                         np.asarray(weeks, dtype='datetime64[ns]'), counts)
+
+
+def pest_disease_cooccurrence(incidence):
+    """Sparse (COO) pest x disease matrix per cluster: farmers reporting both in the same week"""
+    columns = ['Cluster name', 'Pest', 'Disease', 'Farmers']
+    if incidence.empty:
+        return pd.DataFrame(columns=columns)
+    keys = ['Farmer ID', 'Week']
+    pests = incidence.loc[incidence['Kind'] == 'Pest', keys + ['Cluster name', 'Name']].drop_duplicates()
+    diseases = incidence.loc[incidence['Kind'] == 'Disease', keys + ['Name']].drop_duplicates()
+    pairs = pests.merge(diseases, on=keys, suffixes=(' Pest', ' Disease'))
+    if pairs.empty:
+        return pd.DataFrame(columns=columns)
+    coo = pairs.groupby(['Cluster name', 'Name Pest', 'Name Disease'], dropna=False).agg(Farmers=('Farmer ID', 'nunique')).reset_index()
+    coo.columns = columns
+    return coo.sort_values('Farmers', ascending=False).reset_index(drop=True)
+
+
+def cooccurrence_matrix(cooccurrence, cluster=None):
+    """Dense pest x disease view of the COO table for one cluster (or all)"""
+    if cluster and cluster != "All":
+        cooccurrence = cooccurrence[cooccurrence['Cluster name'] == cluster]
+    if cooccurrence.empty:
+        return pd.DataFrame()
+    return cooccurrence.pivot_table(index='Pest', columns='Disease', values='Farmers', aggfunc='sum', fill_value=0)
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from data_store import farm_attributes
+from observation_metrics import extract_metrics
+from visit_calendar import parse_dates
+
+PICKING_ORDINALS = ['first', 'second', 'third', 'fourth', 'fifth']
+YIELD_LEVELS = {
+    'Farmer': ['Cluster name', 'Village', 'FE_Name', 'Farmer ID'],
+    'FE': ['Cluster name', 'FE_Name'],
+    'Village': ['Cluster name', 'Village'],
+    'Cluster': ['Cluster name']
+}
+
+
+def _picking_date_block(observation_df):
+    """n x 5 array of picking dates, taking the first non-null of any duplicate-named date columns"""
+    lowered = [' '.join(str(col).lower().split()) for col in observation_df.columns]
+    block = np.full((len(observation_df), len(PICKING_ORDINALS)), np.datetime64('NaT'), dtype='datetime64[ns]')
+    for n, ordinal in enumerate(PICKING_ORDINALS):
+        positions = [i for i, col in enumerate(lowered) if f'{ordinal} picking date' in col]
+        for i in reversed(positions):
+            parsed = parse_dates(observation_df.iloc[:, i]).astype('datetime64[ns]')
+            block[:, n] = np.where(np.isnat(parsed), block[:, n], parsed)
+    return block
+
+
+def melt_pickings(observation_df):
+    """Long (farmer, picking #, picking date, yield) table with one row per farmer and picking"""
+    columns = ['Farmer ID', 'FE_Name', 'Picking', 'Picking Date', 'Yield (kg)', 'Visit Date']
+    if observation_df.empty or 'Farmer ID' not in observation_df.columns:
+        return pd.DataFrame(columns=columns)
+
+    metrics = extract_metrics(observation_df)
+    yield_cols = [f'picking_{n}_yield' for n in range(1, len(PICKING_ORDINALS) + 1)]
+    yields = np.column_stack([
+        metrics[col].to_numpy(dtype=np.float32) if col in metrics.columns else np.full(len(observation_df), np.nan, dtype=np.float32)
+        for col in yield_cols
+    ])
+    dates = _picking_date_block(observation_df)
+
+    n_rows, n_pickings = yields.shape
+    farmer_ids = pd.to_numeric(observation_df['Farmer ID'], errors='coerce').to_numpy(dtype=np.float64)
+    long_df = pd.DataFrame({
+        'Farmer ID': np.repeat(farmer_ids, n_pickings),
+        'FE_Name': np.repeat(observation_df['FE_Name'].to_numpy(dtype=object), n_pickings),
+        'Picking': np.tile(np.arange(1, n_pickings + 1, dtype=np.int8), n_rows),
+        'Picking Date': dates.ravel(),
+        'Yield (kg)': yields.ravel(),
+        'Visit Date': np.repeat(parse_dates(observation_df['Visit Date']).astype('datetime64[ns]'), n_pickings)
+    })
+    long_df = long_df[long_df['Farmer ID'].notna() & long_df['Yield (kg)'].notna()]
+
+    # Later observation visits repeat earlier pickings; the most recent report of each picking wins
+    long_df = long_df.sort_values(['Farmer ID', 'Picking', 'Visit Date'], na_position='first')
+    long_df = long_df.drop_duplicates(['Farmer ID', 'Picking'], keep='last')
+    long_df['Farmer ID'] = long_df['Farmer ID'].astype('int64')
+    return long_df[columns].reset_index(drop=True)
+
+
+def build_picking_yield(observation_df, farminfo_df):
+    """Picking table with cumulative yield per farmer, joined to the farm's cluster, village and area"""
+    pickings = melt_pickings(observation_df)
+    farms = farm_attributes(farminfo_df)[['Cluster name', 'Village', 'Area (acres)']]
+    pickings = pickings.join(farms, on='Farmer ID')
+    pickings = pickings.sort_values(['Farmer ID', 'Picking Date', 'Picking'], na_position='last').reset_index(drop=True)
+    pickings['Cumulative Yield (kg)'] = pickings.groupby('Farmer ID')['Yield (kg)'].cumsum().astype(np.float32)
+    return pickings
+
+
+def rollup_yield(pickings, level):
+    """Total yield, area and yield per acre at one level of the Cluster/Village/FE/Farmer hierarchy"""
+    keys = YIELD_LEVELS[level]
+    if pickings.empty:
+        return pd.DataFrame(columns=keys + ['Farmers', 'Pickings', 'Total Yield (kg)', 'Area (acres)', 'Yield per Acre (kg)'])
+
+    per_farmer = pickings.groupby(YIELD_LEVELS['Farmer'], dropna=False, observed=True).agg(
+        Pickings=('Picking', 'size'),
+        **{'Total Yield (kg)': ('Yield (kg)', 'sum'), 'Area (acres)': ('Area (acres)', 'first'), 'Last Picking': ('Picking Date', 'max')}
+    ).reset_index()
+    if level == 'Farmer':
+        rolled = per_farmer
+        rolled.insert(len(keys), 'Farmers', 1)
+    else:
+        rolled = per_farmer.groupby(keys, dropna=False, observed=True).agg(
+            Farmers=('Farmer ID', 'nunique'),
+            Pickings=('Pickings', 'sum'),
+            **{'Total Yield (kg)': ('Total Yield (kg)', 'sum'), 'Area (acres)': ('Area (acres)', 'sum'), 'Last Picking': ('Last Picking', 'max')}
+        ).reset_index()
+    rolled[['Total Yield (kg)', 'Area (acres)']] = rolled[['Total Yield (kg)', 'Area (acres)']].astype(np.float64)
+    area = rolled['Area (acres)'].where(rolled['Area (acres)'] > 0)
+    rolled['Yield per Acre (kg)'] = (rolled['Total Yield (kg)'] / area).round(1)
+    return rolled.sort_values('Total Yield (kg)', ascending=False).reset_index(drop=True)
+
+
+def cumulative_yield_by_date(pickings, cluster=None):
+    """Season-to-date yield curve over aligned picking dates, optionally for one cluster"""
+    if cluster and cluster != "All":
+        pickings = pickings[pickings['Cluster name'] == cluster]
+    daily = pickings.dropna(subset=['Picking Date']).groupby('Picking Date')['Yield (kg)'].sum()
+    return daily.cumsum().rename('Cumulative Yield (kg)')
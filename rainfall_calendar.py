@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+from data_store import farm_attributes, find_column
+from visit_calendar import parse_dates
+
+RAINFALL_DATE_PREFIXES = ['Rainfall date', 'Rainfall date 1', 'Rainfall date 2']
+
+# English prefix of each bilingual intensity / wetness answer and its ordinal level
+INTENSITY_LEVELS = [
+    ('No Rain', 0),
+    ('Light Rain', 1),
+    ('Moderate Rain', 2),
+    ('Heavy Rain', 3),
+    ('Very Heavy Rain', 4),
+    ('Extremely Heavy Rain', 5)
+]
+WETNESS_LEVELS = [
+    ('Dry', 0),
+    ('Slightly Moist', 1),
+    ('Moist', 2),
+    ('Wet', 3),
+    ('Waterlogged', 4)
+]
+INTENSITY_NAMES = {level: name for name, level in INTENSITY_LEVELS}
+HEAVY_RAIN_LEVEL = 3
+NO_REPORT = -1
+
+CUBE_LEVELS = {
+    'Village': ['Cluster name', 'Village'],
+    'Cluster': ['Cluster name']
+}
+
+
+def _answer_levels(series, levels):
+    """Map bilingual answers onto ordinal levels by their English prefix, longest prefix first"""
+    codes = np.full(len(series), NO_REPORT, dtype=np.int8)
+    text = series.fillna('').astype(str).str.strip()
+    for name, level in sorted(levels, key=lambda item: -len(item[0])):
+        codes[(codes == NO_REPORT) & text.str.startswith(name).to_numpy()] = level
+    return codes
+
+
+def explode_rainfall_events(rainfall_df, farminfo_df):
+    """Long (farmer, rainfall date, intensity, wetness) event table with the farm's village and cluster"""
+    columns = ['Farmer ID', 'FE_Name', 'Cluster name', 'Village', 'Rainfall Date', 'Intensity', 'Wetness']
+    if rainfall_df.empty or 'Farmer ID' not in rainfall_df.columns:
+        return pd.DataFrame(columns=columns)
+
+    date_cols = [col for col in (find_column(rainfall_df, prefix) for prefix in RAINFALL_DATE_PREFIXES) if col]
+    if not date_cols:
+        return pd.DataFrame(columns=columns)
+    intensity_col = find_column(rainfall_df, 'Rain intensity')
+    wetness_col = find_column(rainfall_df, 'Soil wetness')
+
+    n_rows, n_dates = len(rainfall_df), len(date_cols)
+    dates = np.column_stack([parse_dates(rainfall_df[col]).astype('datetime64[ns]') for col in date_cols])
+    intensity = _answer_levels(rainfall_df[intensity_col], INTENSITY_LEVELS) if intensity_col else np.full(n_rows, NO_REPORT, dtype=np.int8)
+    wetness = _answer_levels(rainfall_df[wetness_col], WETNESS_LEVELS) if wetness_col else np.full(n_rows, NO_REPORT, dtype=np.int8)
+
+    events = pd.DataFrame({
+        'Farmer ID': np.repeat(pd.to_numeric(rainfall_df['Farmer ID'], errors='coerce').to_numpy(dtype=np.float64), n_dates),
+        'FE_Name': np.repeat(rainfall_df['FE_Name'].to_numpy(dtype=object), n_dates),
+        'Rainfall Date': dates.ravel(),
+        'Intensity': np.repeat(intensity, n_dates),
+        'Wetness': np.repeat(wetness, n_dates)
+    })
+    events = events[events['Farmer ID'].notna() & events['Rainfall Date'].notna()]
+
+    # The same farm's rain day reported on several visits counts once, at its strongest intensity
+    events = events.sort_values('Intensity').drop_duplicates(['Farmer ID', 'Rainfall Date'], keep='last')
+    events['Farmer ID'] = events['Farmer ID'].astype('int64')
+
+    events = events.join(farm_attributes(farminfo_df)[['Cluster name', 'Village']], on='Farmer ID')
+    return events[columns].sort_values(['Rainfall Date', 'Farmer ID']).reset_index(drop=True)
+
+
+class RainfallCube:
+    """Daily event counts and max intensity per location, stored as dense (location x day) arrays"""
+
+    def __init__(self, locations, start, counts, max_intensity):
+        self.locations = locations
+        self.start = start
+        self.counts = counts
+        self.max_intensity = max_intensity
+        self.dates = pd.date_range(start, periods=counts.shape[1], freq='D')
+        # Index of the latest heavy-rain day at or before each day, so recency queries are lookups
+        day_index = np.arange(counts.shape[1], dtype=np.int32)
+        heavy_days = np.where(max_intensity >= HEAVY_RAIN_LEVEL, day_index, -1)
+        self.last_heavy_index = np.maximum.accumulate(heavy_days, axis=1) if counts.size else heavy_days
+
+    def _location_rows(self, cluster=None):
+        if cluster and cluster != "All":
+            return np.flatnonzero((self.locations['Cluster name'] == cluster).to_numpy())
+        return np.arange(len(self.locations))
+
+    def _day(self, as_of):
+        return int((pd.Timestamp(as_of).normalize() - self.start).days)
+
+    def heatmap(self, cluster=None, value='counts'):
+        """Long (location, date, value) rows with any rain report, read off the cube arrays"""
+        rows = self._location_rows(cluster)
+        grid = (self.counts if value == 'counts' else self.max_intensity)[rows]
+        loc_idx, day_idx = np.nonzero(self.counts[rows] > 0)
+        labels = self.locations.iloc[rows].apply(lambda loc: ' / '.join(str(v) for v in loc.dropna()), axis=1).to_numpy()
+        return pd.DataFrame({
+            'Location': labels[loc_idx] if len(labels) else np.array([], dtype=object),
+            'Date': self.dates[day_idx],
+            'Value': grid[loc_idx, day_idx]
+        })
+
+    def days_since_heavy_rain(self, as_of=None, cluster=None):
+        """Days since each location's last heavy rain on or before as_of (NaN if none yet)"""
+        rows = self._location_rows(cluster)
+        result = self.locations.iloc[rows].reset_index(drop=True)
+        if not self.counts.size:
+            result['Last Heavy Rain'] = pd.NaT
+            result['Days Since Heavy Rain'] = np.nan
+            return result
+        day = self._day(as_of) if as_of is not None else self.counts.shape[1] - 1
+        lookup_day = min(day, self.counts.shape[1] - 1)
+        last = self.last_heavy_index[rows, lookup_day] if lookup_day >= 0 else np.full(len(rows), -1)
+        result['Last Heavy Rain'] = pd.to_datetime(np.where(last >= 0, (self.start + pd.to_timedelta(np.maximum(last, 0), unit='D')).to_numpy(), np.datetime64('NaT')))
+        result['Days Since Heavy Rain'] = np.where(last >= 0, day - last, np.nan)
+        return result.sort_values('Days Since Heavy Rain', na_position='last').reset_index(drop=True)
+
+
+def build_rainfall_cube(events, level='Village'):
+    """Aggregate exploded rainfall events into a (location x day) RainfallCube for one level"""
+    keys = CUBE_LEVELS[level]
+    events = events.dropna(subset=keys)
+    if events.empty:
+        return RainfallCube(pd.DataFrame(columns=keys), pd.Timestamp('today').normalize(),
+                            np.zeros((0, 0), dtype=np.uint16), np.zeros((0, 0), dtype=np.int8))
+
+    grouped = events.groupby(keys, sort=True)
+    location_codes = grouped.ngroup().to_numpy()
+    locations = grouped.size().index.to_frame(index=False)
+    dates = events['Rainfall Date'].dt.normalize()
+    start = dates.min()
+    day_codes = ((dates - start).dt.days).to_numpy()
+    n_days = int(day_codes.max()) + 1
+
+    counts = np.zeros((len(locations), n_days), dtype=np.uint16)
+    max_intensity = np.full((len(locations), n_days), NO_REPORT, dtype=np.int8)
+    np.add.at(counts, (location_codes, day_codes), 1)
+    np.maximum.at(max_intensity, (location_codes, day_codes), events['Intensity'].to_numpy(dtype=np.int8))
+    return RainfallCube(locations, start, counts, max_intensity)
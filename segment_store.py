@@ -0,0 +1,164 @@
+import gzip
+import hashlib
+import io
+import json
+import threading
+
+import pandas as pd
+
+from data_store import DATA_DIR, DATASETS, STORE_DIR, STORE_MANIFEST, dataset_path
+
+CHUNK_BYTES = 1 << 20
+COMPRESS_LEVEL = 9
+
+_pack_lock = threading.Lock()
+
+
+def read_manifest(store_dir=STORE_DIR):
+    try:
+        with open(store_dir / STORE_MANIFEST, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _source_stat(path):
+    stat = path.stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def is_current(entry, path):
+    """Whether a stored dataset holds exactly the bytes of the merged CSV at path"""
+    return entry is not None and path.exists() and entry['source'] == _source_stat(path)
+
+
+def _write_segment(path, chunks):
+    """Gzip chunks into a new segment file; mtime and name are left out of the header so equal content gives equal bytes"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    written = 0
+    with open(tmp_path, 'wb') as raw, gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=COMPRESS_LEVEL, mtime=0) as f:
+        for chunk in chunks:
+            f.write(chunk)
+            written += len(chunk)
+    tmp_path.replace(path)
+    return written
+
+
+def pack_dataset(entry, key, data_dir=DATA_DIR, store_dir=STORE_DIR):
+    """Store one merged CSV, appending only the bytes past the stored prefix as a new segment when the old content is unchanged"""
+    path = dataset_path(key, data_dir)
+    if is_current(entry, path):
+        return entry
+    dataset_dir = store_dir / key
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+    stored_bytes = entry['bytes'] if entry else 0
+
+    # The file is hashed in chunks up to the stored length; a matching prefix means the refresh only appended rows
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        remaining = stored_bytes
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+        appended = entry is not None and remaining == 0 and digest.hexdigest() == entry['sha1']
+        if not appended:
+            f.seek(0)
+            digest, stored_bytes = hashlib.sha1(), 0
+
+        def tail():
+            while chunk := f.read(CHUNK_BYTES):
+                digest.update(chunk)
+                yield chunk
+
+        seq = entry['segments'][-1]['seq'] + 1 if entry and entry['segments'] else 0
+        segment = {'seq': seq, 'file': f"{key}/{seq:05d}.csv.gz", 'offset': stored_bytes}
+        segment['bytes'] = _write_segment(store_dir / segment['file'], tail())
+
+    segments = entry['segments'] if appended else []
+    if segment['bytes'] or not segments:
+        segments = segments + [segment]
+    else:
+        (store_dir / segment['file']).unlink()
+    if not appended:
+        # Rewritten files start over; superseded segments are deleted, never modified
+        keep = {s['file'] for s in segments}
+        for old in dataset_dir.glob('*.csv.gz'):
+            if f"{key}/{old.name}" not in keep:
+                old.unlink()
+    print(f"Debug: Packed {key} as {'append of' if appended else 'new base with'} {segment['bytes']} bytes, {len(segments)} segments")
+    return {
+        'bytes': stored_bytes + segment['bytes'],
+        'sha1': digest.hexdigest(),
+        'source': _source_stat(path),
+        'segments': segments
+    }
+
+
+def pack_data_dir(data_dir=DATA_DIR, store_dir=STORE_DIR):
+    """Bring the compressed store up to date with every merged CSV in data_dir"""
+    with _pack_lock:
+        manifest = read_manifest(store_dir) or {'datasets': {}}
+        for key in DATASETS:
+            if dataset_path(key, data_dir).exists():
+                manifest['datasets'][key] = pack_dataset(manifest['datasets'].get(key), key, data_dir, store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = store_dir / (STORE_MANIFEST + '.tmp')
+        tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding='utf-8')
+        tmp_path.replace(store_dir / STORE_MANIFEST)
+        return manifest
+
+
+class _SegmentReader(io.RawIOBase):
+    """One byte stream over a dataset's segments, decompressed as it is read"""
+
+    def __init__(self, paths):
+        self._paths = iter(paths)
+        self._current = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self._current is None:
+                path = next(self._paths, None)
+                if path is None:
+                    return 0
+                self._current = gzip.open(path, 'rb')
+            n = self._current.readinto(buffer)
+            if n:
+                return n
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+        super().close()
+
+
+def open_dataset(entry, store_dir=STORE_DIR):
+    return io.BufferedReader(_SegmentReader([store_dir / segment['file'] for segment in entry['segments']]), CHUNK_BYTES)
+
+
+def open_source(key, data_dir=DATA_DIR, store_dir=STORE_DIR):
+    """Binary stream of one merged dataset: the compressed store when it matches (or replaces) the CSV, else the CSV; None when neither exists"""
+    path = dataset_path(key, data_dir)
+    entry = (read_manifest(store_dir) or {'datasets': {}})['datasets'].get(key)
+    if entry is not None and (is_current(entry, path) or not path.exists()):
+        return open_dataset(entry, store_dir)
+    if path.exists():
+        return open(path, 'rb')
+    return None
+
+
+def read_dataset(key, data_dir=DATA_DIR, store_dir=STORE_DIR):
+    """One merged dataset as a DataFrame, read through open_source; None when it does not exist"""
+    source = open_source(key, data_dir, store_dir)
+    if source is None:
+        return None
+    with source as f:
+        return pd.read_csv(f)
@@ -0,0 +1,182 @@
+import json
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from change_feed import diff_fingerprints, fingerprint_table
+from data_store import DATA_DIR, DATASETS, STORE_DIR, data_version
+from segment_store import read_dataset
+
+SNAPSHOT_DIR = DATA_DIR / "snapshots"
+MANIFEST_NAME = "manifest.json"
+FINGERPRINT = '_fingerprint'
+
+_snapshot_lock = threading.Lock()
+
+
+def read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(snapshot_dir / MANIFEST_NAME, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _delta_path(snapshot_dir, entry, key, suffix):
+    return snapshot_dir / f"{entry['seq']:05d}" / f"{key}{suffix}"
+
+
+def _added_fingerprints(snapshot_dir, entry, key):
+    path = _delta_path(snapshot_dir, entry, key, '.parquet')
+    if not path.exists():
+        return np.array([], dtype=np.uint64)
+    return pq.read_table(path, columns=[FINGERPRINT]).column(FINGERPRINT).to_numpy().astype(np.uint64)
+
+
+def _chain(manifest, key, position):
+    """Entries from the dataset's latest base up to position, oldest first"""
+    entries = manifest['versions'][:position + 1]
+    start = max(i for i, entry in enumerate(entries) if entry['datasets'][key]['rebase'])
+    return entries[start:]
+
+
+def _next_order(order, snapshot_dir, entry, key):
+    """Row fingerprints after one delta: its stored order, or the previous rows minus removed plus added"""
+    info = entry['datasets'][key]
+    if info['order']:
+        return np.load(_delta_path(snapshot_dir, entry, key, '.order.npy'))
+    added = _added_fingerprints(snapshot_dir, entry, key)
+    if info['rebase']:
+        return added
+    removed_path = _delta_path(snapshot_dir, entry, key, '.removed.npy')
+    removed = np.load(removed_path) if removed_path.exists() else np.array([], dtype=np.uint64)
+    return np.concatenate([order[~np.isin(order, removed)], added])
+
+
+def replay_order(manifest, key, position, snapshot_dir=SNAPSHOT_DIR):
+    """Row fingerprints of one dataset at the snapshot in position, replayed from its base"""
+    order = np.array([], dtype=np.uint64)
+    for entry in _chain(manifest, key, position):
+        order = _next_order(order, snapshot_dir, entry, key)
+    return order
+
+
+def replay_dataset(manifest, key, position, snapshot_dir=SNAPSHOT_DIR):
+    """One dataset as it was at the snapshot in position: base rows plus every delta's added rows, arranged by the replayed order"""
+    chain = _chain(manifest, key, position)
+    columns = chain[0]['datasets'][key]['columns']
+    order = np.array([], dtype=np.uint64)
+    pool = []
+    for entry in chain:
+        order = _next_order(order, snapshot_dir, entry, key)
+        added_path = _delta_path(snapshot_dir, entry, key, '.parquet')
+        if added_path.exists():
+            pool.append(pd.read_parquet(added_path))
+    if not columns:
+        return pd.DataFrame()
+    if not pool:
+        return pd.DataFrame(columns=columns)
+    rows = pd.concat(pool, ignore_index=True).drop_duplicates(FINGERPRINT).set_index(FINGERPRINT)
+    frame = rows.loc[order.astype(rows.index.dtype)].reset_index(drop=True)
+    return frame.set_axis(columns, axis=1)
+
+
+def replay_snapshot(manifest, version, snapshot_dir=SNAPSHOT_DIR):
+    """Every dataset as of the refresh that recorded version"""
+    position = next(i for i, entry in enumerate(manifest['versions']) if entry['version'] == version)
+    return {key: replay_dataset(manifest, key, position, snapshot_dir) for key in DATASETS}
+
+
+def _write_delta(manifest, key, df, root, snapshot_dir):
+    """Write one dataset's rows added since the previous snapshot, the fingerprints removed, and the order when not implied"""
+    base = _chain(manifest, key, len(manifest['versions']) - 1)[0]['datasets'][key] if manifest['versions'] else None
+    columns = list(df.columns)
+    # Occurrence-numbered like the change feed's, so a repeated row counts as added here too
+    table = fingerprint_table(df, key)
+    fingerprints = table['Fingerprint'].to_numpy()
+    # A new or re-headed file starts a new base; only bases record the header
+    rebase = base is None or base['columns'] != columns
+    previous_order = np.array([], dtype=np.uint64) if rebase else replay_order(manifest, key, len(manifest['versions']) - 1, snapshot_dir)
+
+    added_positions = np.flatnonzero(~np.isin(fingerprints, previous_order))
+    removed = np.setdiff1d(previous_order, fingerprints)
+    implied_order = np.concatenate([previous_order[~np.isin(previous_order, removed)], fingerprints[added_positions]])
+    store_order = not np.array_equal(implied_order, fingerprints)
+
+    changed = 0
+    if len(removed) and len(added_positions):
+        previous_df = replay_dataset(manifest, key, len(manifest['versions']) - 1, snapshot_dir)
+        status, _ = diff_fingerprints(fingerprint_table(previous_df, key), table)
+        changed = int((status[added_positions] == 'Changed').sum())
+
+    if len(added_positions):
+        # Headers can repeat after stripping, so columns are stored by position as in the partition store
+        added = df.iloc[added_positions].set_axis([f"c{i}" for i in range(len(columns))], axis=1)
+        added[FINGERPRINT] = fingerprints[added_positions]
+        pq.write_table(pa.Table.from_pandas(added, preserve_index=False), root / f"{key}.parquet")
+    if len(removed) and not rebase:
+        np.save(root / f"{key}.removed.npy", removed)
+    if store_order:
+        np.save(root / f"{key}.order.npy", fingerprints)
+    delta = {
+        'rows': len(df),
+        'rebase': rebase,
+        'added': len(added_positions) - changed,
+        'changed': changed,
+        'removed': 0 if rebase else len(removed) - changed,
+        'order': store_order
+    }
+    return {'columns': columns, **delta} if rebase else delta
+
+
+def record_snapshot(version, data, snapshot_dir=SNAPSHOT_DIR):
+    """Append the data version to the snapshot history as compact per-dataset deltas; a no-op when already recorded"""
+    with _snapshot_lock:
+        manifest = read_manifest(snapshot_dir) or {'versions': []}
+        if any(entry['version'] == version for entry in manifest['versions']):
+            return manifest
+        entry = {
+            'seq': manifest['versions'][-1]['seq'] + 1 if manifest['versions'] else 0,
+            'version': version,
+            'recorded': datetime.now().isoformat(timespec='seconds'),
+            'datasets': {}
+        }
+        root = snapshot_dir / f"{entry['seq']:05d}"
+        root.mkdir(parents=True, exist_ok=True)
+        for key in DATASETS:
+            entry['datasets'][key] = _write_delta(manifest, key, data.get(key, pd.DataFrame()), root, snapshot_dir)
+        manifest['versions'].append(entry)
+
+        tmp_path = snapshot_dir / (MANIFEST_NAME + '.tmp')
+        tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding='utf-8')
+        tmp_path.replace(snapshot_dir / MANIFEST_NAME)
+        summary = ', '.join(f"{key} +{d['added']} ~{d['changed']} -{d['removed']}" for key, d in entry['datasets'].items())
+        print(f"Debug: Recorded snapshot {entry['seq']} for data version {version}: {summary}")
+        return manifest
+
+
+def snapshot_history(manifest):
+    """One row per recorded refresh with rows added, changed and removed in each dataset"""
+    rows = []
+    for entry in (manifest or {}).get('versions', []):
+        row = {'Snapshot': entry['seq'], 'Version': entry['version'], 'Recorded': entry['recorded']}
+        for key, info in entry['datasets'].items():
+            row[f"{key.capitalize()} Rows"] = info['rows']
+            row[f"{key.capitalize()} +/~/-"] = 'new base' if info['rebase'] else f"+{info['added']} ~{info['changed']} -{info['removed']}"
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def record_data_dir(data_dir=DATA_DIR, snapshot_dir=SNAPSHOT_DIR, store_dir=STORE_DIR):
+    """Record the merged datasets currently in data_dir, read the same way the dashboard loads them"""
+    data = {}
+    for key in DATASETS:
+        df = read_dataset(key, data_dir, store_dir)
+        df = pd.DataFrame() if df is None else df
+        df.columns = df.columns.str.strip()
+        data[key] = df
+    return record_snapshot(data_version(data_dir), data, snapshot_dir)
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from conflicts import VISIT_DATE_COLUMNS
+from data_store import english_names, farm_attributes, find_column
+from visit_calendar import parse_dates
+
+DAS_BUCKET_DAYS = 15
+# Later visits (mostly mistyped sowing dates) share one open-ended bucket
+MAX_DAS_DAYS = 240
+BEFORE_SOWING = 'Before sowing'
+VISIT_TABLE_COLUMNS = ['Dataset', 'Row', 'Farmer ID', 'FE_Name', 'Visit Date', 'Sowing Date', 'Days After Sowing',
+                       'Cluster name', 'Village', 'Variety', 'Area (acres)']
+
+TIMING_LEVELS = {
+    'Cluster': 'Cluster name',
+    'Village': 'Village',
+    'FE': 'FE_Name'
+}
+
+
+def sowing_attributes(farminfo_df):
+    """Farm attributes plus cotton sowing date and variety, indexed by integer Farmer ID"""
+    farms = farm_attributes(farminfo_df)
+    if farms.empty:
+        return farms.assign(**{'Sowing Date': pd.Series(dtype='datetime64[s]'), 'Variety': pd.Series(dtype=object)})
+    farminfo_df = farminfo_df.assign(**{'Farmer ID': pd.to_numeric(farminfo_df['Farmer ID'], errors='coerce')})
+    farminfo_df = farminfo_df.dropna(subset=['Farmer ID']).drop_duplicates('Farmer ID')
+    sowing_col, variety_col = find_column(farminfo_df, 'Cotton sowing date'), find_column(farminfo_df, 'Cotton Variety')
+    extra = pd.DataFrame({
+        'Sowing Date': parse_dates(farminfo_df[sowing_col]) if sowing_col else np.full(len(farminfo_df), np.datetime64('NaT'), dtype='datetime64[D]'),
+        'Variety': english_names(farminfo_df[variety_col]) if variety_col else np.full(len(farminfo_df), None, dtype=object)
+    }, index=pd.Index(farminfo_df['Farmer ID'].astype('int64').to_numpy(), name='Farmer ID'))
+    return farms.join(extra)
+
+
+def build_visit_table(data):
+    """Every visit row of every visit dataset joined once to its farm's sowing date, cluster, village, variety and area"""
+    frames = []
+    for key, date_col in VISIT_DATE_COLUMNS.items():
+        df = data.get(key, pd.DataFrame())
+        if df.empty or 'Farmer ID' not in df.columns or date_col not in df.columns:
+            continue
+        frames.append(pd.DataFrame({
+            'Dataset': key,
+            'Row': np.arange(len(df), dtype=np.int32),
+            'Farmer ID': pd.to_numeric(df['Farmer ID'], errors='coerce').to_numpy(dtype=np.float64),
+            'FE_Name': df['FE_Name'].to_numpy(dtype=object) if 'FE_Name' in df.columns else None,
+            'Visit Date': parse_dates(df[date_col])
+        }))
+    if not frames:
+        return pd.DataFrame(columns=VISIT_TABLE_COLUMNS)
+
+    visits = pd.concat(frames, ignore_index=True)
+    visits = visits[visits['Farmer ID'].notna() & visits['Visit Date'].notna()]
+    visits['Farmer ID'] = visits['Farmer ID'].astype('int64')
+    # FE_Name stays the one who recorded the visit, as in the per-period analysis
+    visits = visits.join(sowing_attributes(data.get('farminfo', pd.DataFrame())).drop(columns='FE_Name'), on='Farmer ID')
+    # Both dates are day-resolution arrays, so days after sowing is one subtraction; unknown sowing dates stay NaN
+    elapsed = visits['Visit Date'].to_numpy(dtype='datetime64[D]') - visits['Sowing Date'].to_numpy(dtype='datetime64[D]')
+    visits['Days After Sowing'] = np.where(np.isnat(elapsed), np.nan, elapsed.astype(np.int64)).astype(np.float32)
+    visits['Dataset'] = pd.Categorical(visits['Dataset'], categories=list(VISIT_DATE_COLUMNS))
+    print(f"Debug: Visit table with {len(visits)} rows, {int(visits['Days After Sowing'].isna().sum())} without a sowing date")
+    return visits[VISIT_TABLE_COLUMNS].reset_index(drop=True)
+
+
+def das_slots(days_after_sowing, bucket_days=DAS_BUCKET_DAYS, max_days=MAX_DAS_DAYS):
+    """Days-after-sowing bucket code of each visit (-1 when the sowing date is unknown) and the bucket labels"""
+    das = np.asarray(days_after_sowing, dtype=np.float64)
+    known = ~np.isnan(das)
+    if not known.any():
+        return np.full(len(das), -1, dtype=np.int32), []
+    # Slot 0 holds visits before sowing; bucket b (0-based) covers b*bucket_days .. (b+1)*bucket_days - 1
+    last_bucket = max_days // bucket_days
+    buckets = np.clip(np.floor_divide(np.where(known, das, 0), bucket_days), -1, last_bucket).astype(np.int32)
+    codes = np.where(known, buckets + 1, -1).astype(np.int32)
+    labels = [BEFORE_SOWING] + [f"DAS {b * bucket_days}-{(b + 1) * bucket_days - 1}" for b in range(last_bucket)] + [f"DAS {last_bucket * bucket_days}+"]
+    return codes, labels
+
+
+def period_slots(visit_dates, calendar):
+    """Visit period code of each visit under a calendar (-1 outside every period) and the period labels"""
+    labels = calendar.period_names
+    codes = pd.Categorical(calendar.classify(pd.Series(visit_dates).dt.strftime('%Y-%m-%d')), categories=labels).codes
+    return codes.astype(np.int32), labels
+
+
+class VisitTimingCube:
+    """Farmers visited per (location, dataset, timing slot), stored as a dense uint16 array; slots are visit periods or DAS buckets"""
+
+    def __init__(self, locations, slots, counts):
+        self.locations = locations
+        self.slots = slots
+        self.counts = counts
+
+    def _location_rows(self, cluster=None):
+        if cluster and cluster != "All":
+            return np.flatnonzero((self.locations['Cluster name'] == cluster).to_numpy())
+        return np.arange(len(self.locations))
+
+    def table(self, cluster=None, dataset=None):
+        """Location x slot table of farmers visited, for one dataset or summed over all of them"""
+        rows = self._location_rows(cluster)
+        datasets = [list(VISIT_DATE_COLUMNS).index(dataset)] if dataset else slice(None)
+        grid = self.counts[rows][:, datasets].sum(axis=1, dtype=np.int64)
+        index = pd.MultiIndex.from_frame(self.locations.iloc[rows]) if self.locations.shape[1] > 1 else pd.Index(self.locations.iloc[rows, 0], name=self.locations.columns[0])
+        table = pd.DataFrame(grid, index=index, columns=self.slots)
+        return table.loc[:, (table != 0).any(axis=0)]
+
+    def totals(self, cluster=None):
+        """Dataset x slot farmer counts summed over the cluster's locations"""
+        rows = self._location_rows(cluster)
+        totals = self.counts[rows].sum(axis=0, dtype=np.int64)
+        return pd.DataFrame(totals, index=pd.Index(list(VISIT_DATE_COLUMNS), name='Dataset'), columns=self.slots)
+
+
+def build_timing_cube(visits, level, slot_codes, slot_labels):
+    """Aggregate the visit table into a VisitTimingCube for one level, counting each farmer once per cell"""
+    key = TIMING_LEVELS[level]
+    keys = ['Cluster name'] if key == 'Cluster name' else ['Cluster name', key]
+    keep = (visits[keys].notna().all(axis=1) & (slot_codes >= 0)).to_numpy()
+    visits, slot_codes = visits[keep], np.asarray(slot_codes)[keep]
+    if visits.empty:
+        return VisitTimingCube(pd.DataFrame(columns=keys), list(slot_labels), np.zeros((0, len(VISIT_DATE_COLUMNS), len(slot_labels)), dtype=np.uint16))
+
+    grouped = visits.groupby(keys, sort=True)
+    cells = pd.DataFrame({
+        'loc': grouped.ngroup().to_numpy(),
+        'dataset': visits['Dataset'].cat.codes.to_numpy(),
+        'slot': slot_codes,
+        'farmer': visits['Farmer ID'].to_numpy()
+    }).drop_duplicates()
+    counts = np.zeros((grouped.ngroups, len(VISIT_DATE_COLUMNS), len(slot_labels)), dtype=np.uint16)
+    np.add.at(counts, (cells['loc'].to_numpy(), cells['dataset'].to_numpy(), cells['slot'].to_numpy()), 1)
+    return VisitTimingCube(grouped.size().index.to_frame(index=False), list(slot_labels), counts)
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+from data_store import farm_attributes
+from farm_geometry import METRES_PER_DEGREE
+
+# Grid cells are this many times the median farm bounding-box size, so most farms touch 1-4 cells
+CELL_SIZE_FACTOR = 4
+_KEY_STRIDE = np.int64(1 << 24)
+
+
+def _expand_ranges(starts, ends):
+    """(owner, position) pairs for every position in each [start, end) range"""
+    lengths = np.maximum(ends - starts, 0)
+    owners = np.repeat(np.arange(len(starts)), lengths)
+    positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+    return owners, positions
+
+
+def _distance_m(lon1, lat1, lon2, lat2):
+    """Equirectangular distance in metres, accurate at farm-to-village scales"""
+    mean_lat = np.radians((lat1 + lat2) / 2)
+    return np.hypot((lon2 - lon1) * np.cos(mean_lat), lat2 - lat1) * METRES_PER_DEGREE
+
+
+class FarmSpatialIndex:
+    """Uniform grid over farm bounding boxes, stored as sorted cell keys with CSR offsets into farm indices"""
+
+    def __init__(self, geometry, cell_deg=None):
+        self.geometry = geometry
+        n_farms = len(geometry)
+        self.bboxes = np.full((n_farms, 4), np.nan)
+        if len(geometry.coords):
+            point_polygon = np.repeat(geometry.ring_polygon(), np.diff(geometry.ring_offsets))
+            for axis in (0, 1):
+                lo, hi = np.full(n_farms, np.inf), np.full(n_farms, -np.inf)
+                np.minimum.at(lo, point_polygon, geometry.coords[:, axis])
+                np.maximum.at(hi, point_polygon, geometry.coords[:, axis])
+                self.bboxes[:, axis], self.bboxes[:, axis + 2] = np.where(np.isfinite(lo), lo, np.nan), np.where(np.isfinite(hi), hi, np.nan)
+        self.indexed = np.flatnonzero(~np.isnan(self.bboxes[:, 0]))
+
+        if cell_deg is None:
+            sizes = np.maximum(self.bboxes[self.indexed, 2] - self.bboxes[self.indexed, 0], self.bboxes[self.indexed, 3] - self.bboxes[self.indexed, 1])
+            cell_deg = float(np.median(sizes)) * CELL_SIZE_FACTOR if len(sizes) else 0.01
+        self.cell_deg = max(cell_deg, 1e-5)
+        self.origin = np.nanmin(self.bboxes[:, :2], axis=0) if len(self.indexed) else np.zeros(2)
+
+        # One (cell, farm) entry for every grid cell a farm's bounding box touches
+        ix0, iy0 = self._cell(self.bboxes[self.indexed, 0], self.bboxes[self.indexed, 1])
+        ix1, iy1 = self._cell(self.bboxes[self.indexed, 2], self.bboxes[self.indexed, 3])
+        keys, farms = self._cover(ix0, iy0, ix1, iy1)
+        order = np.argsort(keys, kind='stable')
+        keys, farms = keys[order], self.indexed[farms[order]]
+        self.cell_keys, first = np.unique(keys, return_index=True)
+        self.cell_offsets = np.append(first, len(keys))
+        self.entries = farms
+
+    def __len__(self):
+        return len(self.indexed)
+
+    def _cell(self, lon, lat):
+        return (np.floor((np.asarray(lon) - self.origin[0]) / self.cell_deg).astype(np.int64),
+                np.floor((np.asarray(lat) - self.origin[1]) / self.cell_deg).astype(np.int64))
+
+    @staticmethod
+    def _cover(ix0, iy0, ix1, iy1):
+        """Cell keys covering each [ix0..ix1] x [iy0..iy1] block, with the block they came from"""
+        width, height = ix1 - ix0 + 1, iy1 - iy0 + 1
+        owners, offsets = _expand_ranges(np.zeros(len(ix0), dtype=np.int64), width * height)
+        ix = ix0[owners] + offsets % width[owners]
+        iy = iy0[owners] + offsets // width[owners]
+        return ix * _KEY_STRIDE + iy, owners
+
+    def candidates(self, lon0, lat0, lon1, lat1):
+        """(query, farm) pairs whose bounding boxes intersect each query box"""
+        lon0, lat0, lon1, lat1 = (np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (lon0, lat0, lon1, lat1))
+        # Queries without coordinates (farms with a degenerate boundary) match nothing
+        valid = np.flatnonzero(np.isfinite(lon0) & np.isfinite(lat0) & np.isfinite(lon1) & np.isfinite(lat1))
+        if not len(self.entries) or not len(valid):
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        lon0, lat0, lon1, lat1 = lon0[valid], lat0[valid], lon1[valid], lat1[valid]
+        ix0, iy0 = self._cell(lon0, lat0)
+        ix1, iy1 = self._cell(lon1, lat1)
+        keys, queries = self._cover(ix0, iy0, ix1, iy1)
+        slots = np.clip(np.searchsorted(self.cell_keys, keys), 0, len(self.cell_keys) - 1)
+        hit = self.cell_keys[slots] == keys
+        owners, positions = _expand_ranges(self.cell_offsets[slots[hit]], self.cell_offsets[slots[hit] + 1])
+        pairs = np.unique(np.column_stack([queries[hit][owners], self.entries[positions]]), axis=0)
+        query, farm = pairs[:, 0], pairs[:, 1]
+        box = self.bboxes[farm]
+        overlap = (box[:, 0] <= lon1[query]) & (box[:, 2] >= lon0[query]) & (box[:, 1] <= lat1[query]) & (box[:, 3] >= lat0[query])
+        return valid[query[overlap]], farm[overlap]
+
+    def points_in_farms(self, lon, lat):
+        """Every (point, farm) pair where the point falls inside the farm polygon, by even-odd ray casting"""
+        lon, lat = np.atleast_1d(np.asarray(lon, dtype=np.float64)), np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        point, farm = self.candidates(lon, lat, lon, lat)
+        if not len(point):
+            return point, farm
+
+        # Every edge of every candidate polygon, across all of its rings
+        geometry = self.geometry
+        starts = geometry.ring_offsets[geometry.polygon_offsets[farm]]
+        ends = geometry.ring_offsets[geometry.polygon_offsets[farm + 1]]
+        pair, vertex = _expand_ranges(starts, ends)
+        nxt = geometry.ring_neighbours()[1][vertex]
+        x1, y1 = geometry.coords[vertex, 0], geometry.coords[vertex, 1]
+        x2, y2 = geometry.coords[nxt, 0], geometry.coords[nxt, 1]
+        px, py = lon[point[pair]], lat[point[pair]]
+        straddles = (y1 > py) != (y2 > py)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            crossing_x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        crosses = straddles & (px < crossing_x)
+        inside = np.bincount(pair, weights=crosses, minlength=len(point)).astype(np.int64) % 2 == 1
+        return point[inside], farm[inside]
+
+    def locate_points(self, lon, lat):
+        """Index of the smallest farm containing each point, or -1 where no farm does"""
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        located = np.full(len(lon), -1, dtype=np.int64)
+        point, farm = self.points_in_farms(lon, lat)
+        order = np.lexsort((self.geometry.area_acres[farm], point))[::-1]
+        located[point[order]] = farm[order]
+        return located
+
+    def farms_near_points(self, lon, lat, radius_m):
+        """(point, farm, distance) for every farm whose centroid lies within radius_m of a point"""
+        lon, lat = np.atleast_1d(np.asarray(lon, dtype=np.float64)), np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        dlat = radius_m / METRES_PER_DEGREE
+        dlon = dlat / np.maximum(np.cos(np.radians(lat)), 1e-6)
+        point, farm = self.candidates(lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+        centroids = self.geometry.centroids[farm]
+        distance = _distance_m(lon[point], lat[point], centroids[:, 0], centroids[:, 1])
+        close = distance <= radius_m
+        return pd.DataFrame({'Point': point[close], 'Farm': farm[close], 'Distance (m)': distance[close].round(1)})
+
+    def nearby_farm_pairs(self, radius_m):
+        """Each unordered pair of distinct farms whose centroids lie within radius_m of each other"""
+        centroids = self.geometry.centroids[self.indexed]
+        near = self.farms_near_points(centroids[:, 0], centroids[:, 1], radius_m)
+        near['Point'] = self.indexed[near['Point'].to_numpy()]
+        near = near[near['Point'] < near['Farm']]
+        ids = self.geometry.farmer_ids
+        return pd.DataFrame({
+            'Farmer ID': ids[near['Point'].to_numpy()],
+            'Nearby Farmer ID': ids[near['Farm'].to_numpy()],
+            'Distance (m)': near['Distance (m)'].to_numpy()
+        })
+
+    def overlapping_farms(self):
+        """Farms whose centroid falls inside another farm's boundary"""
+        centroids = self.geometry.centroids[self.indexed]
+        point, farm = self.points_in_farms(centroids[:, 0], centroids[:, 1])
+        owner = self.indexed[point]
+        other = owner != farm
+        ids = self.geometry.farmer_ids
+        return pd.DataFrame({'Farmer ID': ids[owner[other]], 'Overlaps Farmer ID': ids[farm[other]]})
+
+
+def nearby_farms_table(index, farminfo_df, radius_m):
+    """Nearby farm pairs with both farms' cluster, village and FE, closest first"""
+    farms = farm_attributes(farminfo_df)[['Cluster name', 'Village', 'FE_Name']]
+    pairs = index.nearby_farm_pairs(radius_m)
+    pairs = pairs.join(farms, on='Farmer ID').join(farms.add_prefix('Nearby '), on='Nearby Farmer ID')
+    pairs['Same FE'] = pairs['FE_Name'] == pairs['Nearby FE_Name']
+    return pairs[['Cluster name', 'Village', 'FE_Name', 'Farmer ID', 'Nearby Farmer ID', 'Nearby Village', 'Nearby FE_Name', 'Same FE', 'Distance (m)']] \
+        .sort_values('Distance (m)').reset_index(drop=True)
+
+
+def flag_overlaps(checked, index):
+    """Add the overlapping farm to an area-check table and flag otherwise-clean farms that overlap"""
+    overlaps = index.overlapping_farms().groupby('Farmer ID')['Overlaps Farmer ID'] \
+        .agg(lambda ids: ', '.join(str(i) for i in sorted(ids)))
+    checked = checked.copy()
+    checked['Overlaps Farmer ID'] = checked['Farmer ID'].map(overlaps)
+    checked.loc[checked['Overlaps Farmer ID'].notna() & (checked['Status'] == 'OK'), 'Status'] = 'Overlaps another farm'
+    return checked
@@ -0,0 +1,258 @@
+import numpy as np
+import pandas as pd
+
+from conflicts import VISIT_DATE_COLUMNS
+from data_store import DATA_DIR, DATASETS, STORE_DIR
+from observation_metrics import METRIC_LABELS, OBSERVATION_METRICS, extract_metrics, observation_value_mask
+from segment_store import open_source
+from visit_calendar import VISIT_PERIOD_NAMES
+
+CHUNK_ROWS = 20000
+METRIC_KEYS = [key for key, _, _ in OBSERVATION_METRICS]
+NO_VISIT_DATA = 'No visit data collected'
+
+_EMPTY_BITMAP = np.zeros(0, dtype=np.uint8)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def _set_bits(bitmap, codes):
+    """OR farmer codes into a little-endian packed bitmap, growing it geometrically; returns the (possibly new) array"""
+    if not len(codes):
+        return bitmap
+    size = int(codes.max()) // 8 + 1
+    if len(bitmap) < size:
+        bitmap = np.concatenate([bitmap, np.zeros(max(size, 2 * len(bitmap)) - len(bitmap), dtype=np.uint8)])
+    np.bitwise_or.at(bitmap, codes >> 3, np.left_shift(1, codes & 7).astype(np.uint8))
+    return bitmap
+
+
+def _intersect(a, b):
+    size = min(len(a), len(b))
+    return a[:size] & b[:size]
+
+
+def bitmap_count(bitmap):
+    return int(_POPCOUNT[bitmap].sum())
+
+
+def bitmap_members(bitmap):
+    return np.flatnonzero(np.unpackbits(bitmap, bitorder='little'))
+
+
+class RunningAggregates:
+    """Per FE and visit period farmer bitmaps, record counts and observation metric sums, folded in one chunk at a time"""
+
+    def __init__(self, calendar_name, registry):
+        self.calendar_name = calendar_name
+        # Cluster overrides classify the same rows differently, so each override calendar gets its own bitmaps
+        self.calendars = {None: registry.get(calendar_name),
+                          **{cluster: calendar for (name, cluster), calendar in registry.overrides.items() if name == calendar_name}}
+        self._codes = {}
+        self.farmer_ids = []
+        self.primary_cluster = {}
+        self.rows = {key: 0 for key in DATASETS}
+        self.dated = {}
+        self.clusters = {}
+        self.row_fes = {key: {} for key in DATASETS}
+        self.row_farmers = {}
+        self.registered = {}
+        self.visited = {}
+        self.visit_fes = {}
+        self.records = {}
+        self.metric_sums = {}
+
+    def _encode(self, farmer_ids):
+        """Dense bit position of every Farmer ID, -1 where missing; new farmers get the next free position"""
+        ids = farmer_ids.to_numpy(dtype=np.float64)
+        valid = ~np.isnan(ids)
+        for farmer_id in pd.unique(ids[valid]):
+            if farmer_id not in self._codes:
+                self._codes[farmer_id] = len(self.farmer_ids)
+                self.farmer_ids.append(farmer_id)
+        codes = np.full(len(ids), -1, dtype=np.int64)
+        codes[valid] = pd.Series(ids[valid]).map(self._codes).to_numpy(dtype=np.int64)
+        return codes
+
+    @staticmethod
+    def _fold_groups(store, prefix, labels, codes):
+        """OR each label group's farmer codes into store[prefix + group], creating the entry even when no code is valid"""
+        if labels.empty:
+            return
+        for group, positions in labels.groupby(list(labels.columns), sort=False, dropna=True).indices.items():
+            group = prefix + (group if isinstance(group, tuple) else (group,))
+            # Single-label stores are keyed by the bare label
+            entry = group if len(group) > 1 else group[0]
+            group_codes = codes[positions]
+            store[entry] = _set_bits(store.get(entry, _EMPTY_BITMAP), group_codes[group_codes >= 0])
+
+    def fold(self, key, chunk):
+        """Fold one chunk of a dataset into the running aggregates; the chunk can be dropped afterwards"""
+        chunk.columns = chunk.columns.str.strip()
+        self.rows[key] += len(chunk)
+        fe = chunk['FE_Name'] if 'FE_Name' in chunk.columns else pd.Series(np.nan, index=chunk.index, dtype=object)
+        codes = self._encode(pd.to_numeric(chunk['Farmer ID'], errors='coerce') if 'Farmer ID' in chunk.columns else pd.Series(np.nan, index=chunk.index))
+        for fe_name in fe.dropna().unique():
+            self.row_fes[key].setdefault(fe_name, None)
+        self._fold_groups(self.row_farmers, (key,), pd.DataFrame({'FE_Name': fe.to_numpy()}), codes)
+        if key == 'farminfo':
+            self._fold_farminfo(chunk, fe, codes)
+        elif key in VISIT_DATE_COLUMNS:
+            self._fold_visits(key, chunk, fe, codes)
+
+    def _fold_farminfo(self, chunk, fe, codes):
+        clusters = chunk['Cluster name'] if 'Cluster name' in chunk.columns else pd.Series(np.nan, index=chunk.index, dtype=object)
+        # The first registration row decides a farmer's cluster, as in the observation rollup
+        for code, cluster in zip(codes, clusters.to_numpy(dtype=object)):
+            if code >= 0 and code not in self.primary_cluster:
+                self.primary_cluster[code] = cluster if pd.notna(cluster) else None
+        self._fold_groups(self.clusters, (), pd.DataFrame({'Cluster name': clusters.to_numpy()}), codes)
+        self._fold_groups(self.registered, (None,), pd.DataFrame({'FE_Name': fe.to_numpy()}), codes)
+        self._fold_groups(self.registered, (), pd.DataFrame({'Cluster name': clusters.to_numpy(), 'FE_Name': fe.to_numpy()}), codes)
+
+    def _fold_visits(self, key, chunk, fe, codes):
+        date_col = VISIT_DATE_COLUMNS[key]
+        self.dated[key] = date_col in chunk.columns
+        if not self.dated[key]:
+            return
+        known = (codes >= 0) & fe.notna().to_numpy()
+        # Visits count only observation records with plant values, while metric sums use every record as the rollup does
+        valid = known & observation_value_mask(chunk).to_numpy() if key == 'observation' else known
+        rows = np.flatnonzero(known)
+        if not len(rows):
+            return
+        dates, fe_names, row_codes, row_valid = chunk[date_col].iloc[rows], fe.to_numpy(dtype=object)[rows], codes[rows], valid[rows]
+
+        for variant, calendar in self.calendars.items():
+            periods = calendar.classify(dates)
+            in_period = np.isin(periods, VISIT_PERIOD_NAMES)
+            visits = in_period & row_valid
+            labels = pd.DataFrame({'FE_Name': fe_names[visits], 'Visit Period': periods[visits]})
+            self._fold_groups(self.visited, (key, variant), labels, row_codes[visits])
+            fes = self.visit_fes.setdefault((key, variant), {})
+            self._fold_groups(fes, (), labels[['FE_Name']], row_codes[visits])
+            if variant is not None:
+                continue
+
+            clusters = np.array([self.primary_cluster.get(code) for code in row_codes], dtype=object)
+            groups = pd.DataFrame({'Cluster name': clusters, 'FE_Name': fe_names, 'Visit Period': periods}).fillna({'Cluster name': ''})
+            for group, count in groups[visits].groupby(['Cluster name', 'FE_Name', 'Visit Period'], sort=False).size().items():
+                self.records[(key,) + group] = self.records.get((key,) + group, 0) + int(count)
+            if key == 'observation':
+                metrics = extract_metrics(chunk.iloc[rows[in_period]]).reindex(columns=METRIC_KEYS).set_axis(groups.index[in_period])
+                grouped = pd.concat([groups[in_period], metrics], axis=1).groupby(['Cluster name', 'FE_Name', 'Visit Period'], sort=False)[METRIC_KEYS]
+                for (group, sums), (_, counts) in zip(grouped.sum().iterrows(), grouped.count().iterrows()):
+                    previous = self.metric_sums.get(group, (np.zeros(len(METRIC_KEYS)), np.zeros(len(METRIC_KEYS), dtype=np.int64)))
+                    self.metric_sums[group] = (previous[0] + sums.to_numpy(dtype=np.float64), previous[1] + counts.to_numpy(dtype=np.int64))
+
+    def cluster_names(self):
+        return sorted(self.clusters)
+
+    def _members(self, cluster):
+        """Bitmap of the cluster's registered farmers, None for every farmer"""
+        return None if not cluster or cluster == "All" else self.clusters.get(cluster, _EMPTY_BITMAP)
+
+    def _restrict(self, bitmap, members):
+        return bitmap if members is None else _intersect(bitmap, members)
+
+    def _farmer_labels(self, bitmap):
+        return sorted(str(int(self.farmer_ids[code])) for code in bitmap_members(bitmap))
+
+    def fe_names(self, cluster=None):
+        """FEs in any dataset, limited to rows of the cluster's farmers"""
+        members = self._members(cluster)
+        if members is None:
+            return sorted({fe for fes in self.row_fes.values() for fe in fes})
+        return sorted({fe for (_, fe), bitmap in self.row_farmers.items() if bitmap_count(_intersect(bitmap, members))})
+
+    def registration_summary(self, cluster=None):
+        """FE x registered farmers table matching create_fe_summary_table"""
+        scope = None if not cluster or cluster == "All" else cluster
+        rows = []
+        for (row_scope, fe_name), bitmap in self.registered.items():
+            if row_scope == scope:
+                farmers = self._farmer_labels(bitmap)
+                rows.append({'FE Name': fe_name, 'Farmer Count': len(farmers), 'Farmer IDs': ', '.join(farmers) if farmers else '0'})
+        return pd.DataFrame(rows).sort_values('Farmer Count', ascending=False) if rows else pd.DataFrame()
+
+    def visit_analysis(self, key, cluster=None, selected_visits=None):
+        """Visit summary, comparison and detailed breakdown frames in the shape analyze_visit_data returns"""
+        if not self.rows[key]:
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        active_visits = VISIT_PERIOD_NAMES if selected_visits is None or 'All' in selected_visits else selected_visits
+        members = self._members(cluster)
+        variant = cluster if cluster in self.calendars else None
+
+        if not self.dated.get(key):
+            roster = list(self.row_fes[key])
+        else:
+            if key == 'observation':
+                roster = [fe for fe in self.row_fes[key]
+                          if members is None or bitmap_count(_intersect(self.row_farmers.get((key, fe), _EMPTY_BITMAP), members))]
+            else:
+                roster = [fe for fe, bitmap in self.visit_fes.get((key, variant), {}).items() if bitmap_count(self._restrict(bitmap, members))]
+
+        visit_summary, comparison_data, detailed_breakdown = [], [], []
+        for fe_name in roster:
+            bitmaps = {vp: self._restrict(self.visited.get((key, variant, fe_name, vp), _EMPTY_BITMAP), members) for vp in active_visits}
+            counts = {vp: bitmap_count(bitmap) for vp, bitmap in bitmaps.items()}
+            empty_label = NO_VISIT_DATA if not self.dated.get(key) else '0'
+            for vp in active_visits:
+                ids = ', '.join(self._farmer_labels(bitmaps[vp])) or empty_label
+                visit_summary.append({'FE Name': fe_name, 'Visit Period': vp, 'Farmer Count': counts[vp], 'Farmer IDs': ids})
+                detailed_breakdown.append({'FE Name': fe_name, 'Category': f'{vp} Farmers', 'Count': counts[vp], 'Farmer IDs': ids})
+            comparison_entry = {'FE Name': fe_name, **{f'Unique Farmers {vp}': counts[vp] for vp in active_visits}}
+            if len(active_visits) > 1 or not self.dated.get(key):
+                # Farmers visited in more than one of the active periods, from the stacked bitmaps
+                size = max((len(bitmap) for bitmap in bitmaps.values()), default=0)
+                stacked = np.stack([np.pad(bitmap, (0, size - len(bitmap))) for bitmap in bitmaps.values()]) if size else np.zeros((0, 0), dtype=np.uint8)
+                periods_per_farmer = np.unpackbits(stacked, axis=1, bitorder='little').sum(axis=0) if size else np.zeros(0)
+                multiple = np.packbits(periods_per_farmer > 1, bitorder='little')
+                multiple_ids = self._farmer_labels(multiple)
+                comparison_entry.update({'Farmers in Multiple Visits': len(multiple_ids), 'Multiple Visit IDs': ', '.join(multiple_ids) or empty_label})
+            comparison_data.append(comparison_entry)
+        return pd.DataFrame(visit_summary), pd.DataFrame(comparison_data), pd.DataFrame(detailed_breakdown)
+
+    def record_counts(self, cluster=None, selected_visits=None):
+        """Visit records per FE and dataset in the active periods"""
+        active_visits = set(VISIT_PERIOD_NAMES if selected_visits is None or 'All' in selected_visits else selected_visits)
+        rows = [{'Dataset': key.capitalize(), 'FE Name': fe_name, 'Records': count}
+                for (key, row_cluster, fe_name, vp), count in self.records.items()
+                if vp in active_visits and (not cluster or cluster == "All" or row_cluster == cluster)]
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows).pivot_table(index='FE Name', columns='Dataset', values='Records', aggfunc='sum', fill_value=0)
+
+    def metric_means(self, cluster, visit_periods):
+        """FE x metric mean of the observation metrics over the visit periods, from the running sums and counts"""
+        sums, counts = {}, {}
+        for (row_cluster, fe_name, vp), (metric_sums, metric_counts) in self.metric_sums.items():
+            if vp in visit_periods and (not cluster or cluster == "All" or row_cluster == cluster):
+                sums[(fe_name, vp)] = sums.get((fe_name, vp), 0) + metric_sums
+                counts[(fe_name, vp)] = counts.get((fe_name, vp), 0) + metric_counts
+        if not sums:
+            return pd.DataFrame()
+        index = pd.MultiIndex.from_tuples(list(sums), names=['FE Name', 'Visit Period'])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.stack(list(sums.values())) / np.stack([counts[group] for group in sums])
+        table = pd.DataFrame(means.astype(np.float32), index=index, columns=[METRIC_LABELS[key] for key in METRIC_KEYS]).dropna(axis=1, how='all').dropna(how='all')
+        period_order = {vp: i for i, vp in enumerate(visit_periods)}
+        return table.sort_index(level=[0, 1], key=lambda idx: idx.map(period_order) if idx.name == 'Visit Period' else idx)
+
+    def memory_bytes(self):
+        """Approximate size of the bitmaps and sums held instead of the raw tables"""
+        bitmaps = [self.clusters, self.row_farmers, self.registered, self.visited] + list(self.visit_fes.values())
+        return sum(bitmap.nbytes for store in bitmaps for bitmap in store.values()) + sum(s.nbytes + c.nbytes for s, c in self.metric_sums.values())
+
+
+def ingest_aggregates(registry, calendar_name, data_dir=DATA_DIR, store_dir=STORE_DIR, chunk_rows=CHUNK_ROWS):
+    """Stream every dataset in chunks of chunk_rows into RunningAggregates; registrations first so visits know their farmer's cluster"""
+    aggregates = RunningAggregates(calendar_name, registry)
+    for key in DATASETS:
+        source = open_source(key, data_dir, store_dir)
+        if source is None:
+            continue
+        with source as f:
+            for chunk in pd.read_csv(f, chunksize=chunk_rows):
+                aggregates.fold(key, chunk)
+    print(f"Debug: Streamed {aggregates.rows} rows into {aggregates.memory_bytes()} bytes of aggregates for {len(aggregates.farmer_ids)} farmers")
+    return aggregates
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+from conflicts import VISIT_DATE_COLUMNS
+from data_store import farm_attributes
+from visit_calendar import parse_dates
+
+EVENT_DATASETS = np.array(list(VISIT_DATE_COLUMNS), dtype=object)
+GAP_DAYS = 21
+_DAY_BITS = 32
+
+
+def _dataset_events(data):
+    """Raw (farmer ID, day number, dataset code, FE) arrays from every visit dataset"""
+    farmers, days, datasets, fes = [], [], [], []
+    for code, (key, date_col) in enumerate(VISIT_DATE_COLUMNS.items()):
+        df = data.get(key, pd.DataFrame())
+        if df.empty or 'Farmer ID' not in df.columns or date_col not in df.columns:
+            continue
+        farmer_ids = pd.to_numeric(df['Farmer ID'], errors='coerce').to_numpy(dtype=np.float64)
+        dates = parse_dates(df[date_col])
+        valid = ~np.isnan(farmer_ids) & ~np.isnat(dates)
+        farmers.append(farmer_ids[valid].astype(np.int64))
+        days.append(dates[valid].astype(np.int64))
+        datasets.append(np.full(valid.sum(), code, dtype=np.int8))
+        fes.append(df['FE_Name'].to_numpy(dtype=object)[valid] if 'FE_Name' in df.columns else np.full(valid.sum(), None, dtype=object))
+    if not farmers:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.int8), np.array([], dtype=object)
+    return np.concatenate(farmers), np.concatenate(days), np.concatenate(datasets), np.concatenate(fes)
+
+
+class EventIndex:
+    """Visit events sorted by (farmer, date) in compact arrays, with each farmer's start offset"""
+
+    def __init__(self, farmers, days, datasets, fes):
+        self.farmer_ids, ordinals = np.unique(farmers, return_inverse=True)
+        fe_codes, fe_names = pd.factorize(pd.Series(fes, dtype=object))
+        self.fe_names = np.append(np.asarray(fe_names, dtype=object), None)
+        order = np.lexsort((days, ordinals))
+        self.ordinals = ordinals[order].astype(np.int32)
+        self.days = days[order].astype(np.int32)
+        self.datasets = datasets[order].astype(np.int8)
+        # Missing FE (code -1) indexes the trailing None in fe_names
+        self.fe_codes = fe_codes[order].astype(np.int16)
+        # CSR layout: events of farmer farmer_ids[i] are offsets[i]:offsets[i + 1]
+        self.offsets = np.searchsorted(self.ordinals, np.arange(len(self.farmer_ids) + 1))
+        self.day_origin = int(self.days.min()) if len(self.days) else 0
+        # (farmer, day) packed into one sorted int64 so a per-farmer date bound is one binary search
+        self.keys = (self.ordinals.astype(np.int64) << _DAY_BITS) | (self.days.astype(np.int64) - self.day_origin)
+
+    @classmethod
+    def build(cls, data):
+        return cls(*_dataset_events(data))
+
+    def __len__(self):
+        return len(self.days)
+
+    def events(self):
+        """The index as a flat (farmer, date, dataset, FE) table"""
+        return pd.DataFrame({
+            'Farmer ID': self.farmer_ids[self.ordinals],
+            'Date': self.days.astype('datetime64[D]'),
+            'Dataset': EVENT_DATASETS[self.datasets],
+            'FE_Name': self.fe_names[self.fe_codes]
+        })
+
+    def replace_farmers(self, touched, new_data):
+        """Index with each dataset's events of the touched farmers replaced by their rows in new_data; only those rows are parsed"""
+        keep = np.ones(len(self), dtype=bool)
+        for code, key in enumerate(VISIT_DATE_COLUMNS):
+            if len(touched.get(key, ())):
+                keep &= ~((self.datasets == code) & np.isin(self.farmer_ids[self.ordinals], touched[key]))
+        farmers, days, datasets, fes = _dataset_events(new_data)
+        if keep.all() and not len(farmers):
+            return self
+        # The kept events are one sorted run, so the rebuild's sort is mostly a merge
+        return EventIndex(np.concatenate([self.farmer_ids[self.ordinals][keep], farmers]),
+                          np.concatenate([self.days.astype(np.int64)[keep], days]),
+                          np.concatenate([self.datasets[keep], datasets]),
+                          np.concatenate([self.fe_names[self.fe_codes][keep], fes]))
+
+    def _day(self, as_of):
+        """Day number of as_of, defaulting to the latest event"""
+        if as_of is None:
+            return int(self.days.max()) if len(self) else 0
+        return int(np.datetime64(pd.Timestamp(as_of).date(), 'D').astype(np.int64))
+
+    def last_event_positions(self, as_of=None):
+        """Position of each farmer's latest event on or before as_of (-1 if none), one binary search per farmer"""
+        limit = self._day(as_of) - self.day_origin
+        if not len(self) or limit < 0:
+            return np.full(len(self.farmer_ids), -1, dtype=np.int64)
+        query = (np.arange(len(self.farmer_ids), dtype=np.int64) << _DAY_BITS) | min(limit, (1 << _DAY_BITS) - 1)
+        positions = np.searchsorted(self.keys, query, side='right') - 1
+        return np.where(positions >= self.offsets[:-1], positions, -1)
+
+    def last_visit(self, farmer_id, as_of=None):
+        """Date, dataset and FE of one farmer's latest visit on or before as_of, or None"""
+        ordinal = np.searchsorted(self.farmer_ids, farmer_id)
+        if ordinal == len(self.farmer_ids) or self.farmer_ids[ordinal] != farmer_id:
+            return None
+        start, end = self.offsets[ordinal], self.offsets[ordinal + 1]
+        position = start + np.searchsorted(self.days[start:end], self._day(as_of), side='right') - 1
+        if position < start:
+            return None
+        return {
+            'Date': pd.Timestamp(self.days[position].astype('datetime64[D]')),
+            'Dataset': EVENT_DATASETS[self.datasets[position]],
+            'FE_Name': self.fe_names[self.fe_codes[position]]
+        }
+
+    def last_visits(self, as_of=None):
+        """Latest visit on or before as_of and days since it, for every farmer at once"""
+        positions = self.last_event_positions(as_of)
+        found = positions >= 0
+        last = pd.DataFrame({'Farmer ID': self.farmer_ids})
+        if not found.any():
+            return last.assign(**{'Last Visit': pd.NaT, 'Last Dataset': None, 'Last FE': None, 'Days Since Visit': np.nan})
+        safe = np.maximum(positions, 0)
+        last_days = self.days[safe].astype(np.int64)
+        last['Last Visit'] = pd.to_datetime(np.where(found, last_days.astype('datetime64[D]'), np.datetime64('NaT')))
+        last['Last Dataset'] = np.where(found, EVENT_DATASETS[self.datasets[safe]], None)
+        last['Last FE'] = np.where(found, self.fe_names[self.fe_codes[safe]], None)
+        last['Days Since Visit'] = np.where(found, self._day(as_of) - last_days, np.nan)
+        return last
+
+    def cadence(self):
+        """Visit days and the mean / longest gap between consecutive visit days, per farmer"""
+        n_farmers = len(self.farmer_ids)
+        # Distinct visit days only: several datasets recorded on the same visit count once
+        new_day = np.r_[True, (self.ordinals[1:] != self.ordinals[:-1]) | (self.days[1:] != self.days[:-1])][:len(self)]
+        ordinals, days = self.ordinals[new_day], self.days[new_day].astype(np.int64)
+        gaps = np.diff(days, prepend=days[:1])
+        gaps[np.r_[True, ordinals[1:] != ordinals[:-1]][:len(ordinals)]] = 0
+        visit_days = np.bincount(ordinals, minlength=n_farmers)
+        longest = np.zeros(n_farmers, dtype=np.int64)
+        np.maximum.at(longest, ordinals, gaps)
+        repeat = visit_days > 1
+        mean_gap = np.bincount(ordinals, weights=gaps, minlength=n_farmers) / np.maximum(visit_days - 1, 1)
+        return pd.DataFrame({
+            'Farmer ID': self.farmer_ids,
+            'Visit Days': visit_days,
+            'Mean Gap (days)': np.where(repeat, mean_gap.round(1), np.nan),
+            'Longest Gap (days)': np.where(repeat, longest, np.nan)
+        })
+
+
+def visit_gaps(index, farminfo_df, min_days=GAP_DAYS, as_of=None):
+    """Registered farmers with no visit from any dataset in the last min_days (or never), longest gap first"""
+    farms = farm_attributes(farminfo_df)[['Cluster name', 'Village', 'FE_Name']]
+    summary = index.last_visits(as_of).merge(index.cadence(), on='Farmer ID').set_index('Farmer ID')
+    gaps = farms.join(summary, how='left')
+    gaps['Visit Days'] = gaps['Visit Days'].fillna(0).astype(np.int64)
+    overdue = gaps[gaps['Days Since Visit'].isna() | (gaps['Days Since Visit'] >= min_days)]
+    return overdue.rename_axis('Farmer ID').reset_index() \
+        .sort_values('Days Since Visit', ascending=False, na_position='first').reset_index(drop=True)
@@ -0,0 +1,121 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CALENDAR_CONFIG = Path(__file__).parent / "calendars.json"
+VISIT_PERIOD_NAMES = [
+    'First Visit', 'Second Visit', 'Third Visit', 'Fourth Visit', 'Fifth Visit',
+    'Sixth Visit', 'Seventh Visit', 'Eighth Visit', 'Ninth Visit', 'Tenth Visit',
+    'Eleventh Visit', 'Twelfth Visit', 'Thirteenth Visit', 'Fourteenth Visit',
+    'Fifteenth Visit', 'Sixteenth Visit'
+]
+DATE_FORMATS = ['%Y/%m/%d', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%m/%d/%Y']
+UNKNOWN = 'Unknown'
+OUTSIDE_RANGE = 'Outside Range'
+
+
+def parse_dates(values):
+    """Parse visit dates trying each accepted format in turn, once per distinct value"""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).astype('string').str.strip())
+    parsed = pd.Series(pd.NaT, index=range(len(uniques)), dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna().to_numpy()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(pd.Series(uniques[missing]), format=fmt, errors='coerce').to_numpy()
+    days = parsed.to_numpy(dtype='datetime64[D]')
+    return np.where(codes >= 0, days[np.maximum(codes, 0)] if len(days) else np.datetime64('NaT'), np.datetime64('NaT')).astype('datetime64[D]')
+
+
+class VisitCalendar:
+    """Visit periods compiled into sorted start/end day arrays, so classification is one binary search per date"""
+
+    def __init__(self, name, periods, default_visit=None, title=None):
+        self.name = name
+        self.title = title or name
+        periods = sorted(periods, key=lambda period: period[2])
+        self.seasons = np.array([season for season, _, _, _ in periods], dtype=object)
+        self.names = np.array([period for _, period, _, _ in periods], dtype=object)
+        self.starts = np.array([start for _, _, start, _ in periods], dtype='datetime64[D]')
+        self.ends = np.array([end for _, _, _, end in periods], dtype='datetime64[D]')
+        if (self.ends < self.starts).any() or (self.starts[1:] <= self.ends[:-1]).any():
+            raise ValueError(f"Calendar '{name}' has empty or overlapping visit periods")
+        self.period_names = list(pd.unique(self.names))
+        self.default_visit = default_visit or (self.period_names[-1] if self.period_names else None)
+
+    def _slots(self, days):
+        """Index of the period containing each day, or -1"""
+        slots = np.searchsorted(self.starts, days, side='right') - 1
+        inside = (slots >= 0) & ~np.isnat(days)
+        inside[inside] = days[inside] <= self.ends[slots[inside]]
+        return np.where(inside, slots, -1)
+
+    def classify(self, values):
+        """Visit period name for each date string, 'Unknown' when unparseable and 'Outside Range' when in no period"""
+        days = parse_dates(values)
+        slots = self._slots(days)
+        labels = np.where(slots >= 0, self.names[np.maximum(slots, 0)] if len(self.names) else OUTSIDE_RANGE, OUTSIDE_RANGE)
+        return np.where(np.isnat(days), UNKNOWN, labels).astype(object)
+
+    def classify_one(self, value):
+        return self.classify([value])[0]
+
+    def season(self, values):
+        """Season name for each date string, None outside every season"""
+        slots = self._slots(parse_dates(values))
+        return np.where(slots >= 0, self.seasons[np.maximum(slots, 0)] if len(self.seasons) else None, None)
+
+    def period_bounds(self, period_names=None):
+        """(start, end) day ranges of the named periods across all seasons, every period when None"""
+        selected = np.ones(len(self.names), dtype=bool) if period_names is None else np.isin(self.names, list(period_names))
+        return list(zip(self.starts[selected], self.ends[selected]))
+
+
+def _compile(name, spec, title=None):
+    periods = [(season['name'], period, np.datetime64(start, 'D'), np.datetime64(end, 'D'))
+               for season in spec.get('seasons', []) for period, start, end in season.get('periods', [])]
+    return VisitCalendar(name, periods, spec.get('default_visit'), title or spec.get('title'))
+
+
+class CalendarRegistry:
+    """Named visit calendars with optional per-cluster overrides, compiled once from the config file, and the dashboard tenants using them"""
+
+    def __init__(self, config):
+        self.calendars = {}
+        self.overrides = {}
+        for name, spec in config.get('calendars', {}).items():
+            self.calendars[name] = _compile(name, spec)
+            for cluster, override in spec.get('cluster_overrides', {}).items():
+                self.overrides[(name, cluster)] = _compile(name, {**spec, **override}, self.calendars[name].title)
+        # A tenant is a view over the shared data: its calendar, default visit and cluster subset
+        self.tenants = {}
+        for name, spec in config.get('tenants', {name: {'calendar': name} for name in self.calendars}).items():
+            calendar = self.get(spec.get('calendar', name))
+            self.tenants[name] = {
+                'title': spec.get('title', calendar.title),
+                'calendar': calendar.name,
+                'default_visit': spec.get('default_visit', calendar.default_visit),
+                'clusters': spec.get('clusters')
+            }
+
+    def names(self):
+        return list(self.calendars)
+
+    def tenant(self, name):
+        if name not in self.tenants:
+            raise KeyError(f"Unknown dashboard tenant '{name}'; configured: {', '.join(self.tenants)}")
+        return self.tenants[name]
+
+    def get(self, name, cluster=None):
+        """The named calendar, or its override for cluster when one is configured"""
+        if name not in self.calendars:
+            raise KeyError(f"Unknown visit calendar '{name}'; configured: {', '.join(self.calendars)}")
+        return self.overrides.get((name, cluster), self.calendars[name])
+
+
+def load_calendars(path=CALENDAR_CONFIG):
+    """Read and compile the calendar registry"""
+    with open(path, encoding='utf-8') as f:
+        return CalendarRegistry(json.load(f))